@@ -1,7 +1,20 @@
 from django.contrib import admin
-from .models import Faculty, Course, Timetable, TimetableStatus
+from .models import Faculty, Course, Timetable, TimetableStatus, ImportJob, GridDefinition, TimetableVersion, SlotPreference, SpreadPreference
 
 admin.site.register(Faculty)
 admin.site.register(Course)
 admin.site.register(Timetable)
-admin.site.register(TimetableStatus)
\ No newline at end of file
+admin.site.register(TimetableStatus)
+admin.site.register(ImportJob)
+admin.site.register(GridDefinition)
+admin.site.register(SlotPreference)
+admin.site.register(SpreadPreference)
+
+
+@admin.register(TimetableVersion)
+class TimetableVersionAdmin(admin.ModelAdmin):
+    # Versions are immutable; roll back from the timetable versions page instead
+    list_display = ('__str__', 'reason', 'ga_seed', 'created_at')
+
+    def has_change_permission(self, request, obj=None):
+        return False
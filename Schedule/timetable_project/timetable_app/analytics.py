@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.db.models import Count
+
+from .models import Timetable, Faculty
+from .cache import get_or_build, year_scope
+from .validators import PLACEHOLDER_FACULTY
+from .weekgrid import current_grid
+
+
+def _cells(rows):
+    """{key: {(day, slot): classes}} from grouped (key, day, slot, count) rows."""
+    cells = defaultdict(dict)
+    for key, day, slot, count in rows:
+        if key:
+            cells[key][(day, slot)] = count
+    return cells
+
+
+def cell_stats(cells, grid):
+    """
+    Weekly load of one faculty member or venue from its {(day, slot): classes}:
+    busy slots, slots holding more than one class, busy slots per day and the
+    peak day, the longest run of back-to-back slots and the idle slots between
+    the first and last busy slot of each day.
+    """
+    by_day = defaultdict(list)
+    for day, slot in cells:
+        by_day[day].append(slot)
+    per_day = {day: len(by_day.get(day, ())) for day in grid.days}
+    longest_run = idle = 0
+    for day, slots in by_day.items():
+        slots.sort()
+        longest_run = max([longest_run] + [last - first + 1 for first, last in grid.runs(slots)])
+        idle += slots[-1] - slots[0] + 1 - len(slots)
+    peak_day = max(grid.days, key=lambda day: per_day[day])
+    return {
+        'slots': len(cells),
+        'classes': sum(cells.values()),
+        'double_booked': sum(1 for count in cells.values() if count > 1),
+        'days': len(by_day),
+        'per_day': [per_day[day] for day in grid.days],
+        'peak_day': grid.day_names[peak_day] if cells else None,
+        'peak_slots': per_day[peak_day],
+        'longest_run': longest_run,
+        'idle_gaps': idle,
+        'utilisation': round(len(cells) / len(grid.cells), 3),
+    }
+
+
+def build_analytics(academic_year, semester=None, dept=None):
+    """
+    Faculty workload and venue utilisation of an academic year, optionally
+    one semester, from two grouped queries over the timetable and one for
+    faculty names. dept limits faculty to a department and venues to its
+    classes.
+    """
+    grid = current_grid()
+    timetable = Timetable.objects.filter(main_id__academic_year=academic_year)
+    if semester:
+        timetable = timetable.filter(main_id__semester=semester)
+
+    faculty_rows = timetable.values_list('main_id__faculty', 'day', 'slot').annotate(n=Count('id')).order_by()
+    venue_rows = timetable.filter(main_id__dept=dept) if dept else timetable
+    venue_rows = venue_rows.values_list('main_id__venue', 'day', 'slot').annotate(n=Count('id')).order_by()
+
+    faculty_cells = _cells(faculty_rows)
+    people = Faculty.objects.filter(faculty_id__in=list(faculty_cells)).exclude(faculty_name__in=PLACEHOLDER_FACULTY)
+    if dept:
+        people = people.filter(department=dept)
+    faculty = [
+        {'faculty_id': faculty_id, 'faculty_name': name, 'department': department,
+         **cell_stats(faculty_cells[faculty_id], grid)}
+        for faculty_id, name, department in people.values_list('faculty_id', 'faculty_name', 'department')
+    ]
+    venues = [{'venue': venue, **cell_stats(cells, grid)} for venue, cells in _cells(venue_rows).items()]
+
+    return {
+        'academic_year': academic_year,
+        'semester': semester,
+        'dept': dept,
+        'days': [grid.day_names[day] for day in grid.days],
+        'faculty': sorted(faculty, key=lambda row: (-row['slots'], row['faculty_id'])),
+        'venues': sorted(venues, key=lambda row: (-row['slots'], row['venue'])),
+    }
+
+
+def analytics(academic_year, semester=None, dept=None):
+    """build_analytics, cached until a timetable of the year changes."""
+    return get_or_build('analytics', (academic_year, semester, dept),
+                        lambda: build_analytics(academic_year, semester, dept), year_scope(academic_year))
@@ -0,0 +1,230 @@
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse, Http404
+from django.views.decorators.http import condition, require_GET
+
+from .models import Timetable
+from .cache import make_key, semester_scope
+from .lookups import entity_timetable, registration_set
+from .occupancy import search, parse_times
+from .analytics import analytics
+from .weekgrid import current_grid, slot_times
+from . import profiling
+from .profiling import query_budget
+
+API_ENTITIES = ('section', 'student', 'faculty', 'venue')
+PAGE_SIZE = 100
+ICS_DAYS = {1: 'MO', 2: 'TU', 3: 'WE', 4: 'TH', 5: 'FR', 6: 'SA', 7: 'SU'}
+
+
+def _params(request):
+    return request.GET.get('academic_year'), request.GET.get('semester'), request.GET.get('dept')
+
+
+def _timetable_queryset(entity, ident, academic_year, semester, dept):
+    if entity == 'section':
+        timetable = entity_timetable('admin', None, academic_year, semester, section=ident, dept=dept)
+    elif entity == 'student':
+        _, main_ids = registration_set(ident)
+        timetable = Timetable.objects.filter(
+            main_id__in=main_ids,
+            main_id__academic_year=academic_year,
+            main_id__semester=semester
+        )
+    else:
+        timetable = entity_timetable(entity, ident, academic_year, semester, dept=dept)
+    return timetable.select_related('main_id__course').prefetch_related('main_id__faculty').order_by('day', 'slot', 'main_id')
+
+
+def _etag(request, entity, ident, fmt):
+    """Derived from the cache versions only, so a 304 never touches the database."""
+    academic_year, semester, dept = _params(request)
+    if entity not in API_ENTITIES or not academic_year or not semester:
+        return None
+    parts = (fmt, entity, ident, academic_year, semester, dept, request.GET.get('page'))
+    if fmt == 'ics':
+        parts += (request.GET.get('start') or date.today().isoformat(), request.GET.get('weeks'))
+    if entity == 'student':
+        parts += (registration_set(ident)[0],)
+    key = make_key('api', parts, semester_scope(academic_year, semester))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _check(entity, academic_year, semester):
+    if entity not in API_ENTITIES:
+        raise Http404(f"Unknown timetable entity: {entity}")
+    if not academic_year or not semester:
+        return JsonResponse({'error': "academic_year and semester are required."}, status=400)
+    return None
+
+
+def _entry(entry, grid):
+    cls = entry.main_id
+    return {
+        'day': entry.day,
+        'day_name': grid.day_names.get(entry.day),
+        'slot': entry.slot,
+        'slot_time': grid.slot_labels.get(entry.slot),
+        'main_id': cls.main_id,
+        'course_id': cls.course.course_id,
+        'course_name': cls.course.name,
+        'course_code': cls.course.code,
+        'course_type': cls.course.course_type,
+        'section': cls.section_id,
+        'dept': cls.dept,
+        'venue': cls.venue,
+        'faculty': [{'faculty_id': f.faculty_id, 'faculty_name': f.faculty_name} for f in cls.faculty.all()],
+    }
+
+
+@query_budget(10)
+@require_GET
+@condition(etag_func=lambda request, entity, ident: _etag(request, entity, ident, 'json'))
+def timetable_json(request, entity, ident):
+    """Paginated timetable entries of a section, student, faculty member or venue."""
+    academic_year, semester, dept = _params(request)
+    error = _check(entity, academic_year, semester)
+    if error:
+        return error
+
+    grid = current_grid()
+    page = Paginator(_timetable_queryset(entity, ident, academic_year, semester, dept), PAGE_SIZE).get_page(request.GET.get('page'))
+    return JsonResponse({
+        'entity': entity,
+        'id': ident,
+        'academic_year': academic_year,
+        'semester': semester,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'results': [_entry(entry, grid) for entry in page],
+    })
+
+
+def _ics_text(value):
+    return str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+@query_budget(10)
+@require_GET
+@condition(etag_func=lambda request, entity, ident: _etag(request, entity, ident, 'ics'))
+def timetable_ics(request, entity, ident):
+    """
+    Weekly recurring iCalendar events for the same timetables, starting from
+    the week of ?start=YYYY-MM-DD (default: this week) for ?weeks=N weeks.
+    """
+    academic_year, semester, dept = _params(request)
+    error = _check(entity, academic_year, semester)
+    if error:
+        return error
+
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else date.today()
+        weeks = int(request.GET.get('weeks', 16))
+        if weeks < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': "start must be YYYY-MM-DD and weeks a positive integer."}, status=400)
+    monday = start - timedelta(days=start.weekday())
+    grid = current_grid()
+    times = {}
+    for slot, label in grid.slot_labels.items():
+        try:
+            times[slot] = slot_times(label)
+        except ValueError:
+            pass  # a grid saved without GridDefinition.clean(); its events cannot be timed
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//timetable_app//Timetable//EN',
+        f'X-WR-CALNAME:{_ics_text(f"{entity} {ident} {academic_year} sem {semester}")}',
+    ]
+    for entry in _timetable_queryset(entity, ident, academic_year, semester, dept):
+        if entry.slot not in times or entry.day not in ICS_DAYS:
+            continue  # left outside the grid by a change of grid, or in an untimed slot
+        cls = entry.main_id
+        first_day = monday + timedelta(days=entry.day - 1)
+        begin, end = times[entry.slot]
+        faculty = ', '.join(f.faculty_name for f in cls.faculty.all())
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:timetable-{entry.pk}@{request.get_host()}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{datetime.combine(first_day, begin):%Y%m%dT%H%M%S}',
+            f'DTEND:{datetime.combine(first_day, end):%Y%m%dT%H%M%S}',
+            f'RRULE:FREQ=WEEKLY;BYDAY={ICS_DAYS[entry.day]};COUNT={weeks}',
+            f'SUMMARY:{_ics_text(f"{cls.course.name} ({cls.course.code})")}',
+            f'LOCATION:{_ics_text(cls.venue)}',
+            f'DESCRIPTION:{_ics_text(faculty)}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+
+    response = HttpResponse('\r\n'.join(lines) + '\r\n', content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{entity}_{ident}.ics"'
+    return response
+
+
+def finder_query(request):
+    """academic_year, times, faculty_ids, venues and match of a free-resource query string."""
+    match = request.GET.get('match', 'all')
+    if match not in ('all', 'any'):
+        raise ValueError("match must be 'all' or 'any'.")
+    times = parse_times(request.GET.getlist('at'))
+    faculty_ids = [f for f in request.GET.getlist('faculty') if f]
+    venues = [v for v in request.GET.getlist('venue') if v]
+    return request.GET.get('academic_year'), times, faculty_ids, venues, match
+
+
+@query_budget(4)
+@require_GET
+def workload_analytics(request):
+    """Per-faculty workload and per-venue utilisation of ?academic_year=, optionally ?semester= and ?dept=."""
+    academic_year, semester, dept = _params(request)
+    if not academic_year:
+        return JsonResponse({'error': "academic_year is required."}, status=400)
+    return JsonResponse(analytics(academic_year, semester or None, dept or None))
+
+
+@query_budget(5)
+@require_GET
+def free_resources(request):
+    """
+    Free venues and faculty at ?at=day:slot (repeatable), and the slots in
+    which every ?faculty= and ?venue= given is free; ?match=any relaxes both
+    to "at least one".
+    """
+    try:
+        academic_year, times, faculty_ids, venues, match = finder_query(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not academic_year or not (times or faculty_ids or venues):
+        return JsonResponse({'error': "academic_year and at least one of at, faculty or venue are required."}, status=400)
+
+    result = search(academic_year, times, faculty_ids, venues, match)
+    response = {'academic_year': academic_year, 'match': match}
+    if 'venues' in result:
+        response['free_venues'] = result['venues']
+        response['free_faculty'] = [{'faculty_id': f_id, 'faculty_name': name} for f_id, name in result['faculty']]
+    if 'slots' in result:
+        grid = current_grid()
+        response['free_slots'] = [
+            {'day': day, 'day_name': grid.day_names[day], 'slot': slot, 'slot_time': grid.slot_labels[slot]}
+            for day, slot in result['slots']
+        ]
+    return JsonResponse(response)
+
+
+@require_GET
+def profiling_stats(request):
+    """Per-view query and latency stats of this process, for staff. ?reset=1 clears them."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': "Staff only."}, status=403)
+    stats = profiling.store.stats()
+    if request.GET.get('reset'):
+        profiling.store.reset()
+    return JsonResponse({'window': profiling.store.window, 'views': stats})
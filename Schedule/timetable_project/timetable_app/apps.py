@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TimetableAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'timetable_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,152 @@
+# Async versions of the read-only views, routed instead of the sync ones when
+# settings.ASYNC_VIEWS is set (for ASGI deployments). They share cache keys,
+# templates and sessions with views.py and api.py, so either set can serve a
+# request started by the other. The async ORM runs a request's queries one at
+# a time on a single worker thread, so each query is awaited in turn; what an
+# ASGI worker gains is serving other requests while one waits.
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from .lookups import afilter_options, aresolve_entity, aget_grid, grid_table
+from .gridstore import save_grid, load_grid
+from .weekgrid import acurrent_grid
+from .profiling import query_budget
+from .api import PAGE_SIZE, _params, _check, _etag, _entry, _timetable_queryset
+from .exports import EXPORT_ENTITIES, XLSX_CONTENT_TYPE, iter_entity_grids, stream_workbook, stream_zip
+
+
+async def _render(request, template, context):
+    # Loads the session here, where a query may run; dashboard.html reads it
+    await request.session.aget('selected_role')
+    return render(request, template, context)
+
+
+async def _aiterate(chunks):
+    """Serve a sync chunk generator one chunk at a time, without blocking the event loop."""
+    next_chunk = sync_to_async(partial(next, chunks, None))
+    while (chunk := await next_chunk()) is not None:
+        yield chunk
+
+
+@query_budget(10)
+async def view_timetable(request):
+    if request.method != "POST":
+        return await _render(request, "view_timetable.html", await afilter_options())
+
+    user_input = request.POST.get("user_input", "").strip()
+    academic_year = request.POST.get('academic_year')
+    semester = request.POST.get('semester')
+    section = request.POST.get('section')
+    dept = request.POST.get('dept')
+
+    if not user_input:
+        return await _render(request, "view_timetable.html", {"error": "Please enter a valid ID or 'admin'.", **await afilter_options()})
+
+    options = await afilter_options()
+    entity = await aresolve_entity(user_input)
+    if entity is None:
+        return await _render(request, "view_timetable.html", {"error": "Invalid ID or venue entered.", **options})
+
+    grid = await aget_grid(entity, user_input, academic_year, semester, section, dept)
+
+    # Keep only a token in the session; the grid itself lives in the cache
+    token = save_grid(grid)
+    if await request.session.aget('timetable_token') != token:
+        await request.session.aset('timetable_token', token)
+        await request.session.aset('timetable_lookup', [entity, user_input, academic_year, semester, section, dept])
+    await request.session.apop('timetable_data', None)
+
+    return await _render(request, "view_timetable.html", {
+        "timetable_grid": grid_table(grid, token) if grid['timetable'] else None,
+        **options,
+        "selected_section": section,
+        "selected_dept": dept
+    })
+
+
+@query_budget(8)
+async def download_timetable(request):
+    token = await request.session.aget("timetable_token")
+    if not token:
+        html_content = f"""
+        <p>No filtered timetable data to export.</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
+
+    grid = load_grid(token)
+    if grid is None:
+        # Evicted from the cache: rebuild it from the last lookup
+        grid = await aget_grid(*await request.session.aget("timetable_lookup"))
+
+    response = StreamingHttpResponse(_aiterate(stream_workbook([("Timetable", grid)])), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = 'attachment; filename="timetable.xlsx"'
+    return response
+
+
+@query_budget(10)
+async def export_timetables(request):
+    """Every student's, faculty member's or venue's timetable for a semester in one download."""
+    academic_year = request.GET.get('academic_year')
+    semester = request.GET.get('semester')
+    entity = request.GET.get('entity')
+    export_format = request.GET.get('format', 'zip')
+
+    if not academic_year or not semester or entity not in EXPORT_ENTITIES:
+        return await _render(request, "export_timetables.html", {"entities": EXPORT_ENTITIES, **await afilter_options()})
+
+    # The grids are built lazily from the database as the response is sent
+    sheets = iter_entity_grids(entity, academic_year, semester)
+    filename = f"timetables_{entity}_{academic_year}_{semester}"
+    if export_format == 'workbook':
+        response = StreamingHttpResponse(_aiterate(stream_workbook(sheets)), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    else:
+        response = StreamingHttpResponse(_aiterate(stream_zip(entity, sheets)), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    return response
+
+
+@query_budget(10)
+@require_GET
+async def timetable_json(request, entity, ident):
+    """Paginated timetable entries of a section, student, faculty member or venue."""
+    # The ETag only needs cache versions, but a student's registration set may
+    # have to be loaded, so it is computed off the event loop
+    etag = await sync_to_async(_etag)(request, entity, ident, 'json')
+    if etag is not None:
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+    academic_year, semester, dept = _params(request)
+    error = _check(entity, academic_year, semester)
+    if error:
+        return error
+
+    queryset = await sync_to_async(_timetable_queryset)(entity, ident, academic_year, semester, dept)
+    grid = await acurrent_grid()
+    paginator = Paginator(queryset, PAGE_SIZE)
+    paginator.count = await queryset.acount()  # a cached_property, so Paginator never counts synchronously
+    page = paginator.get_page(request.GET.get('page'))
+    response = JsonResponse({
+        'entity': entity,
+        'id': ident,
+        'academic_year': academic_year,
+        'semester': semester,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'count': paginator.count,
+        'results': [_entry(entry, grid) async for entry in page.object_list],
+    })
+    if etag is not None:
+        response['ETag'] = etag
+    return response
@@ -0,0 +1,140 @@
+import csv
+from collections import defaultdict
+
+from .models import Timetable, Class
+from .validators import PLACEHOLDER_FACULTY, FACULTY_EXEMPT_COURSES, SHARED_VENUES
+from .coenrolment import coenrolment
+from .weekgrid import current_grid
+
+REPORT_COLUMNS = ['rule', 'academic_year', 'semester', 'section', 'dept', 'day', 'slot', 'subject', 'main_ids', 'detail']
+
+
+ROW_FIELDS = (
+    'day', 'slot', 'main_id', 'main_id__course__name', 'main_id__course__course_type',
+    'main_id__semester', 'main_id__section_id', 'main_id__dept', 'main_id__venue'
+)
+
+
+def year_faculty(academic_year):
+    """{main_id: [(faculty_id, faculty_name)]} of an academic year's classes, placeholders left out."""
+    faculty_of = defaultdict(list)
+    links = Class.faculty.through.objects.filter(**{'class__academic_year': academic_year}).values_list(
+        'class_id', 'faculty__faculty_id', 'faculty__faculty_name'
+    )
+    for main_id, faculty_id, faculty_name in links:
+        if faculty_name not in PLACEHOLDER_FACULTY:
+            faculty_of[main_id].append((faculty_id, faculty_name))
+    return faculty_of
+
+
+def audit_year(academic_year):
+    """
+    Check every Timetable row of an academic year against the rules in
+    validators.py and return the violations as report dicts.
+
+    Two queries load the rows and their faculty; the rows are then grouped
+    once by slot, section/day and faculty/day and each group is checked after
+    a sort, so the whole audit is O(n log n).
+    """
+    rows = Timetable.objects.filter(main_id__academic_year=academic_year).values_list(*ROW_FIELDS)
+    return audit_rows(academic_year, rows, year_faculty(academic_year))
+
+
+def audit_rows(academic_year, rows, faculty_of):
+    """The violations among rows shaped like ROW_FIELDS, without touching the timetable."""
+    violations = []
+    runs = current_grid().runs  # adjacency stops at the grid's breaks
+
+    def report(rule, subject, main_ids, detail, semester='', section='', dept='', day='', slot=''):
+        violations.append({
+            'rule': rule, 'academic_year': academic_year, 'semester': semester, 'section': section,
+            'dept': dept, 'day': day, 'slot': slot, 'subject': subject,
+            'main_ids': ' '.join(str(m) for m in sorted(set(main_ids))), 'detail': detail,
+        })
+
+    by_section_slot = defaultdict(list)
+    by_section_day = defaultdict(list)
+    by_venue_slot = defaultdict(list)
+    by_faculty_slot = defaultdict(list)
+    by_semester_slot = defaultdict(list)
+    faculty_main_slots = defaultdict(set)
+    for day, slot, main_id, course, course_type, semester, section, dept, venue in rows:
+        is_main = course_type == 'none'
+        by_section_slot[(semester, section, dept, day, slot)].append((main_id, course, is_main))
+        if is_main:
+            by_section_day[(semester, section, dept, day, course)].append((slot, main_id))
+        by_semester_slot[(semester, day, slot)].append(main_id)
+        if venue is not None and venue not in SHARED_VENUES:
+            by_venue_slot[(venue, day, slot)].append(main_id)
+        for faculty in faculty_of.get(main_id, ()):
+            by_faculty_slot[(faculty, day, slot)].append((main_id, course))
+            if is_main:
+                faculty_main_slots[(faculty, day)].add((slot, main_id))
+
+    # 1. Slot uniqueness: a main ('none') course never shares its section's slot
+    for (semester, section, dept, day, slot), entries in by_section_slot.items():
+        if len(entries) > 1 and any(is_main for _, _, is_main in entries):
+            report('slot_uniqueness', ', '.join(sorted(c for _, c, _ in entries)), [m for m, _, _ in entries],
+                   "A main course shares the slot with another course.", semester, section, dept, day, slot)
+
+    # 7. Venue clashes across the whole year
+    for (venue, day, slot), main_ids in by_venue_slot.items():
+        if len(set(main_ids)) > 1:
+            report('venue_clash', venue, main_ids, f"Venue {venue} is booked by {len(set(main_ids))} classes.",
+                   day=day, slot=slot)
+
+    # 2. Faculty double booking across the whole year
+    for ((faculty_id, faculty_name), day, slot), entries in by_faculty_slot.items():
+        if len(entries) > 1 and any(course not in FACULTY_EXEMPT_COURSES for _, course in entries):
+            report('faculty_double_booking', f"{faculty_name} ({faculty_id})", [m for m, _ in entries],
+                   f"Faculty teaches {len(entries)} classes at once.", day=day, slot=slot)
+
+    # 3 and 6. Adjacent slots and more than 2 slots a day for one main course
+    for (semester, section, dept, day, course), entries in by_section_day.items():
+        entries.sort()
+        slots = [slot for slot, _ in entries]
+        main_ids = [main_id for _, main_id in entries]
+        for first, last in runs(sorted(set(slots))):
+            if last > first:
+                report('main_course_adjacency', course, main_ids, f"{course} runs from slot {first} to {last}.",
+                       semester, section, dept, day, f"{first}-{last}")
+        if len(slots) > 2:
+            report('main_course_max_per_day', course, main_ids, f"{course} has {len(slots)} slots on this day.",
+                   semester, section, dept, day)
+
+    # 5. Faculty teaching main courses in 3 or more consecutive slots
+    for ((faculty_id, faculty_name), day), entries in faculty_main_slots.items():
+        entries = sorted(entries)
+        for first, last in runs(sorted({slot for slot, _ in entries})):
+            if last - first >= 2:
+                report('faculty_continuous', f"{faculty_name} ({faculty_id})",
+                       [m for slot, m in entries if first <= slot <= last],
+                       f"Faculty teaches main courses for {last - first + 1} consecutive slots.",
+                       day=day, slot=f"{first}-{last}")
+
+    # 8. Students registered for two classes in the same slot
+    matrices = {}
+    for (semester, day, slot), main_ids in by_semester_slot.items():
+        if len(main_ids) < 2:
+            continue
+        if semester not in matrices:
+            matrices[semester] = coenrolment(academic_year, semester)
+        for a, b, students in sorted(matrices[semester].pairs_within(main_ids)):
+            report('student_clash', f"{a} / {b}", [a, b], f"{students} students are registered for both classes.",
+                   semester, day=day, slot=slot)
+
+    violations.sort(key=lambda v: (v['rule'], str(v['semester']), str(v['section']), str(v['day']), str(v['slot'])))
+    return violations
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_report_csv(violations):
+    """CSV lines of an audit report, for StreamingHttpResponse or a file."""
+    writer = csv.DictWriter(_Echo(), fieldnames=REPORT_COLUMNS)
+    yield writer.writeheader()
+    for violation in violations:
+        yield writer.writerow(violation)
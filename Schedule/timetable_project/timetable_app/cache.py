@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Every cached entry is addressed by the global generation plus an optional
+# scope counter, such as one per (academic_year, semester). Writes only bump a
+# counter, so stale entries are never read again and simply age out of the
+# backend.
+GLOBAL_SCOPE = 'all'
+# Bumped by Registration, Class and Course writes, which the co-enrolment
+# matrices follow; single Registration writes leave every grid valid
+REGISTRATION_SCOPE = 'registrations'
+# Bumped by Class writes, for the year/semester/section/dept dropdowns
+CLASSES_SCOPE = 'classes'
+# Bumped by Student, Faculty and Class writes, for what a lookup string names
+ENTITY_SCOPE = 'entities'
+# Bumped by Class and Faculty writes; the occupancy index also follows its year scope
+OCCUPANCY_SCOPE = 'occupancy'
+
+_MISSING = object()
+
+
+def semester_scope(academic_year, semester):
+    return f"{academic_year}:{semester}"
+
+
+def year_scope(academic_year):
+    """Bumped with every semester scope of the year, for entries spanning the whole year."""
+    return f"{academic_year}:*"
+
+
+def _version_key(scope):
+    return f"timetable:version:{scope}"
+
+
+def get_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so a counter evicted by the backend never
+        # comes back at a value that older entries were stored under.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(scope=GLOBAL_SCOPE):
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def bump_semester(academic_year, semester):
+    bump_version(semester_scope(academic_year, semester))
+    bump_version(year_scope(academic_year))
+
+
+def make_key(kind, parts, scope=None):
+    """The key of (kind, parts) under the current versions of the global scope and of scope, a name or a tuple of names."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    key = f"timetable:{kind}:{digest}:{get_version(GLOBAL_SCOPE)}"
+    for name in (scope,) if isinstance(scope, str) else scope or ():
+        key += f":{get_version(name)}"
+    return key
+
+
+def timeout():
+    return getattr(settings, 'TIMETABLE_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_value(kind, parts, default=None, scope=None):
+    return cache.get(make_key(kind, parts, scope), default)
+
+
+def set_value(kind, parts, value, scope=None):
+    cache.set(make_key(kind, parts, scope), value, timeout())
+
+
+def delete_value(kind, parts, scope=None):
+    cache.delete(make_key(kind, parts, scope))
+
+
+def get_or_build(kind, parts, builder, scope=None):
+    """Return the cached value for (kind, parts), calling builder() on a miss."""
+    key = make_key(kind, parts, scope)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = builder()
+        cache.set(key, value, timeout())
+    return value
+
+
+async def aget_or_build(kind, parts, builder, scope=None):
+    """get_or_build for async views: builder is a coroutine function.
+
+    The cache calls stay synchronous; the file backend only reads small local
+    files, and Django's async cache methods only wrap the same calls in a thread.
+    """
+    key = make_key(kind, parts, scope)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = await builder()
+        cache.set(key, value, timeout())
+    return value
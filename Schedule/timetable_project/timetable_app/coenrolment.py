@@ -0,0 +1,120 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+
+from .models import Registration
+from .cache import get_or_build, REGISTRATION_SCOPE
+
+ELECTIVE_TYPES = ('tt', 'dept')
+
+
+class CoEnrolment:
+    """
+    Symmetric class x class matrix of shared students in CSR form: the
+    classes sharing students with the class at row i are
+    indices[indptr[i]:indptr[i + 1]] (sorted), and weights holds how many
+    students each pair shares. Classes with no shared students have no row.
+    """
+
+    def __init__(self, pairs):
+        adjacency = defaultdict(list)
+        for a, b, students in pairs:
+            adjacency[a].append((b, students))
+            adjacency[b].append((a, students))
+
+        self.rows = {}
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.weights = array('q')
+        for row, main_id in enumerate(sorted(adjacency)):
+            self.rows[main_id] = row
+            for other, students in sorted(adjacency[main_id]):
+                self.indices.append(other)
+                self.weights.append(students)
+            self.indptr.append(len(self.indices))
+
+    def __len__(self):
+        """Number of class pairs that share students."""
+        return len(self.indices) // 2
+
+    def neighbours(self, main_id):
+        """{other main_id: shared students} for one class."""
+        row = self.rows.get(main_id)
+        if row is None:
+            return {}
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return dict(zip(self.indices[start:end], self.weights[start:end]))
+
+    def shared(self, a, b):
+        row = self.rows.get(a)
+        if row is None:
+            return 0
+        start, end = self.indptr[row], self.indptr[row + 1]
+        i = bisect_left(self.indices, b, start, end)
+        return self.weights[i] if i < end and self.indices[i] == b else 0
+
+    def pairs_within(self, main_ids):
+        """
+        (a, b, shared students) for each pair a < b of the given classes that
+        shares students. Walks the classes' rows, unless the cell is small
+        enough that looking up every pair (a bisect each, about four row
+        entries' worth of work) is cheaper.
+        """
+        members = {main_id: self.rows[main_id] for main_id in set(main_ids) if main_id in self.rows}
+        walk = sum(self.indptr[row + 1] - self.indptr[row] for row in members.values())
+        if len(members) * (len(members) - 1) * 2 <= walk:
+            ordered = sorted(members)
+            for i, a in enumerate(ordered):
+                for b in ordered[i + 1:]:
+                    students = self.shared(a, b)
+                    if students:
+                        yield a, b, students
+            return
+        for a, row in members.items():
+            end = self.indptr[row + 1]
+            # Rows are sorted, so the partners above a follow it
+            for i in range(bisect_right(self.indices, a, self.indptr[row], end), end):
+                if self.indices[i] in members:
+                    yield a, self.indices[i], self.weights[i]
+
+    def clashes(self, placements):
+        """Students with two classes at once over (day, slot, main_id) placements."""
+        by_time = defaultdict(list)
+        for day, slot, main_id in placements:
+            if main_id in self.rows:
+                by_time[(day, slot)].append(main_id)
+        students = 0
+        for main_ids in by_time.values():
+            if len(main_ids) == 2:
+                students += self.shared(*main_ids)  # the common case, without building a cell
+            elif len(main_ids) > 2:
+                students += sum(shared for _, _, shared in self.pairs_within(main_ids))
+        return students
+
+
+def build_matrix(academic_year, semester):
+    """
+    Count the students shared by every pair of the semester's classes in
+    which at least one class is an elective, with one grouped self-join of
+    Registration.
+    """
+    # Both sides of the join go in one filter() so they use the same join
+    pairs = Registration.objects.filter(
+        Q(main_id__course__course_type__in=ELECTIVE_TYPES) |
+        Q(stud_id__registration__main_id__course__course_type__in=ELECTIVE_TYPES),
+        main_id__academic_year=academic_year,
+        main_id__semester=semester,
+        stud_id__registration__main_id__academic_year=academic_year,
+        stud_id__registration__main_id__semester=semester,
+        stud_id__registration__main_id__gt=F('main_id'),
+    ).values_list('main_id', 'stud_id__registration__main_id').annotate(
+        students=Count('stud_id', distinct=True)
+    ).order_by()
+    return CoEnrolment(pairs)
+
+
+def coenrolment(academic_year, semester):
+    return get_or_build('coenrolment', (academic_year, semester),
+                        lambda: build_matrix(academic_year, semester), scope=REGISTRATION_SCOPE)
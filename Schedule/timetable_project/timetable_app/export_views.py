@@ -0,0 +1,51 @@
+# Timetable downloads. openpyxl is only imported by exports.py once a
+# workbook is actually written.
+from django.shortcuts import render
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .lookups import filter_options, get_grid
+from .gridstore import load_grid
+from .profiling import query_budget
+from .exports import EXPORT_ENTITIES, XLSX_CONTENT_TYPE, iter_entity_grids, stream_workbook, stream_zip
+
+
+@query_budget(8)
+def download_timetable(request):
+    token = request.session.get("timetable_token")
+    if not token:
+        # return HttpResponse("No filtered timetable data to export.", status=400)
+        html_content = f"""
+        <p>No filtered timetable data to export.</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
+
+    grid = load_grid(token)
+    if grid is None:
+        # Evicted from the cache: rebuild it from the last lookup
+        grid = get_grid(*request.session["timetable_lookup"])
+
+    response = StreamingHttpResponse(stream_workbook([("Timetable", grid)]), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = 'attachment; filename="timetable.xlsx"'
+    return response
+
+@query_budget(10)
+def export_timetables(request):
+    """Every student's, faculty member's or venue's timetable for a semester in one download."""
+    academic_year = request.GET.get('academic_year')
+    semester = request.GET.get('semester')
+    entity = request.GET.get('entity')
+    export_format = request.GET.get('format', 'zip')
+
+    if not academic_year or not semester or entity not in EXPORT_ENTITIES:
+        return render(request, "export_timetables.html", {"entities": EXPORT_ENTITIES, **filter_options()})
+
+    sheets = iter_entity_grids(entity, academic_year, semester)
+    filename = f"timetables_{entity}_{academic_year}_{semester}"
+    if export_format == 'workbook':
+        response = StreamingHttpResponse(stream_workbook(sheets), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    else:
+        response = StreamingHttpResponse(stream_zip(entity, sheets), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    return response
@@ -0,0 +1,146 @@
+import io
+import re
+import tempfile
+import zipfile
+from functools import cache
+from itertools import groupby
+from operator import itemgetter
+
+from .models import Class, Registration
+from .lookups import grid_from_rows, semester_rows_by_class
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_ENTITIES = ('student', 'faculty', 'venue')
+STREAM_CHUNK_SIZE = 64 * 1024
+# openpyxl is imported by the functions that write workbooks, so importing
+# this module (as every web worker does through the URLconf) stays cheap.
+
+
+@cache
+def _styles():
+    """Header font and cell alignment, shared by every cell so a workbook carries two styles, not one per cell."""
+    from openpyxl.styles import Alignment, Font
+    return Font(bold=True), Alignment(wrap_text=True, vertical="center", horizontal="center")
+
+
+def cell_text(entries):
+    if not entries:
+        return "--"
+    return "\n".join(f"{e['course_name']} ({e['course_code']}) Venue: {e['venue']} /" for e in entries)
+
+
+def write_grid(workbook, title, grid):
+    """Append a Day / Slot sheet for grid to a write-only workbook."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    header_font, cell_alignment = _styles()
+    ws = workbook.create_sheet(title=title)
+    for col in range(1, len(grid['slots']) + 2):
+        ws.column_dimensions[get_column_letter(col)].width = 20
+
+    def header(value):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = header_font
+        return cell
+
+    ws.append([header("Day / Slot")] + [header(slot) for slot in grid['slots']])
+    for day in grid['days']:
+        row = [header(day)]
+        for slot in grid['slots']:
+            cell = WriteOnlyCell(ws, value=cell_text(grid['timetable'].get(day, {}).get(slot)))
+            cell.alignment = cell_alignment
+            row.append(cell)
+        ws.append(row)
+
+
+def iter_entity_grids(entity, academic_year, semester):
+    """
+    Yield (id, grid) for every student, faculty member or venue with classes
+    in the semester. Uses three queries however many entities there are.
+    """
+    rows_by_class = semester_rows_by_class(academic_year, semester)
+
+    if entity == 'student':
+        links = Registration.objects.filter(
+            main_id__academic_year=academic_year, main_id__semester=semester
+        ).order_by('stud_id', 'main_id').values_list('stud_id', 'main_id')
+    elif entity == 'faculty':
+        links = Class.faculty.through.objects.filter(
+            **{'class__academic_year': academic_year, 'class__semester': semester}
+        ).order_by('faculty_id', 'class_id').values_list('faculty_id', 'class_id')
+    elif entity == 'venue':
+        links = Class.objects.filter(
+            academic_year=academic_year, semester=semester
+        ).exclude(venue__isnull=True).exclude(venue='').order_by('venue', 'main_id').values_list('venue', 'main_id')
+    else:
+        raise ValueError(f"Unknown export entity: {entity}")
+
+    for ident, group in groupby(links.iterator(), key=itemgetter(0)):
+        yield ident, grid_from_rows(row for _, main_id in group for row in rows_by_class.get(main_id, ()))
+
+
+def _safe_name(value):
+    return re.sub(r'[\[\]:*?/\\]', '_', str(value)).strip() or "_"
+
+
+def _unique_title(ident, used):
+    base = _safe_name(ident)[:31]
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f"~{n}"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+def stream_workbook(sheets):
+    """Stream one workbook with a sheet per (title, grid) pair in fixed-size chunks."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for title, grid in sheets:
+        write_grid(workbook, _unique_title(title, used), grid)
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        yield from iter(lambda: output.read(STREAM_CHUNK_SIZE), b"")
+
+
+class _ZipPipe(io.RawIOBase):
+    """Unseekable sink for zipfile; the generator drains it after every member."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(prefix, sheets):
+    """Stream a ZIP holding one single-sheet workbook per (title, grid) pair."""
+    from openpyxl import Workbook
+
+    pipe = _ZipPipe()
+    used = set()
+    # Workbooks are already deflated, so store them as they are
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_STORED) as archive:
+        for title, grid in sheets:
+            workbook = Workbook(write_only=True)
+            write_grid(workbook, "Timetable", grid)
+            buffer = io.BytesIO()
+            workbook.save(buffer)
+            archive.writestr(f"{prefix}_{_unique_title(title, used)}.xlsx", buffer.getvalue())
+            yield pipe.drain()
+    yield pipe.drain()
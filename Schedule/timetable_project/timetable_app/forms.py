@@ -1,5 +1,6 @@
 from django import forms
 from .models import Timetable, Class
+from .weekgrid import current_grid
 
 class FacultyUploadForm(forms.Form):
     file = forms.FileField()
@@ -12,6 +13,12 @@ class CourseUploadForm(forms.Form):
     
 class RegistrationUploadForm(forms.Form):
     file = forms.FileField()
+
+class ClassUploadForm(forms.Form):
+    file = forms.FileField()
+
+class PreferenceUploadForm(forms.Form):
+    file = forms.FileField()
     
 class ClassForm(forms.ModelForm):
     class Meta:
@@ -41,33 +48,16 @@ class YearSemesterForm(forms.Form):
     )
     
 class TimetableForm(forms.ModelForm):
-    DAYS = [
-        (1, 'Monday'),
-        (2, 'Tuesday'),
-        (3, 'Wednesday'),
-        (4, 'Thursday'),
-        (5, 'Friday'),
-        (6, 'Saturday'),
-    ]
-
-    SLOTS = [
-        (1, "9:00 AM - 9:50 AM"),
-        (2, "9:50 AM - 10:40 AM"),
-        (3, "11:00 AM - 11:50 AM"),
-        (4, "11:50 PM - 12:40 PM"),
-        (5, "1:30 PM - 2:15 PM"),
-        (6, "2:15 PM - 3:00 PM"),
-        (7, "3:15 PM - 4:00 PM"),
-        (8, "4:00 PM - 4:45 PM"),
-    ]
-
-    days = forms.MultipleChoiceField(
-        choices=DAYS,
+    # Choices come from the active week grid
+    days = forms.TypedMultipleChoiceField(
+        choices=lambda: list(current_grid().day_names.items()),
+        coerce=int,
         widget=forms.CheckboxSelectMultiple
     )
 
-    slots = forms.MultipleChoiceField(
-        choices=SLOTS,
+    slots = forms.TypedMultipleChoiceField(
+        choices=lambda: list(current_grid().slot_labels.items()),
+        coerce=int,
         widget=forms.CheckboxSelectMultiple
     )
 
@@ -1,30 +1,92 @@
 import random
+import multiprocessing
 from collections import defaultdict
 from .models import Timetable, Class, TimetableStatus, Course
-from .validators import validate_timetable_constraints
+from .validators import validate_timetable_constraints, collect_validator_stats, current_validator_stats
+from .validators import PLACEHOLDER_FACULTY, FACULTY_EXEMPT_COURSES, SHARED_VENUES
+from .coenrolment import coenrolment
+from .weekgrid import current_grid
+from .versions import snapshot
+from .signals import batched_invalidation
+from .softconstraints import compile_soft_constraints
+import django
 from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.db import connections, transaction
 from django.db.models import Q
 
 # Define course slot requirements
 #COURSE_SLOT_REQUIREMENTS = {'DL': 6, 'FS': 6, 'SE': 6, 'CE': 4}
 COURSE_SLOT_REQUIREMENTS = {}
-# Time slots and days
-TIME_SLOTS = [1, 2, 3, 4, 5, 6, 7, 8]
-DAYS = [1, 2, 3, 4, 5, 6]
+# Penalty per student registered for two classes placed in the same slot
+STUDENT_CLASH_PENALTY = 10
+# Share of the initial population seeded from a prior timetable when warm starting
+WARM_START_SHARE = 0.3
+
+
+
+class GAConfig:
+    """
+    Search parameters of a GA run. The defaults are the original hand-picked
+    values; tune_ga searches for better ones.
+    """
+    PARAMETERS = (
+        'initial_population', 'population', 'min_population', 'shrink_after', 'generations',
+        'elite_fraction', 'min_elite', 'parent_fraction', 'stagnation_limit',
+        'mutation_start', 'mutation_end', 'max_retries',
+    )
+
+    def __init__(self, **params):
+        self.initial_population = 50
+        self.population = 30
+        self.min_population = 15  # floor when a stagnating population halves
+        self.shrink_after = 5  # stagnant generations before the population halves
+        self.generations = 100
+        self.elite_fraction = 0.1
+        self.min_elite = 3
+        self.parent_fraction = 0.5
+        self.stagnation_limit = 20
+        self.mutation_start = 0.5  # falls linearly to mutation_end over the generations
+        self.mutation_end = 0.1
+        self.max_retries = 20
+        for name, value in params.items():
+            if name not in self.PARAMETERS:
+                raise TypeError(f"Unknown GA parameter: {name}")
+            setattr(self, name, value)
+        if self.generations < 1:
+            raise ValueError("A GA run needs at least 1 generation.")
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.PARAMETERS}
+
+    def __repr__(self):
+        return f"GAConfig({', '.join(f'{k}={v!r}' for k, v in self.as_dict().items())})"
+
+
+# Every random choice goes through this; solve() replaces it with one seeded
+# for the run so a recorded seed reproduces the timetable. config likewise
+# holds the parameters of the current run.
+rng = random.Random()
+config = GAConfig()
 
 # Precompute all data needed for the algorithm
 def precompute_data(current_year, current_semester, section, dept):
-    global valid_assignments, all_classes, course_class_map
+    global valid_assignments, all_classes, course_class_map, student_matrix, grid, class_faculty, soft, main_courses
+
+    # Students shared between classes, so fitness can see clashes inside an individual
+    student_matrix = coenrolment(current_year, current_semester)
+    # The week being filled, and the bit layout of the occupancy masks in fitness
+    grid = current_grid()
 
     # Fetch all Class instances and store in a dictionary
     all_classes = {
         cls.main_id: cls
-        for cls in Class.objects.select_related('course').filter(
+        for cls in Class.objects.select_related('course').prefetch_related('faculty').filter(
             academic_year=current_year,
             semester=current_semester,
             section_id=section,
             dept=dept
-        )
+        ).order_by('main_id')  # genes follow this order, which a seeded run must not leave to the database
     }
 
     # Map courses to their corresponding class main_id values
@@ -34,30 +96,42 @@ def precompute_data(current_year, current_semester, section, dept):
         if cls.course and cls.course.name:
             course_class_map[cls.course.name].append(cls.main_id)
 
+    # Names of the main ('none') courses, for the per-day and adjacency rules
+    main_courses = {cls.course.name for cls in all_classes.values() if cls.course.course_type == 'none'}
+
+    # Real faculty of each class, so fitness never queries
+    class_faculty = {
+        main_id: [f.faculty_id for f in cls.faculty.all() if f.faculty_name not in PLACEHOLDER_FACULTY]
+        for main_id, cls in all_classes.items()
+    }
+
+    # Preferences and spread compiled into a penalty matrix over (class, day, slot)
+    soft = compile_soft_constraints(grid, all_classes, class_faculty)
+
     # Pre-validate all possible assignments
     print("Pre-computing constraint validation matrix...")
     ##print("DAYS:", DAYS, "Type of first element:", type(DAYS[0]))
     for main_id, cls in all_classes.items():
-        for day in DAYS:
-            #print(f"Processing day: {day}, Type: {type(day)}")
-            for slot in TIME_SLOTS:
-                try:
-                    validate_timetable_constraints(main_id, day, slot, current_year, current_semester, section, dept)
-                    valid_assignments[(main_id, day, slot)] = True
-                except ValidationError:
-                    valid_assignments[(main_id, day, slot)] = False
+        for day, slot in grid.cells:
+            try:
+                validate_timetable_constraints(main_id, day, slot, current_year, current_semester, section, dept)
+                valid_assignments[(main_id, day, slot)] = True
+            except ValidationError:
+                valid_assignments[(main_id, day, slot)] = False
     print("Pre-computation completed.")
 
 # Optimized fitness function using precomputed constraints
 def fitness(individual):
     score = 0
     course_distribution = defaultdict(int)  # Tracks total slots per course
-    clashes = defaultdict(set)  # Tracks faculty clashes per (day, slot)
-    venue_clashes = defaultdict(set)  # Tracks venue clashes per (day, slot)
     course_per_day = defaultdict(lambda: defaultdict(int))  # Tracks course slots per day
-    consecutive_main_courses = defaultdict(list)  # Tracks consecutive main course slots
-    faculty_continuous = defaultdict(list)  # Tracks faculty continuous main course slots
-    main_courses = {cls.course.name for cls in all_classes.values() if cls.course.course_type == 'none'}
+    # Week occupancy masks laid out by the grid, so clash and adjacency checks are AND/shift
+    faculty_busy = defaultdict(int)  # Every class of a faculty member
+    faculty_main = defaultdict(int)  # Main course classes of a faculty member
+    venue_busy = defaultdict(int)
+    course_busy = defaultdict(int)  # Slots of each main course
+    placements = []  # Valid (day, slot, main_id) for the student clash check
+    soft_indices = []  # Soft constraint matrix index of each valid gene
 
     for day, slot, main_id, course_name in individual:
         # Check if assignment is valid (based on precomputed constraints)
@@ -66,36 +140,33 @@ def fitness(individual):
             continue
 
         cls = all_classes[main_id]
+        bit = grid.bit(day, slot)
         course_distribution[course_name] += 1  # Count slots per course
         course_per_day[day][course_name] += 1  # Count course slots per day
         score += 5  # Reward for valid assignment
+        placements.append((day, slot, main_id))
+        soft_indices.append(soft.index(main_id, bit))
 
         # Constraint 1: Slot Uniqueness (handled by validator, covered by valid_assignments)
 
         # Constraint 2: Venue Clashes
-        venue_clashes[(day, slot)].add(cls.venue)
-        if len(venue_clashes[(day, slot)]) > 1:
-            score -= 50  # Penalty for venue clash
+        if cls.venue is not None and cls.venue not in SHARED_VENUES:
+            if venue_busy[cls.venue] & bit:
+                score -= 50  # Penalty for venue clash
+            venue_busy[cls.venue] |= bit
 
         # Constraint 3: Faculty Clashes
-        for faculty in cls.faculty.all():  # Check all faculty
-            if faculty.faculty_name != "Some faculty (-)":
-                clashes[(day, slot)].add(faculty)
-                if len(clashes[(day, slot)]) > 1:
-                    score -= 50  # Penalty for faculty clash
-
-        # Constraint 5: Faculty Continuous Main Courses
-        for faculty in cls.faculty.all():  # Check all faculty
-            if faculty.faculty_name != "Some faculty (-)" and course_name in main_courses:
-                faculty_continuous[(day, faculty)].append((slot, course_name))
+        for faculty_id in class_faculty[main_id]:
+            if faculty_busy[faculty_id] & bit and course_name not in FACULTY_EXEMPT_COURSES:
+                score -= 50  # Penalty for faculty clash
+            faculty_busy[faculty_id] |= bit
+            # Constraint 5: Faculty Continuous Main Courses
+            if course_name in main_courses:
+                faculty_main[faculty_id] |= bit
 
         # Constraint 4: Continuous Assignment Prevention (Main Courses)
         if course_name in main_courses:
-            consecutive_main_courses[(day, course_name)].append(slot)
-        
-        # Constraint 5: Faculty Continuous Main Courses
-        if faculty != "Some faculty (-)" and course_name in main_courses:
-            faculty_continuous[(day, faculty)].append((slot, course_name))
+            course_busy[course_name] |= bit
 
     # Constraint 6: Max 2 Slots for Main Courses per Day
     for day, courses in course_per_day.items():
@@ -103,44 +174,48 @@ def fitness(individual):
             if course in main_courses and count > 2:
                 score -= 50 * (count - 2)  # Penalty for each extra slot
 
-    # Constraint 3: Consecutive Main Courses
-    for (day, course), slots in consecutive_main_courses.items():
-        slots.sort()
-        for i in range(len(slots) - 1):
-            if slots[i + 1] == slots[i] + 1:
-                score -= 50  # Penalty for consecutive main course slots
+    # Constraint 3: Consecutive Main Courses, per pair of adjacent slots
+    for mask in course_busy.values():
+        score -= 50 * grid.pairs(mask).bit_count()
 
-    # Constraint 5: Faculty Continuous Main Courses (Max 2)
-    for (day, faculty), slot_courses in faculty_continuous.items():
-        slots = sorted([slot for slot, course in slot_courses if course in main_courses])
-        for i in range(len(slots) - 2):
-            if slots[i + 2] <= slots[i] + 2:
-                score -= 50  # Penalty for 3+ continuous main courses
+    # Constraint 5: Faculty Continuous Main Courses (Max 2), per run of three slots
+    for mask in faculty_main.values():
+        score -= 50 * grid.triples(mask).bit_count()
+
+    # Constraint 8: Students registered for two classes in the same slot
+    score -= STUDENT_CLASH_PENALTY * student_matrix.clashes(placements)
 
     # Penalty for Unmet Slot Requirements
     for course, required_slots in COURSE_SLOT_REQUIREMENTS.items():
         diff = abs(course_distribution[course] - required_slots)
         score -= diff * 50  # Penalty for slot deviation
 
+    # Soft constraints: slot preferences and spread over the week
+    if soft.active:
+        score -= soft.cost(soft_indices, course_per_day)
+
     return score
 
 # Population generation using precomputed constraints
-def generate_population(current_year, current_semester, section, dept, size=20):
+def generate_population(current_year, current_semester, section, dept, size=20, seed_genes=()):
     population = []
-    for _ in range(size):
+    seeded = int(size * WARM_START_SHARE) if seed_genes else 0
+    for i in range(size):
         individual = list((day, slot, main_id, course_name) for (day, slot), (main_id, course_name) in locked_assignments.items())
+        if i < seeded:
+            individual += seed_genes  # the normal generator fills whatever the prior timetable left open
 
         course_slots_remaining = COURSE_SLOT_REQUIREMENTS.copy()
         for _, _, _, course in individual:
             if course in course_slots_remaining:
                 course_slots_remaining[course] -= 1
 
-        available_slots = [(day, slot) for day in DAYS for slot in TIME_SLOTS if (day, slot) not in locked_slots]
-        main_courses = {cls.course.name for cls in all_classes.values() if cls.course.course_type == 'none'}
+        taken = {(day, slot) for day, slot, _, _ in individual}
+        available_slots = [cell for cell in grid.cells if cell not in taken]
 
         # Keep trying until all slots are assigned or no more assignments are possible
         while available_slots and any(count > 0 for count in course_slots_remaining.values()):
-            random.shuffle(available_slots)
+            rng.shuffle(available_slots)
             assigned_in_iteration = False
 
             for day, slot in available_slots[:]:  # Copy to allow removal
@@ -160,12 +235,12 @@ def generate_population(current_year, current_semester, section, dept, size=20):
                     available_slots.remove((day, slot))
                     continue
 
-                course_name = random.choice(available_courses)
+                course_name = rng.choice(available_courses)
                 valid_classes = [main_id for main_id in course_class_map[course_name]
                                 if valid_assignments.get((main_id, day, slot), False)]
 
                 if valid_classes:
-                    random.shuffle(valid_classes)
+                    rng.shuffle(valid_classes)
                     assigned = False
                     for main_id in valid_classes:
                         try:
@@ -216,22 +291,24 @@ def mutate(individual, generation, max_generations):
     if not individual:
         return individual
 
-    mutation_rate = max(0.5 - (0.4 * generation / max_generations), 0.1)
+    mutation_rate = max(config.mutation_start - ((config.mutation_start - config.mutation_end) * generation / max_generations),
+                        config.mutation_end)
     course_slots = {course: sum(1 for _, _, _, c in individual if c == course) for course in COURSE_SLOT_REQUIREMENTS}
 
     # First, try to fill missing slots for courses below their requirement
-    available_slots = [(day, slot) for day in DAYS for slot in TIME_SLOTS if (day, slot) not in [(d, s) for d, s, _, _ in individual]]
-    random.shuffle(available_slots)
+    taken = {(d, s) for d, s, _, _ in individual}
+    available_slots = [cell for cell in grid.cells if cell not in taken]
+    rng.shuffle(available_slots)
 
     for day, slot in available_slots:
         under_assigned_courses = [c for c, count in course_slots.items() if count < COURSE_SLOT_REQUIREMENTS[c]]
         if not under_assigned_courses:
             break
-        course_name = random.choice(under_assigned_courses)
+        course_name = rng.choice(under_assigned_courses)
         valid_classes = [main_id for main_id in course_class_map[course_name]
                          if valid_assignments.get((main_id, day, slot), False)]
         if valid_classes:
-            main_id = random.choice(valid_classes)
+            main_id = rng.choice(valid_classes)
             individual.append((day, slot, main_id, course_name))
             course_slots[course_name] += 1
 
@@ -240,15 +317,15 @@ def mutate(individual, generation, max_generations):
         day, slot, _, old_course = individual[i]
         if (day, slot) in locked_slots:
             continue
-        if random.random() < mutation_rate:
+        if rng.random() < mutation_rate:
             available_courses = [c for c, count in course_slots.items()
                                  if count < COURSE_SLOT_REQUIREMENTS[c] and c != old_course]
             if available_courses:
-                new_course = random.choice(available_courses)
+                new_course = rng.choice(available_courses)
                 valid_classes = [main_id for main_id in course_class_map[new_course]
                                  if valid_assignments.get((main_id, day, slot), False)]
                 if valid_classes:
-                    main_id = random.choice(valid_classes)
+                    main_id = rng.choice(valid_classes)
                     individual[i] = (day, slot, main_id, new_course)
                     course_slots[old_course] -= 1
                     course_slots[new_course] += 1
@@ -268,7 +345,7 @@ def load_locked_slots(current_year, current_semester, section, dept):
     locked_slots.clear()
     locked_assignments.clear()
 
-    qs = Timetable.objects.select_related('main_id__course').filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).values_list('day', 'slot', 'main_id__main_id', 'main_id__course__name')
+    qs = Timetable.objects.select_related('main_id__course').filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).values_list('day', 'slot', 'main_id__main_id', 'main_id__course__name').order_by('day', 'slot')
 
     for day, slot, main_id, course_name in qs:
         #print(f"Locked slot - Day: {day}, Type: {type(day)}, Slot: {slot}, Main ID: {main_id}, Course: {course_name}")
@@ -277,13 +354,100 @@ def load_locked_slots(current_year, current_semester, section, dept):
         locked_assignments[key] = (main_id, course_name)
 
 
-# Run GA with precomputed validation checks
-def run_ga_logic(current_year, current_semester, section, dept, count=0):
-    print("Running Optimized Genetic Algorithm...")
+def previous_year(academic_year):
+    """'2025_odd' -> '2024_odd'; None when the year is not in that form."""
+    year, sep, parity = academic_year.partition('_')
+    if not year.isdigit():
+        return None
+    return f"{int(year) - 1}{sep}{parity}"
+
+
+def warm_start_genes(from_year, from_semester, section, dept):
+    """
+    Map a prior timetable of the same section onto the current classes: a
+    prior row goes to the class with the same course and faculty, or failing
+    that the same course. Rows that are locked, invalid now, clash with an
+    earlier gene or exceed the course's slot requirement are dropped.
+    """
+    prior = Timetable.objects.filter(
+        main_id__academic_year=from_year, main_id__semester=from_semester,
+        main_id__section_id=section, main_id__dept=dept
+    ).values_list('day', 'slot', 'main_id', 'main_id__course__name').order_by('day', 'slot')
+    prior_faculty = defaultdict(set)
+    for main_id, faculty_id in Class.faculty.through.objects.filter(**{
+        'class__academic_year': from_year, 'class__semester': from_semester,
+        'class__section_id': section, 'class__dept': dept
+    }).values_list('class_id', 'faculty_id'):
+        prior_faculty[main_id].add(faculty_id)
+
+    by_course_faculty = {}
+    by_course = {}
+    for main_id, cls in all_classes.items():
+        faculty = frozenset(f.faculty_id for f in cls.faculty.all())
+        by_course_faculty.setdefault((cls.course.name, faculty), main_id)
+        by_course.setdefault(cls.course.name, main_id)
+
+    genes = []
+    taken = set(locked_slots)
+    remaining = COURSE_SLOT_REQUIREMENTS.copy()
+    for _, course_name in locked_assignments.values():
+        if course_name in remaining:
+            remaining[course_name] -= 1
+    for day, slot, prior_id, course_name in prior:
+        main_id = by_course_faculty.get((course_name, frozenset(prior_faculty[prior_id])), by_course.get(course_name))
+        if main_id is None or (day, slot) in taken or remaining.get(course_name, 0) <= 0:
+            continue
+        if not valid_assignments.get((main_id, day, slot), False):
+            continue
+        genes.append((day, slot, main_id, course_name))
+        taken.add((day, slot))
+        remaining[course_name] -= 1
+    return genes
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def seed_stream(seed, *path):
+    """
+    A Random for one stream under seed, e.g. seed_stream(seed, 'retry', 2).
+    String seeds are hashed, so streams with different paths do not overlap
+    the way seed + n streams do.
+    """
+    return random.Random(':'.join(map(str, (seed,) + path)))
+
+
+# Search for the best timetable without touching the saved one
+def solve(current_year, current_semester, section, dept, count=0, warm_start_from=None, seed=None, ga_config=None):
+    """
+    Returns (assignments, requirements_met, stats): the valid, unlocked
+    (day, slot, main_id, course_name) genes of the best solution. warm_start_from
+    is an optional (academic_year, semester) whose timetable for the same
+    section seeds part of the initial population. Each retry draws from
+    its own seed_stream(seed, 'retry', n), and stats['seed'] records the seed.
+    ga_config is a GAConfig (default: the original parameters).
+    """
+    global rng, config
+    if seed is None:
+        seed = new_seed()
+    if count == 0 and getattr(settings, 'VALIDATOR_STATS', False) and current_validator_stats() is None:
+        # Aggregate the validator's per-rule counters over the run and its retries
+        with collect_validator_stats() as rule_stats:
+            assignments, requirements_met, stats = solve(current_year, current_semester, section, dept, count,
+                                                         warm_start_from, seed, ga_config)
+        print(rule_stats)
+        stats['validator'] = rule_stats.as_dict()
+        return assignments, requirements_met, stats
+    rng = seed_stream(seed, 'retry', count)
+    config = ga_config or GAConfig()
+    print(f"Running Optimized Genetic Algorithm (seed {seed})...")
     
     classes = Class.objects.filter(academic_year=current_year, semester=current_semester, section_id=section, dept=dept)
     relevant_courses = set(cls.course for cls in classes)    
-    for course in relevant_courses:
+    # Cleared and filled in a fixed order, so a seed gives the same run in any process
+    COURSE_SLOT_REQUIREMENTS.clear()
+    for course in sorted(relevant_courses, key=lambda c: c.course_id):
         if course.course_type == 'none':
             COURSE_SLOT_REQUIREMENTS[course.name] = course.hours_per_week
 
@@ -295,11 +459,16 @@ def run_ga_logic(current_year, current_semester, section, dept, count=0):
     load_locked_slots(current_year, current_semester, section, dept)
     precompute_data(current_year, current_semester, section, dept)
 
-    population = generate_population(current_year ,current_semester, section, dept, size=50)
-    generations = 100
+    seed_genes = warm_start_genes(*warm_start_from, section, dept) if warm_start_from else ()
+    if warm_start_from:
+        print(f"Warm start: {len(seed_genes)} genes mapped from {warm_start_from[0]} semester {warm_start_from[1]}")
+
+    population = generate_population(current_year ,current_semester, section, dept, size=config.initial_population, seed_genes=seed_genes)
+    generations = config.generations
     best_fitness = -float('inf')
     stagnation_count = 0
     best_solution = None
+    best_generation = 0
 
     for gen in range(generations):
         fitness_scores = evaluate_population(population)
@@ -310,24 +479,25 @@ def run_ga_logic(current_year, current_semester, section, dept, count=0):
         if current_best_fitness > best_fitness:
             best_fitness = current_best_fitness
             best_solution = sorted_pop[0][1]
+            best_generation = gen
             stagnation_count = 0
             print(f"Generation {gen}: New best fitness: {best_fitness}")
         else:
             stagnation_count += 1
 
-        if stagnation_count >= 20:
+        if stagnation_count >= config.stagnation_limit:
             print(f"Early stopping at generation {gen} - No improvement for {stagnation_count} generations")
             break
 
-        population_size = max(15, len(population)//2) if stagnation_count > 5 else 30
+        population_size = max(config.min_population, len(population)//2) if stagnation_count > config.shrink_after else config.population
 
         population = [individual for _, individual in sorted_pop]
-        elite_count = max(3, population_size // 10)
-        parents = population[:population_size // 2]
+        elite_count = max(config.min_elite, int(population_size * config.elite_fraction))
+        parents = population[:max(2, int(population_size * config.parent_fraction))]
         next_generation = population[:elite_count]
 
         for _ in range(population_size - elite_count):
-            parent1, parent2 = random.sample(parents, 2)
+            parent1, parent2 = rng.sample(parents, 2)
             child = crossover(parent1, parent2)
             child = mutate(child, gen, generations)
             next_generation.append(child)
@@ -359,51 +529,105 @@ def run_ga_logic(current_year, current_semester, section, dept, count=0):
                            for course, required in COURSE_SLOT_REQUIREMENTS.items())
 
     # Retry if solution is invalid or requirements not met
-    if (not valid_solution or not requirements_met) and count < 20:
+    if (not valid_solution or not requirements_met) and count < config.max_retries:
         print(f"Retry {count + 1}: {constraint_violations} constraint violations, Requirements Met={requirements_met}")
-        return run_ga_logic(current_year, current_semester, section, dept, count + 1)
+        return solve(current_year, current_semester, section, dept, count + 1, warm_start_from, seed, config)
+
+    assignments = [gene for gene in best_solution
+                   if (gene[0], gene[1]) not in locked_slots and valid_assignments.get((gene[2], gene[0], gene[1]), False)]
+    stats = {
+        'seed': seed,
+        'fitness': best_fitness,
+        'best_generation': best_generation,
+        'generations': gen + 1,
+        'retries': count,
+        'warm_start_genes': len(seed_genes),
+        'soft_penalty': soft.evaluate([gene for gene in best_solution if valid_assignments.get((gene[2], gene[0], gene[1]), False)]),
+    }
+    return assignments, requirements_met, stats
+
+
+def _solve_in_process(args):
+    return solve(*args)
+
+
+def solve_portfolio(current_year, current_semester, section, dept, size, warm_start_from=None, seed=None, ga_config=None):
+    """
+    Run solve() with `size` seeds derived from `seed` in parallel processes.
+    The first run to meet every requirement wins and the others are stopped;
+    if none does, the fittest result is returned.
+    """
+    if seed is None:
+        seed = new_seed()
+    # Each member's seed comes from its own stream, so that it can be
+    # recorded and replayed by solve() alone
+    seeds = [seed] + [seed_stream(seed, 'member', i).randrange(2 ** 32) for i in range(1, size)]
+    jobs = [(current_year, current_semester, section, dept, 0, warm_start_from, s, ga_config) for s in seeds]
+
+    # Children open their own database connections, and set Django up
+    # themselves when the platform spawns rather than forks them
+    connections.close_all()
+    best = None
+    with multiprocessing.Pool(processes=size, initializer=django.setup) as pool:
+        for result in pool.imap_unordered(_solve_in_process, jobs):
+            if result[1]:
+                best = result
+                break
+            if best is None or result[2]['fitness'] > best[2]['fitness']:
+                best = result
+        pool.terminate()
+    print(f"Portfolio of {size}: seed {best[2]['seed']} chosen")
+    return best
+
+
+# Run GA with precomputed validation checks
+def run_ga_logic(current_year, current_semester, section, dept, count=0, warm_start_from=None, seed=None, portfolio=1, ga_config=None):
+    if portfolio > 1:
+        assignments, requirements_met, stats = solve_portfolio(current_year, current_semester, section, dept, portfolio, warm_start_from, seed, ga_config)
+    else:
+        assignments, requirements_met, stats = solve(current_year, current_semester, section, dept, count, warm_start_from, seed, ga_config)
+    load_locked_slots(current_year, current_semester, section, dept)
 
     # Build a Q object to match all locked (day, slot) pairs
     locked_conditions = Q()
     for day, slot in locked_slots:
         locked_conditions |= Q(day=day, slot=slot)
 
-    # Delete only entries that are NOT in locked slots
-    if locked_conditions:
-        Timetable.objects.filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).exclude(locked_conditions).delete()
-    else:
-        Timetable.objects.filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).delete()
+    # The snapshots, the new timetable and its status are saved together or
+    # not at all, and the cache and occupancy index are invalidated once
+    with transaction.atomic(), batched_invalidation() as touched:
+        # Keep the timetable this run replaces, so it can be compared or rolled back to
+        snapshot(current_year, current_semester, section, dept, reason="before GA run")
 
-    successful_assignments = 0
-    #print("Best solution:", best_solution)
-    for day, slot, main_id, course_name in best_solution:
-        #print(f"Day: {day}, Type: {type(day)}, Slot: {slot}, Main ID: {main_id}, Course: {course_name}")
-        if (day, slot) in locked_slots:
-            continue
-        if valid_assignments.get((main_id, day, slot), False):
-            try:
-                Timetable.objects.create(
-                    main_id=all_classes[main_id],
-                    day=day,
-                    slot=slot
-                )
-                successful_assignments += 1
-            except Exception as e:
-                print(f"Error creating timetable entry: {e}")
-
-    print(f"Created {successful_assignments} timetable entries")
-
-    timetable_status, _ = TimetableStatus.objects.get_or_create(
-        academic_year=current_year,
-        semester=current_semester,
-        section=section,
-        dept=dept,
-        defaults={'id': 1}
-    )
+        # Delete only entries that are NOT in locked slots
+        if locked_conditions:
+            Timetable.objects.filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).exclude(locked_conditions).delete()
+        else:
+            Timetable.objects.filter(main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).delete()
+
+        Timetable.objects.bulk_create([
+            Timetable(main_id_id=main_id, day=day, slot=slot)
+            for day, slot, main_id, course_name in assignments
+        ])
+        touched.update(main_id for _, _, main_id, _ in assignments)  # bulk_create sends no signals
+        print(f"Created {len(assignments)} timetable entries")
+        version = snapshot(current_year, current_semester, section, dept, reason="GA run", ga_seed=stats['seed'])
+        print(f"Saved as version {version.number}")
+
+        timetable_status, _ = TimetableStatus.objects.get_or_create(
+            academic_year=current_year,
+            semester=current_semester,
+            section=section,
+            dept=dept
+        )
+        timetable_status.ga_seed = stats['seed']
+        update_fields = ['ga_seed']
+        if requirements_met:
+            timetable_status.status = 'completed'
+            update_fields.append('status')
+        timetable_status.save(update_fields=update_fields)
+    print(f"Seed {stats['seed']} recorded; pass it again to reproduce this timetable.")
     if requirements_met:
-        timetable_status.status = 'completed' 
-        timetable_status.save()
         print("Optimized Genetic Algorithm completed successfully.")
-        
     else:
         print("Optimized Genetic Algorithm completed with partial solution.")
\ No newline at end of file
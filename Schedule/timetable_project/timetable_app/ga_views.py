@@ -0,0 +1,61 @@
+# Running the GA from the web. ga.py is imported by the view on the first run,
+# not when the URLconf loads.
+from django.shortcuts import redirect
+from django.http import HttpResponse
+from django.contrib.auth.decorators import login_required
+from django.conf import settings
+
+from .models import TimetableStatus
+
+
+@login_required
+def run_genetic_algorithm(request):
+    current_year = request.session.get('current_year')
+    current_semester = request.session.get('current_semester')
+    section = request.session.get('section')
+    dept = request.session.get('dept')
+    
+    timetable_status = TimetableStatus.objects.filter(academic_year=current_year, semester=current_semester, section=section, dept=dept).first()
+
+    if request.user.role != 'Department_Coordinator':
+        html_content = f"""
+        <p>You are not authorized to run the Genetic Algorithm.</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
+
+    if timetable_status.status != 'ga_running':
+        html_content = f"""
+        <p>GA can't run yet!</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
+
+    if not current_year or not current_semester:
+        html_content = f"""
+        <p>Missing year or semester.</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
+
+    # Imported here so web workers that never run the GA do not load it
+    from .ga import run_ga_logic, previous_year, GAConfig
+
+    try:
+        # Optionally seed the search with last year's timetable for this section
+        prior_year = previous_year(current_year) if request.POST.get('warm_start') else None
+        warm_start_from = (prior_year, current_semester) if prior_year else None
+        # A seed from an earlier run reproduces it; otherwise a fresh one is drawn and recorded
+        seed = int(request.POST['seed']) if request.POST.get('seed', '').strip().isdigit() else None
+        run_ga_logic(current_year, current_semester, section, dept, warm_start_from=warm_start_from,
+                     seed=seed, portfolio=getattr(settings, 'GA_PORTFOLIO_SIZE', 1),
+                     ga_config=GAConfig(**getattr(settings, 'GA_CONFIG', {})))
+        # timetable_status.status = 'completed'
+        # timetable_status.save()
+        return redirect('view_timetable')
+    except Exception as e:
+        html_content = f"""
+        <p>Error running GA: {e}</p>
+        <a href='javascript:history.back()'>Go back to previous page</a>
+        """
+        return HttpResponse(html_content)
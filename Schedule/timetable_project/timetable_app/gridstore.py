@@ -0,0 +1,53 @@
+import hashlib
+import json
+
+from .cache import get_value, set_value
+
+
+def encode_grid(grid):
+    """
+    Pack a grid into int arrays plus a string table:
+    cells is a flat list of (day, slot, name, code, venue) with the last
+    three as indexes into strings.
+    """
+    strings = []
+    index = {}
+
+    def intern(value):
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    cells = []
+    for day in grid['days']:
+        for slot, entries in sorted(grid['timetable'].get(day, {}).items()):
+            for e in entries:
+                cells += [day, slot, intern(e['course_name']), intern(e['course_code']), intern(e['venue'])]
+    return {'strings': strings, 'days': grid['days'], 'slots': grid['slots'], 'cells': cells}
+
+
+def decode_grid(packed):
+    strings = packed['strings']
+    cells = packed['cells']
+    timetable = {}
+    for i in range(0, len(cells), 5):
+        day, slot, name, code, venue = cells[i:i + 5]
+        timetable.setdefault(day, {}).setdefault(slot, []).append(
+            {'course_name': strings[name], 'course_code': strings[code], 'venue': strings[venue]}
+        )
+    return {'timetable': timetable, 'days': packed['days'], 'slots': packed['slots']}
+
+
+def save_grid(grid):
+    """Store a grid under the hash of its content and return that hash as the token."""
+    packed = encode_grid(grid)
+    token = hashlib.sha1(json.dumps(packed, separators=(',', ':')).encode()).hexdigest()
+    set_value('packed', (token,), packed)
+    return token
+
+
+def load_grid(token):
+    """The grid saved under token, or None if it has been evicted."""
+    packed = get_value('packed', (token,))
+    return decode_grid(packed) if packed is not None else None
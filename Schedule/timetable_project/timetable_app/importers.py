@@ -0,0 +1,321 @@
+import csv
+import io
+import time
+from contextlib import nullcontext
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Class, Course, Faculty
+from .signals import bump_model
+
+CHUNK_SIZE = 2000
+
+
+class ImportDataError(Exception):
+    pass
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        updated = f"{self.updated} updated, " if self.updated else ""
+        return (f"{self.rows} rows read, {self.created} created, {updated}{self.skipped} already present "
+                f"({self.rows_per_second:.0f} rows/sec)")
+
+
+def _open_rows(file):
+    if file.name.endswith('.csv'):
+        return csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    return workbook.active.iter_rows(values_only=True)
+
+
+def _header(row):
+    return [str(col).strip() if col is not None else '' for col in row]
+
+
+def _rows_as_dicts(rows, positions):
+    for row in rows:
+        if not any(cell not in (None, '') for cell in row):
+            continue  # blank line
+        yield {col: row[pos] if pos < len(row) else None for col, pos in positions.items()}
+
+
+def read_rows(file, required_columns):
+    """Stream the rows of an uploaded CSV or Excel file as dicts of the required columns."""
+    rows = _open_rows(file)
+    header = _header(next(rows, ()))
+    if not set(required_columns).issubset(header):
+        raise ImportDataError(f"Invalid file format! Required columns: {', '.join(required_columns)}.")
+    return _rows_as_dicts(rows, {col: header.index(col) for col in required_columns})
+
+
+def _clean(field, value):
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        return None if field.null else field.get_default()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if field.is_relation:
+        return field.target_field.to_python(value)
+    return field.to_python(value)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _key_columns(model, required_columns):
+    # Rows are identified by primary key when the sheet carries it,
+    # otherwise by the full set of columns (e.g. Registration pairs).
+    pk_name = model._meta.pk.name
+    return (pk_name,) if pk_name in required_columns else tuple(required_columns)
+
+
+def _existing_keys(model, key_columns, records):
+    filters = {f"{col}__in": {record[col] for _, record in records} for col in key_columns}
+    return set(model.objects.filter(**filters).values_list(*key_columns))
+
+
+def _report(errors, row_number, message):
+    if errors is None:
+        raise ImportDataError(f"Row {row_number}: {message}")
+    errors.append({'row': row_number, 'error': message})
+
+
+def _resolve_relations(fields, records, errors):
+    """Check every foreign key in the chunk with one in_bulk() per related model."""
+    for col, field in fields.items():
+        if not field.is_relation:
+            continue
+        related = field.related_model
+        found = related.objects.only('pk').in_bulk({record[col] for _, record in records})
+        resolved = []
+        for row_number, record in records:
+            if record[col] not in found:
+                _report(errors, row_number, f"{related.__name__} with ID {record[col]} does not exist.")
+                continue
+            record[col] = found[record[col]]
+            resolved.append((row_number, record))
+        records = resolved
+    return records
+
+
+def import_rows(model, rows, required_columns, chunk_size=CHUNK_SIZE, errors=None, on_chunk=None):
+    """
+    Insert new rows for model in fixed-size chunks.
+
+    Rows that already exist (by primary key, or by all required columns when
+    the primary key is not part of the file) are skipped. By default the
+    import is one transaction and the first bad row raises ImportDataError.
+    When an errors list is given, bad rows are recorded there and skipped
+    instead, and every chunk commits on its own so on_chunk(stats) can
+    publish progress.
+    """
+    stats = ImportStats()
+    fields = {col: model._meta.get_field(col) for col in required_columns}
+    key_columns = _key_columns(model, required_columns)
+    started = time.perf_counter()
+
+    with transaction.atomic() if errors is None else nullcontext():
+        for chunk in _chunks(rows, chunk_size):
+            records = []
+            for row in chunk:
+                stats.rows += 1
+                row_number = stats.rows + 1  # 1-based, after the header
+                try:
+                    records.append((row_number, {col: _clean(field, row[col]) for col, field in fields.items()}))
+                except ValidationError as e:
+                    _report(errors, row_number, '; '.join(e.messages))
+
+            with transaction.atomic():
+                seen = _existing_keys(model, key_columns, records)
+                new_records = []
+                for row_number, record in records:
+                    key = tuple(record[col] for col in key_columns)
+                    if key in seen:
+                        stats.skipped += 1
+                        continue
+                    seen.add(key)
+                    new_records.append((row_number, record))
+
+                new_records = _resolve_relations(fields, new_records, errors)
+                model.objects.bulk_create([model(**record) for _, record in new_records], batch_size=chunk_size)
+                stats.created += len(new_records)
+
+            stats.seconds = time.perf_counter() - started
+            if on_chunk:
+                on_chunk(stats)
+
+    stats.seconds = time.perf_counter() - started
+    if stats.created:
+        bump_model(model)  # bulk_create skips the invalidation signals; new rows touch no class yet
+    return stats
+
+
+def import_file(model, file, required_columns, chunk_size=CHUNK_SIZE, errors=None, on_chunk=None):
+    return import_rows(model, read_rows(file, required_columns), required_columns, chunk_size, errors, on_chunk)
+
+
+# Column order of headerless class exports such as class_list.xlsx
+CLASS_COLUMNS = ['main_id', 'section_id', 'academic_year', 'semester', 'dept', 'venue', 'course', 'faculty']
+CLASS_KEY = ('course', 'section_id', 'academic_year', 'semester', 'dept')
+
+
+def read_class_rows(file):
+    """
+    Stream class rows from a file with a header row (main_id optional) or
+    from a headerless export in CLASS_COLUMNS order. The faculty column may
+    hold several comma-separated ids, and a class may span several rows.
+    """
+    rows = _open_rows(file)
+    first = next(rows, ())
+    header = _header(first)
+    if 'course' in header:
+        required = [col for col in CLASS_COLUMNS if col != 'main_id']
+        if not set(required).issubset(header):
+            raise ImportDataError(f"Invalid file format! Required columns: {', '.join(required)}.")
+        positions = {col: header.index(col) for col in CLASS_COLUMNS if col in header}
+    else:
+        positions = {col: pos for pos, col in enumerate(CLASS_COLUMNS)}
+        rows = chain([first], rows)
+    return _rows_as_dicts(rows, positions)
+
+
+def _class_keys(keys):
+    """main_id and venue of the existing classes among the given unique_together keys."""
+    found = Class.objects.filter(
+        course__in={key[0] for key in keys},
+        academic_year__in={key[2] for key in keys},
+        semester__in={key[3] for key in keys},
+    ).values_list('course_id', 'section_id', 'academic_year', 'semester', 'dept', 'main_id', 'venue')
+    return {tuple(row[:5]): (row[5], row[6]) for row in found if tuple(row[:5]) in keys}
+
+
+def _faculty_ids(value):
+    return {str(fid).strip() for fid in str(value or '').split(',') if str(fid).strip()}
+
+
+def import_classes(rows, chunk_size=CHUNK_SIZE, errors=None, on_chunk=None):
+    """
+    Upsert classes on their unique_together key and link their faculty, in
+    fixed-size chunks.
+
+    Per chunk, courses and faculty are checked with one in_bulk() each, new
+    classes are inserted with bulk_create, changed venues with bulk_update,
+    and the missing faculty links with a single bulk_create on the through
+    table. Errors, transactions and on_chunk work as in import_rows; a row
+    naming an unknown course or faculty member is rejected whole. Returns
+    (stats, number of faculty links created).
+    """
+    stats = ImportStats()
+    fields = {col: Class._meta.get_field(col) for col in CLASS_COLUMNS if col != 'faculty'}
+    started = time.perf_counter()
+    links_created = 0
+    semesters = set()
+    counted = set()  # keys of classes, which may span chunks, already in the stats
+
+    with transaction.atomic() if errors is None else nullcontext():
+        for chunk in _chunks(rows, chunk_size):
+            parsed = []
+            for row in chunk:
+                stats.rows += 1
+                row_number = stats.rows + 1
+                try:
+                    record = {col: _clean(field, row.get(col)) for col, field in fields.items()}
+                except ValidationError as e:
+                    _report(errors, row_number, '; '.join(e.messages))
+                    continue
+                parsed.append((row_number, tuple(record[col] for col in CLASS_KEY), record, _faculty_ids(row.get('faculty'))))
+
+            courses = Course.objects.only('pk').in_bulk({key[0] for _, key, _, _ in parsed})
+            faculty = Faculty.objects.only('pk').in_bulk(set().union(*(ids for *_, ids in parsed)))
+            records = {}
+            faculty_ids = {}
+            for row_number, key, record, ids in parsed:
+                if key[0] not in courses:
+                    _report(errors, row_number, f"Course with ID {key[0]} does not exist.")
+                    continue
+                missing = sorted(ids - faculty.keys())
+                if missing:
+                    _report(errors, row_number, f"Faculty with ID {', '.join(missing)} does not exist.")
+                    continue
+                records.setdefault(key, (row_number, record))
+                faculty_ids.setdefault(key, set()).update(ids)
+
+            with transaction.atomic():
+                existing = _class_keys(set(records))
+
+                changed = []
+                for key, (main_id, venue) in existing.items():
+                    new_venue = records[key][1]['venue']
+                    if new_venue != venue:
+                        changed.append(Class(main_id=main_id, venue=new_venue))
+                        stats.updated += 1
+                    elif key not in counted:
+                        stats.skipped += 1
+                Class.objects.bulk_update(changed, ['venue'])
+
+                new_records = {key: (row_number, record) for key, (row_number, record) in records.items() if key not in existing}
+                explicit_ids = {record['main_id'] for _, record in new_records.values() if record['main_id'] is not None}
+                taken = set(Class.objects.filter(main_id__in=explicit_ids).values_list('main_id', flat=True))
+                for key, (row_number, record) in list(new_records.items()):
+                    if record['main_id'] is None:
+                        continue
+                    if record['main_id'] in taken:
+                        # Held by an existing class or an earlier row of the chunk
+                        _report(errors, row_number, f"Class with ID {record['main_id']} already exists for another course or section.")
+                        del new_records[key], records[key]
+                    else:
+                        taken.add(record['main_id'])
+
+                Class.objects.bulk_create([
+                    Class(**{col: value for col, value in record.items() if col != 'course'}, course_id=record['course'])
+                    for _, record in new_records.values()
+                ])
+                stats.created += len(new_records)
+
+                # Re-read ids rather than relying on bulk_create, which MySQL cannot populate
+                main_ids = {key: main_id for key, (main_id, _) in _class_keys(set(records)).items()}
+                Through = Class.faculty.through
+                linked = set(Through.objects.filter(class_id__in=main_ids.values()).values_list('class_id', 'faculty_id'))
+                links = [
+                    Through(class_id=main_ids[key], faculty_id=faculty_id)
+                    for key in records for faculty_id in faculty_ids[key]
+                    if (main_ids[key], faculty_id) not in linked
+                ]
+                # Still ignore conflicts, for links another request adds meanwhile
+                Through.objects.bulk_create(links, ignore_conflicts=True)
+                links_created += len(links)
+
+            counted.update(records)
+            semesters.update(key[2:4] for key in records)
+            stats.seconds = time.perf_counter() - started
+            if on_chunk:
+                on_chunk(stats)
+
+    stats.seconds = time.perf_counter() - started
+    if semesters:
+        bump_model(Class, semesters)  # bulk operations skip the invalidation signals
+    return stats, links_created
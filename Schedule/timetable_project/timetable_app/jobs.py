@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ImportJob, Faculty, Course, Student, Registration, SlotPreference, SpreadPreference
+from .importers import import_file, import_classes, read_class_rows, ImportDataError
+
+IMPORT_COLUMNS = {
+    'Registration': (Registration, ['stud_id', 'main_id']),
+    'Student': (Student, ['stud_id', 'name', 'department']),
+    'Faculty': (Faculty, ['faculty_id', 'faculty_name', 'department']),
+    'Course': (Course, ['course_id', 'name', 'code', 'course_type', 'hours_per_week', 'offered_to']),
+    'SlotPreference': (SlotPreference, ['faculty', 'course', 'course_type', 'day', 'slot', 'penalty']),
+    'SpreadPreference': (SpreadPreference, ['course', 'course_type', 'weight']),
+}
+MAX_REPORTED_ERRORS = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _content_hash(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def enqueue_import(model_name, file):
+    """
+    Store an uploaded file as an ImportJob and return (job, created).
+
+    Uploading a file with the same content again returns the existing job
+    unless that job failed, in which case it is queued again.
+    """
+    content_hash = _content_hash(file)
+    job, created = ImportJob.objects.get_or_create(
+        model=model_name, content_hash=content_hash, defaults={'file': file}
+    )
+    if not created and job.status == 'failed':
+        job.file.delete(save=False)
+        job.file = file
+        job.status = 'queued'
+        job.chunks_done = job.rows_processed = job.rows_created = job.rows_skipped = job.error_count = 0
+        job.errors = []
+        job.message = ""
+        job.finished_at = None
+        job.save()
+        created = True
+
+    if created and getattr(settings, 'IMPORT_JOBS_IN_THREAD', True):
+        thread = threading.Thread(target=_process_in_thread, args=(job.pk,), daemon=True)
+        transaction.on_commit(thread.start)
+    return job, created
+
+
+def claim_job(job_id):
+    """Atomically move a queued job to running; False if another worker got it first."""
+    return ImportJob.objects.filter(pk=job_id, status='queued').update(status='running') == 1
+
+
+def process_job(job):
+    errors = []
+
+    def save_progress(stats):
+        job.chunks_done += 1
+        job.rows_processed = stats.rows
+        job.rows_created = stats.created
+        job.rows_skipped = stats.skipped
+        job.error_count = len(errors)
+        job.errors = errors[:MAX_REPORTED_ERRORS]
+        job.rows_per_second = stats.rows_per_second
+        job.save(update_fields=['chunks_done', 'rows_processed', 'rows_created', 'rows_skipped',
+                                'error_count', 'errors', 'rows_per_second'])
+
+    try:
+        with job.file.open('rb') as file:
+            if job.model == 'Class':
+                _, links = import_classes(read_class_rows(file), errors=errors, on_chunk=save_progress)
+                job.message = f"{links} faculty links created"
+            else:
+                model, required_columns = IMPORT_COLUMNS[job.model]
+                import_file(model, file, required_columns, errors=errors, on_chunk=save_progress)
+        job.status = 'done'
+    except ImportDataError as e:
+        job.status = 'failed'
+        job.message = str(e)
+    except Exception as e:
+        job.status = 'failed'
+        job.message = f"Unexpected error: {e}"
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'finished_at'])
+    return job
+
+
+def _process_in_thread(job_id):
+    try:
+        if claim_job(job_id):
+            process_job(ImportJob.objects.get(pk=job_id))
+    finally:
+        connection.close()
+
+
+def run_worker(once=False, poll_interval=2, log=logger.info):
+    """Process queued jobs oldest first, passing a summary of each to log; with once=True stop when the queue is empty."""
+    while True:
+        job_ids = list(ImportJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True))
+        for job_id in job_ids:
+            if claim_job(job_id):
+                job = process_job(ImportJob.objects.get(pk=job_id))
+                log(f"{job}: {job.rows_processed} rows, {job.error_count} errors, "
+                    f"{job.rows_per_second:.0f} rows/sec")
+        if once and not job_ids:
+            return
+        if not job_ids:
+            time.sleep(poll_interval)
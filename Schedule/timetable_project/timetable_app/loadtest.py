@@ -0,0 +1,253 @@
+import http.cookiejar
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+
+from .models import Class, Course, CustomUser, Faculty, Registration, Student, TimetableStatus
+from .tuning import SYNTHETIC_YEAR, make_synthetic_sections, delete_synthetic_sections
+from .exports import EXPORT_ENTITIES
+from .weekgrid import current_grid
+
+LOADTEST_USER = 'loadtest'
+DEFAULT_MIX = {'student': 80, 'coordinator': 15, 'export': 5}
+CURRENT_COURSE = re.compile(r"Current course to be assigned:</strong>\s*([^<]*?)\s*</p>")
+CLASS_OPTION = re.compile(r'<option value="(\d+)">\s*(.+?) \(')
+
+
+def fetch(url, timeout=30):
+    """(status, seconds) of one GET; status 0 when the request failed outright."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def run_load(urls, concurrency, requests, timeout=30):
+    """
+    GET the urls round robin, `requests` times in all from `concurrency`
+    threads. Returns ([(url, status, seconds)], wall seconds).
+    """
+    jobs = [urls[i % len(urls)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda url: (url, *fetch(url, timeout)), jobs))
+    return results, time.perf_counter() - started
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def summarize(samples, wall):
+    """Latency percentiles (ms), throughput and error rate of (status, seconds) samples."""
+    latency = [seconds * 1000 for _, seconds in samples]
+    errors = sum(1 for status, _ in samples if not 200 <= status < 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'throughput': len(samples) / wall if wall else 0.0,
+        'latency_ms_p50': percentile(latency, 0.5),
+        'latency_ms_p95': percentile(latency, 0.95),
+        'latency_ms_p99': percentile(latency, 0.99),
+    }
+
+
+def seed_dataset(sections=10, students_per_section=30, seed=0):
+    """
+    The synthetic sections of tuning.make_synthetic_sections, each with a
+    department course for coordinators to assign, registered students and a
+    timetable open to department coordinators, plus a coordinator login with
+    a fresh random password. Returns the dataset the scenarios run against.
+    """
+    delete_dataset()
+    rng = random.Random(seed)
+    created = make_synthetic_sections(sections, seed)
+    password = secrets.token_urlsafe(12)
+    faculty = list(Faculty.objects.filter(faculty_id__startswith='syn-f'))
+    with transaction.atomic():
+        students = {}
+        for year, semester, section, dept in created:
+            course = Course.objects.create(
+                course_id=f'syn-{section}-lab', name=f'SYN{section}-LAB', code='LAB',
+                course_type='dept', hours_per_week=3
+            )
+            lab = Class.objects.create(course=course, section_id=section, academic_year=year,
+                                       semester=semester, dept=dept, venue=f'SYN-LAB-{section}')
+            lab.faculty.add(rng.choice(faculty))
+            students[section] = [f'syn-s{section}-{i}' for i in range(students_per_section)]
+            Student.objects.bulk_create([Student(stud_id=s, name=s, department=dept) for s in students[section]])
+            classes = Class.objects.filter(academic_year=year, semester=semester, section_id=section, dept=dept)
+            Registration.objects.bulk_create([
+                Registration(stud_id_id=s, main_id=cls) for cls in classes for s in students[section]
+            ])
+            TimetableStatus.objects.create(academic_year=year, semester=semester, section=section, dept=dept,
+                                           status='dept_coordinator')
+        CustomUser.objects.create_user(LOADTEST_USER, password=password, role='Department_Coordinator')
+    return {'sections': created, 'students': students, 'username': LOADTEST_USER, 'password': password}
+
+
+def load_dataset(username, password):
+    """The dataset left by an earlier seed_dataset, for a run against the same database."""
+    sections = sorted(set(Class.objects.filter(academic_year=SYNTHETIC_YEAR).values_list(
+        'academic_year', 'semester', 'section_id', 'dept')))
+    students = defaultdict(list)
+    for stud_id in Student.objects.filter(stud_id__startswith='syn-s').values_list('stud_id', flat=True):
+        students[stud_id[len('syn-s'):].split('-')[0]].append(stud_id)
+    return {'sections': sections, 'students': dict(students), 'username': username, 'password': password}
+
+
+def delete_dataset():
+    TimetableStatus.objects.filter(academic_year=SYNTHETIC_YEAR).delete()
+    Student.objects.filter(stud_id__startswith='syn-s').delete()
+    CustomUser.objects.filter(username=LOADTEST_USER).delete()
+    delete_synthetic_sections()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Every endpoint is timed on its own, so redirects are not followed
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """One virtual user: a cookie session against base_url that records every request."""
+
+    def __init__(self, base_url, record, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.record = record
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.logged_in = False
+
+    def request(self, label, path, data=None):
+        """(status, body text) of one request; status 0 when it failed outright."""
+        headers = {}
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data, doseq=True).encode()
+            csrf = next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+            headers = {'X-CSRFToken': csrf, 'Content-Type': 'application/x-www-form-urlencoded'}
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, body, headers), timeout=self.timeout) as response:
+                status, text = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, text = e.code, b''
+        except OSError:
+            status, text = 0, b''
+        self.record((label, status, time.perf_counter() - started))
+        return status, text.decode('utf-8', 'replace')
+
+    def login(self, dataset):
+        self.request('login GET', '/')
+        self.request('login POST', '/', {
+            'username': dataset['username'], 'password': dataset['password'], 'role': 'Department_Coordinator'
+        })
+        self.logged_in = True
+
+
+def student_lookup(client, rng, dataset):
+    """A student looks up their timetable, reads it as JSON and sometimes downloads it."""
+    year, semester, section, dept = rng.choice(dataset['sections'])
+    stud_id = rng.choice(dataset['students'][section])
+    client.request('view_timetable GET', '/view-timetable/')
+    client.request('view_timetable POST', '/view-timetable/', {
+        'user_input': stud_id, 'academic_year': year, 'semester': semester, 'section': section, 'dept': dept
+    })
+    client.request('timetable_json', f'/api/timetables/student/{stud_id}/?academic_year={year}&semester={semester}')
+    if rng.random() < 0.2:
+        client.request('download_timetable', '/download-timetable/')
+
+
+def coordinator_assignment(client, rng, dataset):
+    """A department coordinator opens a section and assigns its current course to a random cell."""
+    if not client.logged_in:
+        client.login(dataset)
+    year, semester, section, dept = rng.choice(dataset['sections'])
+    client.request('select_year_semester', '/select_year_semester/', {
+        'academic_year': year, 'semester': semester, 'section': section, 'dept': dept
+    })
+    _, page = client.request('add_timetable GET', '/add_timetable/')
+    current = CURRENT_COURSE.search(page)
+    main_id = next((m for m, name in CLASS_OPTION.findall(page) if current and name == current.group(1)), None)
+    if main_id is not None:
+        day, slot = rng.choice(dataset['cells'])
+        client.request('add_timetable POST', '/add_timetable/', {'main_id': main_id, 'days': [day], 'slots': [slot]})
+
+
+def export(client, rng, dataset):
+    """Someone downloads every timetable of one kind for the semester."""
+    year, semester, _, _ = rng.choice(dataset['sections'])
+    client.request('export_timetables', f'/export-timetables/?academic_year={year}&semester={semester}'
+                                        f'&entity={rng.choice(EXPORT_ENTITIES)}')
+
+
+SCENARIOS = {'student': student_lookup, 'coordinator': coordinator_assignment, 'export': export}
+
+
+def run_mix(base_url, dataset, mix=DEFAULT_MIX, users=20, duration=30, seed=0, think=0.0, timeout=30):
+    """
+    Run `users` virtual users for `duration` seconds, each picking scenarios
+    by the weights in mix, with an exponential think time of mean `think`
+    seconds between them. Returns the report: per-endpoint and overall
+    latency percentiles, throughput and error rate, and scenario counts.
+    """
+    dataset = {**dataset, 'cells': current_grid().cells}
+    samples = []
+    scenarios = Counter()
+    failures = Counter()
+    lock = threading.Lock()
+    names, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+
+    def virtual_user(n):
+        rng = random.Random(seed * 1000 + n)
+        client = Client(base_url, samples.append, timeout)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            try:
+                SCENARIOS[name](client, rng, dataset)
+                outcome = scenarios
+            except Exception:
+                outcome = failures
+            with lock:
+                outcome[name] += 1
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(users) as pool:
+        list(pool.map(virtual_user, range(users)))
+    wall = time.perf_counter() - started
+
+    by_endpoint = defaultdict(list)
+    for label, status, seconds in samples:
+        by_endpoint[label].append((status, seconds))
+    return {
+        'base_url': base_url,
+        'users': users,
+        'duration': wall,
+        'mix': dict(mix),
+        'scenarios': dict(scenarios),
+        'scenario_failures': dict(failures),
+        'endpoints': {label: summarize(values, wall) for label, values in sorted(by_endpoint.items())},
+        'total': summarize([(status, seconds) for _, status, seconds in samples], wall),
+    }
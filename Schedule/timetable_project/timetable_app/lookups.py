@@ -0,0 +1,254 @@
+import hashlib
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Q
+
+from .models import Timetable, Class, Student, Faculty, Registration
+from .cache import get_or_build, aget_or_build, set_value, delete_value, semester_scope, timeout
+from .cache import CLASSES_SCOPE, ENTITY_SCOPE
+
+GRID_FIELDS = ('day', 'slot', 'main_id__course__name', 'main_id__course__code', 'main_id__venue')
+
+
+def filter_options():
+    """Distinct values for the year/semester/section/dept dropdowns."""
+    def build():
+        classes = Class.objects.all()
+        return {
+            'years': list(classes.values_list('academic_year', flat=True).distinct()),
+            'semesters': list(classes.values_list('semester', flat=True).distinct()),
+            'section': list(classes.values_list('section_id', flat=True).distinct()),
+            'dept': list(classes.values_list('dept', flat=True).distinct()),
+        }
+    return get_or_build('filters', (), build, CLASSES_SCOPE)
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+async def afilter_options():
+    """filter_options for async views."""
+    async def build():
+        classes = Class.objects.all()
+        return {
+            'years': await alist(classes.values_list('academic_year', flat=True).distinct()),
+            'semesters': await alist(classes.values_list('semester', flat=True).distinct()),
+            'section': await alist(classes.values_list('section_id', flat=True).distinct()),
+            'dept': await alist(classes.values_list('dept', flat=True).distinct()),
+        }
+    return await aget_or_build('filters', (), build, CLASSES_SCOPE)
+
+
+def resolve_entity(user_input):
+    """Return 'admin', 'student', 'faculty' or 'venue' for a lookup string, or None."""
+    if user_input.lower() == "admin":
+        return 'admin'
+
+    def build():
+        if Student.objects.filter(stud_id=user_input).exists():
+            return 'student'
+        if Faculty.objects.filter(faculty_id=user_input).exists():
+            return 'faculty'
+        if Class.objects.filter(venue=user_input).exists():
+            return 'venue'
+        return None
+    return get_or_build('entity', (user_input,), build, ENTITY_SCOPE)
+
+
+async def aresolve_entity(user_input):
+    """resolve_entity for async views; it stops at the first lookup that matches, as the sync one does."""
+    if user_input.lower() == "admin":
+        return 'admin'
+
+    async def build():
+        if await Student.objects.filter(stud_id=user_input).aexists():
+            return 'student'
+        if await Faculty.objects.filter(faculty_id=user_input).aexists():
+            return 'faculty'
+        if await Class.objects.filter(venue=user_input).aexists():
+            return 'venue'
+        return None
+    return await aget_or_build('entity', (user_input,), build, ENTITY_SCOPE)
+
+
+def entity_timetable(entity, ident, academic_year, semester, section=None, dept=None):
+    """Timetable rows visible to the given entity for a year and semester."""
+    timetable = Timetable.objects.filter(
+        main_id__academic_year=academic_year,
+        main_id__semester=semester
+    )
+    if entity == 'admin':
+        return timetable.filter(
+            Q(main_id__section_id=section) | Q(main_id__section_id__isnull=True) | Q(main_id__section_id=""),
+            Q(main_id__dept=dept) | Q(main_id__dept__isnull=True) | Q(main_id__dept="")
+        )
+    if entity == 'student':
+        registered_courses = Registration.objects.filter(stud_id=ident).values_list('main_id', flat=True)
+        return timetable.filter(main_id__in=registered_courses)
+    if entity == 'faculty':
+        faculty_courses = Class.objects.filter(faculty__faculty_id=ident).values_list('main_id', flat=True)
+        return timetable.filter(main_id__in=faculty_courses)
+    if entity == 'venue':
+        return timetable.filter(main_id__venue=ident).filter(
+            Q(main_id__dept=dept) | Q(main_id__dept__isnull=True) | Q(main_id__dept="")
+        )
+    raise ValueError(f"Unknown timetable entity: {entity}")
+
+
+def grid_from_rows(rows):
+    """Build a grid from (day, slot, course_name, course_code, venue) tuples."""
+    timetable = {}
+    slots = set()
+    for day, slot, course_name, course_code, venue in rows:
+        timetable.setdefault(day, {}).setdefault(slot, []).append(
+            {'course_name': course_name, 'course_code': course_code, 'venue': venue}
+        )
+        slots.add(slot)
+    return {'timetable': timetable, 'days': sorted(timetable), 'slots': sorted(slots)}
+
+
+def grid_rows(grid):
+    """[(day, [[line, ...] for each slot])] of a grid in day and slot order, as plain strings."""
+    return [
+        (day, [[f"{e['course_name']} ({e['course_code']}) Venue: {e['venue']}" for e in grid['timetable'][day].get(slot, ())]
+               for slot in grid['slots']])
+        for day in grid['days']
+    ]
+
+
+def grid_table(grid, key):
+    """
+    Context for the _timetable_grid.html fragment, which is cached under key.
+    The rows are built only when the fragment is rendered, so a cache hit
+    costs nothing beyond the lookup.
+    """
+    return {'key': key, 'timeout': timeout(), 'slots': grid['slots'], 'rows': partial(grid_rows, grid)}
+
+
+def build_grid(queryset):
+    """Flatten timetable rows into {day: {slot: [entry, ...]}} using a single query."""
+    return grid_from_rows(queryset.values_list(*GRID_FIELDS))
+
+
+async def abuild_grid(queryset):
+    return grid_from_rows(await alist(queryset.values_list(*GRID_FIELDS)))
+
+
+def _registration_digest(main_ids):
+    return hashlib.sha1(','.join(map(str, main_ids)).encode()).hexdigest()
+
+
+def registration_set(stud_id):
+    """(digest, main_ids) of the classes a student is registered in."""
+    def build():
+        main_ids = sorted(Registration.objects.filter(stud_id=stud_id).values_list('main_id', flat=True))
+        return _registration_digest(main_ids), main_ids
+    return get_or_build('regset', (stud_id,), build)
+
+
+async def aregistration_set(stud_id):
+    async def build():
+        main_ids = sorted(await alist(Registration.objects.filter(stud_id=stud_id).values_list('main_id', flat=True)))
+        return _registration_digest(main_ids), main_ids
+    return await aget_or_build('regset', (stud_id,), build)
+
+
+def forget_registration_set(stud_id):
+    delete_value('regset', (stud_id,))
+
+
+def materialize_registration_sets():
+    """
+    Group every student by registration set in one pass over Registration and
+    cache each student's mapping. Returns {digest: (main_ids, [stud_id, ...])}.
+    """
+    groups = {}
+    rows = Registration.objects.order_by('stud_id', 'main_id').values_list('stud_id', 'main_id')
+    for stud_id, entries in groupby(rows, key=itemgetter(0)):
+        main_ids = [main_id for _, main_id in entries]
+        digest = _registration_digest(main_ids)
+        set_value('regset', (stud_id,), (digest, main_ids))
+        groups.setdefault(digest, (main_ids, []))[1].append(stud_id)
+    return groups
+
+
+def semester_rows_by_class(academic_year, semester):
+    """Grid rows of every class in a semester, grouped by main_id, from one query."""
+    rows_by_class = {}
+    rows = Timetable.objects.filter(
+        main_id__academic_year=academic_year,
+        main_id__semester=semester
+    ).values_list('main_id', *GRID_FIELDS)
+    for main_id, *row in rows:
+        rows_by_class.setdefault(main_id, []).append(row)
+    return rows_by_class
+
+
+def materialize_student_grids(academic_year, semester):
+    """
+    Build the grid of every distinct registration set for a semester from a
+    single timetable query and cache it. Returns (students, distinct grids).
+    """
+    groups = materialize_registration_sets()
+    rows_by_class = semester_rows_by_class(academic_year, semester)
+    scope = semester_scope(academic_year, semester)
+    for digest, (main_ids, _) in groups.items():
+        grid = grid_from_rows(row for main_id in main_ids for row in rows_by_class.get(main_id, ()))
+        set_value('grid', ('regset', digest, academic_year, semester), grid, scope=scope)
+    return sum(len(students) for _, students in groups.values()), len(groups)
+
+
+def get_grid(entity, ident, academic_year, semester, section=None, dept=None):
+    """Cached grid for an entity, invalidated when its semester's data changes."""
+    if entity == 'student':
+        # Students with the same registrations share one grid
+        digest, main_ids = registration_set(ident)
+        return get_or_build(
+            'grid', ('regset', digest, academic_year, semester),
+            lambda: build_grid(Timetable.objects.filter(
+                main_id__in=main_ids,
+                main_id__academic_year=academic_year,
+                main_id__semester=semester
+            )),
+            scope=semester_scope(academic_year, semester)
+        )
+    if entity == 'admin':
+        parts = (entity, academic_year, semester, section, dept)
+    elif entity == 'venue':
+        parts = (entity, ident, academic_year, semester, dept)
+    else:
+        parts = (entity, ident, academic_year, semester)
+    return get_or_build(
+        'grid', parts,
+        lambda: build_grid(entity_timetable(entity, ident, academic_year, semester, section, dept)),
+        scope=semester_scope(academic_year, semester)
+    )
+
+
+async def aget_grid(entity, ident, academic_year, semester, section=None, dept=None):
+    """get_grid for async views, under the same cache keys."""
+    if entity == 'student':
+        digest, main_ids = await aregistration_set(ident)
+        return await aget_or_build(
+            'grid', ('regset', digest, academic_year, semester),
+            lambda: abuild_grid(Timetable.objects.filter(
+                main_id__in=main_ids,
+                main_id__academic_year=academic_year,
+                main_id__semester=semester
+            )),
+            scope=semester_scope(academic_year, semester)
+        )
+    if entity == 'admin':
+        parts = (entity, academic_year, semester, section, dept)
+    elif entity == 'venue':
+        parts = (entity, ident, academic_year, semester, dept)
+    else:
+        parts = (entity, ident, academic_year, semester)
+    return await aget_or_build(
+        'grid', parts,
+        lambda: abuild_grid(entity_timetable(entity, ident, academic_year, semester, section, dept)),
+        scope=semester_scope(academic_year, semester)
+    )
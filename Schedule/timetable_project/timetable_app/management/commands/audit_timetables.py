@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from timetable_app.audit import audit_year, iter_report_csv
+
+
+class Command(BaseCommand):
+    help = "Report every timetable rule violation in an academic year as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('--output', help="CSV file to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        violations = audit_year(options['academic_year'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(iter_report_csv(violations))
+        else:
+            sys.stdout.writelines(iter_report_csv(violations))
+
+        counts = {}
+        for violation in violations:
+            counts[violation['rule']] = counts.get(violation['rule'], 0) + 1
+        summary = ', '.join(f"{rule}: {count}" for rule, count in sorted(counts.items())) or "no violations"
+        self.stderr.write(f"{len(violations)} violations ({summary})")
@@ -0,0 +1,49 @@
+import contextlib
+import io
+import time
+from statistics import mean
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.ga import solve, previous_year, new_seed
+
+
+class Command(BaseCommand):
+    help = "Compare GA convergence from scratch and warm started from a prior timetable, without saving anything."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+        parser.add_argument('section')
+        parser.add_argument('dept')
+        parser.add_argument('--from-year', help="Prior academic year (default: the year before).")
+        parser.add_argument('--from-semester', help="Prior semester (default: the same semester).")
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--seed', type=int, help="Base seed; run i of each mode uses seed + 1000 * i.")
+
+    def handle(self, *args, **options):
+        from_year = options['from_year'] or previous_year(options['academic_year'])
+        if not from_year:
+            raise CommandError("Give --from-year; the academic year is not in YEAR_PARITY form.")
+        from_semester = options['from_semester'] or options['semester']
+        section = (options['academic_year'], options['semester'], options['section'], options['dept'])
+        seed = options['seed'] if options['seed'] is not None else new_seed()
+        self.stdout.write(f"seed {seed}")
+
+        for label, warm_start_from in (("cold", None), ("warm", (from_year, from_semester))):
+            results = []
+            for run in range(options['runs']):
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _, requirements_met, stats = solve(*section, warm_start_from=warm_start_from, seed=seed + 1000 * run)
+                results.append({**stats, 'requirements_met': requirements_met, 'seconds': time.perf_counter() - started})
+
+            self.stdout.write(
+                f"{label}: best at generation {mean(r['best_generation'] for r in results):.1f}, "
+                f"{mean(r['generations'] for r in results):.1f} generations, "
+                f"fitness {mean(r['fitness'] for r in results):.1f}, "
+                f"{mean(r['retries'] for r in results):.1f} retries, "
+                f"{sum(r['requirements_met'] for r in results)}/{len(results)} complete, "
+                f"{mean(r['seconds'] for r in results):.2f}s"
+                + (f", {results[0]['warm_start_genes']} genes seeded" if warm_start_from else "")
+            )
@@ -0,0 +1,47 @@
+import json
+from statistics import mean
+
+from django.core.management.base import BaseCommand
+
+from timetable_app.startup import HEAVY_MODULES, probe
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh interpreters the way web workers start (Django set up, URLconf loaded) and record "
+        "each one's import time and RSS, plus what loading the upload, export and GA dependencies adds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=5, help="Interpreters to start, one after another.")
+        parser.add_argument('--extra', action='append',
+                            help=f"Module to import after startup (repeatable; default: {', '.join(HEAVY_MODULES)}).")
+        parser.add_argument('--output', help="Also write the per-worker results to this JSON file.")
+
+    def handle(self, *args, **options):
+        extra = options['extra'] or HEAVY_MODULES
+        workers = [probe(extra) for _ in range(options['workers'])]
+        for n, worker in enumerate(workers, 1):
+            self.stdout.write(
+                f"worker {n}: {worker['seconds'] * 1000:.0f} ms, {worker['rss'] / 2**20:.1f} MB RSS; "
+                f"extra modules +{worker['extra_seconds'] * 1000:.0f} ms, +{worker['extra_rss'] / 2**20:.1f} MB"
+            )
+        summary = {
+            'workers': workers,
+            'extra': list(extra),
+            'mean_seconds': mean(w['seconds'] for w in workers),
+            'mean_rss': mean(w['rss'] for w in workers),
+            'mean_extra_seconds': mean(w['extra_seconds'] for w in workers),
+            'mean_extra_rss': mean(w['extra_rss'] for w in workers),
+        }
+        self.stdout.write(
+            f"mean startup {summary['mean_seconds'] * 1000:.0f} ms, {summary['mean_rss'] / 2**20:.1f} MB; "
+            f"the extra modules would add {summary['mean_extra_seconds'] * 1000:.0f} ms, "
+            f"{summary['mean_extra_rss'] / 2**20:.1f} MB per worker"
+        )
+        loaded = sorted({m for w in workers for m in w['heavy']})
+        if loaded:
+            self.stderr.write(f"Loaded at startup: {', '.join(loaded)}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
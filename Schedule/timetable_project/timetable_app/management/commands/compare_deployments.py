@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.models import Registration
+from timetable_app.loadtest import run_load, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same timetable lookups to a WSGI and an ASGI deployment and compare throughput. "
+        "Start both with the same worker count first, e.g. gunicorn -w 4 timetable_project.wsgi and "
+        "uvicorn --workers 4 timetable_project.asgi:application with ASYNC_VIEWS = True."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+        parser.add_argument('--wsgi', default='http://127.0.0.1:8000', help="Base URL of the WSGI deployment.")
+        parser.add_argument('--asgi', default='http://127.0.0.1:8001', help="Base URL of the ASGI deployment.")
+        parser.add_argument('--students', type=int, default=50, help="Distinct students looked up.")
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request instead of student JSON lookups (repeatable).")
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        if not paths:
+            year, semester = options['academic_year'], options['semester']
+            students = Registration.objects.filter(
+                main_id__academic_year=year, main_id__semester=semester
+            ).values_list('stud_id', flat=True).distinct()[:options['students']]
+            paths = [f"/api/timetables/student/{stud_id}/?academic_year={year}&semester={semester}" for stud_id in students]
+        if not paths:
+            raise CommandError("No students are registered for that semester; give --path.")
+
+        self.stdout.write(f"{len(paths)} paths, {options['requests']} requests, concurrency {options['concurrency']}")
+        for label in ('wsgi', 'asgi'):
+            base = options[label].rstrip('/')
+            run_load([base + path for path in paths[:1]], 1, 1)  # warm up the worker
+            results, wall = run_load([base + path for path in paths], options['concurrency'], options['requests'])
+            report = summarize([(status, seconds) for _, status, seconds in results], wall)
+            self.stdout.write(
+                f"{label}: {report['throughput']:.1f} req/s, p50 {report['latency_ms_p50']:.1f} ms, "
+                f"p95 {report['latency_ms_p95']:.1f} ms, p99 {report['latency_ms_p99']:.1f} ms, "
+                f"{report['error_rate']:.1%} errors"
+            )
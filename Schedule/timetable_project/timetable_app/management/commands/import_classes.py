@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.importers import import_classes, read_class_rows, ImportDataError
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert classes and their faculty from a CSV or Excel file (e.g. class_list.xlsx)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as file:
+            try:
+                stats, links = import_classes(read_class_rows(file))
+            except ImportDataError as e:
+                raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Class import: {stats}, {links} faculty links."))
@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.loadtest import SCENARIOS, DEFAULT_MIX, LOADTEST_USER, seed_dataset, load_dataset, delete_dataset, run_mix
+
+
+def parse_mix(value):
+    """'student=80,coordinator=15,export=5' -> {'student': 80, ...}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Bad weight in {part!r}.")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running local server (runserver, gunicorn or uvicorn, on SQLite or a local MySQL "
+        "shared with this command) with scripted students, coordinators and exports, and write "
+        "per-endpoint p50/p95/p99 latency, throughput and error rate to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run.")
+        parser.add_argument('--mix', default=','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                            help="Scenario weights, e.g. student=80,coordinator=15,export=5.")
+        parser.add_argument('--think', type=float, default=0.0, help="Mean think time between scenarios, in seconds.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--seed-data', action='store_true',
+                            help="Replace the synthetic dataset (sections, students, a coordinator login) first.")
+        parser.add_argument('--sections', type=int, default=10)
+        parser.add_argument('--students', type=int, default=30, help="Students per synthetic section.")
+        parser.add_argument('--password', help=f"Password of the {LOADTEST_USER} user when reusing a dataset.")
+        parser.add_argument('--cleanup', action='store_true', help="Delete the synthetic dataset afterwards.")
+        parser.add_argument('--output', default='loadtest.json')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['seed_data']:
+            dataset = seed_dataset(options['sections'], options['students'], options['seed'])
+        else:
+            if mix.get('coordinator') and not options['password']:
+                raise CommandError("Give --password of the existing dataset, or --seed-data.")
+            dataset = load_dataset(LOADTEST_USER, options['password'])
+        if not dataset['sections']:
+            raise CommandError("No synthetic dataset; run with --seed-data.")
+
+        self.stdout.write(f"{options['users']} users for {options['duration']:g}s against {options['base_url']}, mix {mix}")
+        try:
+            report = run_mix(options['base_url'], dataset, mix, options['users'], options['duration'],
+                             options['seed'], options['think'])
+        finally:
+            if options['cleanup']:
+                delete_dataset()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        self.stdout.write(f"{'endpoint':<24}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+        for label, row in [*report['endpoints'].items(), ('total', report['total'])]:
+            self.stdout.write(
+                f"{label:<24}{row['requests']:>9}{row['throughput']:>8.1f}{row['latency_ms_p50']:>9.1f}"
+                f"{row['latency_ms_p95']:>9.1f}{row['latency_ms_p99']:>9.1f}{row['error_rate']:>8.1%}"
+            )
+        if report['scenario_failures']:
+            self.stderr.write(f"Scenario failures: {report['scenario_failures']}")
+        self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from timetable_app.lookups import materialize_student_grids
+
+
+class Command(BaseCommand):
+    help = "Pre-build one cached timetable per distinct student registration set for a semester."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+
+    def handle(self, *args, **options):
+        students, grids = materialize_student_grids(options['academic_year'], options['semester'])
+        self.stdout.write(self.style.SUCCESS(f"Mapped {students} students onto {grids} distinct timetables."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from timetable_app.repair import repair_section, MAX_CHANGES, TIME_LIMIT
+
+
+class Command(BaseCommand):
+    help = "Move as few cells as possible to clear a section's timetable violations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+        parser.add_argument('section')
+        parser.add_argument('dept')
+        parser.add_argument('--apply', action='store_true', help="Save the moves (default: only report them).")
+        parser.add_argument('--max-changes', type=int, default=MAX_CHANGES)
+        parser.add_argument('--time-limit', type=float, default=TIME_LIMIT)
+
+    def handle(self, *args, **options):
+        result = repair_section(
+            options['academic_year'], options['semester'], options['section'], options['dept'],
+            apply=options['apply'], max_changes=options['max_changes'], time_limit=options['time_limit']
+        )
+        for move in result['moves']:
+            self.stdout.write(f"{move['course']} (class {move['main_id']}): "
+                              f"day {move['from'][0]} slot {move['from'][1]} -> day {move['to'][0]} slot {move['to'][1]}")
+        for violation in result['violations']:
+            self.stdout.write(f"remaining {violation['rule']}: {violation['subject']} - {violation['detail']}")
+        state = "applied" if result['applied'] else "not applied"
+        self.stderr.write(f"{result['before']} -> {result['after']} violations, {len(result['moves'])} moves {state} "
+                          f"in {result['seconds']:.1f}s")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from timetable_app.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued spreadsheet import jobs (use with IMPORT_JOBS_IN_THREAD = False)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--poll-interval', type=float, default=2, help="Seconds between queue checks.")
+
+    def handle(self, *args, **options):
+        run_worker(once=options['once'], poll_interval=options['poll_interval'], log=self.stdout.write)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.versions import versions, capture, snapshot, diff, describe, rollback
+
+
+class Command(BaseCommand):
+    help = "List, snapshot, compare or roll back a section's saved timetable versions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+        parser.add_argument('section')
+        parser.add_argument('dept')
+        parser.add_argument('--snapshot', metavar='REASON', help="Save the current timetable as a new version.")
+        parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                            help="Compare two version numbers; 'current' is the timetable as it stands.")
+        parser.add_argument('--rollback', type=int, metavar='NUMBER', help="Restore a version.")
+
+    def version(self, key, number):
+        if number == 'current':
+            return capture(*key)
+        version = versions(*key).filter(number=number).first() if str(number).isdigit() else None
+        if version is None:
+            raise CommandError(f"No version {number} for this section.")
+        return version
+
+    def handle(self, *args, **options):
+        key = (options['academic_year'], options['semester'], options['section'], options['dept'])
+        if options['snapshot'] is not None:
+            version = snapshot(*key, reason=options['snapshot'])
+            self.stdout.write(f"Version {version.number}")
+        elif options['diff']:
+            old, new = (self.version(key, number) for number in options['diff'])
+            changes = describe(diff(old, new))
+            for change in changes:
+                self.stdout.write(f"day {change['day']} slot {change['slot']}: "
+                                  f"-{', '.join(change['removed']) or '.'} +{', '.join(change['added']) or '.'}")
+            self.stderr.write(f"{len(changes)} cells differ")
+        elif options['rollback'] is not None:
+            version = rollback(self.version(key, options['rollback']))
+            self.stdout.write(f"Restored version {options['rollback']} as version {version.number}")
+        else:
+            for version in versions(*key).order_by('number'):
+                busy = sum(1 for ids in version.cells if ids)
+                seed = f" seed {version.ga_seed}" if version.ga_seed is not None else ""
+                self.stdout.write(f"v{version.number}  {version.created_at:%Y-%m-%d %H:%M}  {busy:>3} cells  "
+                                  f"{version.reason}{seed}")
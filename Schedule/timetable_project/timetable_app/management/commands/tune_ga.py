@@ -0,0 +1,58 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable_app.ga import new_seed
+from timetable_app.tuning import sample_configs, make_synthetic_sections, delete_synthetic_sections, successive_halving
+
+
+class Command(BaseCommand):
+    help = "Tune the GA parameters by successive halving over real and synthetic sections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', action='append', default=[], metavar='YEAR:SEMESTER:SECTION:DEPT',
+                            help="A real section to tune on (repeatable). Its saved entries stay locked, as in a real run.")
+        parser.add_argument('--synthetic', type=int, default=0, help="Number of synthetic sections to add.")
+        parser.add_argument('--candidates', type=int, default=8)
+        parser.add_argument('--eta', type=int, default=2, help="Keep 1/eta of the configs each round.")
+        parser.add_argument('--seeds-per-round', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help="Write the ranking as JSON to this file.")
+
+    def handle(self, *args, **options):
+        sections = []
+        for value in options['section']:
+            parts = value.split(':')
+            if len(parts) != 4:
+                raise CommandError(f"Expected YEAR:SEMESTER:SECTION:DEPT, got {value}")
+            sections.append(tuple(parts))
+        seed = options['seed'] if options['seed'] is not None else new_seed()
+        if options['synthetic']:
+            sections += make_synthetic_sections(options['synthetic'], seed)
+        if not sections:
+            raise CommandError("Give at least one --section or --synthetic N.")
+
+        configs = sample_configs(options['candidates'], random.Random(seed))
+        self.stdout.write(f"seed {seed}: {len(configs)} configs on {len(sections)} sections")
+        try:
+            ranking = successive_halving(configs, sections, options['eta'], options['seeds_per_round'],
+                                         options['workers'], seed, log=self.stdout.write)
+        finally:
+            if options['synthetic']:
+                delete_synthetic_sections()
+
+        for config, cost, feasible, runs in ranking:
+            self.stdout.write(f"{cost:8.2f}s  {feasible:4.0%} feasible  {runs:3d} runs  {config.as_dict()}")
+        best = ranking[0][0].as_dict()
+        self.stdout.write(f"GA_CONFIG = {best!r}")
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'seed': seed,
+                    'sections': len(sections),
+                    'best': best,
+                    'ranking': [{'config': c.as_dict(), 'mean_cost': cost, 'feasible': feasible, 'runs': runs}
+                                for c, cost, feasible, runs in ranking],
+                }, output, indent=2)
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from timetable_app.models import Class
+from timetable_app.weekgrid import current_grid
+from timetable_app.validators import validate_timetable_constraints, collect_validator_stats
+from timetable_app.ga import solve
+
+
+class Command(BaseCommand):
+    help = "Per-rule timing, query counts and rejections of the validator for one section."
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year')
+        parser.add_argument('semester')
+        parser.add_argument('section')
+        parser.add_argument('dept')
+        parser.add_argument('--ga', action='store_true',
+                            help="Measure a whole GA run (nothing is saved) instead of one check of every class in every slot.")
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        section = (options['academic_year'], options['semester'], options['section'], options['dept'])
+        with collect_validator_stats() as stats:
+            if options['ga']:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _, requirements_met, ga_stats = solve(*section, seed=options['seed'])
+                self.stderr.write(f"GA seed {ga_stats['seed']}: fitness {ga_stats['fitness']}, "
+                                  f"{ga_stats['retries']} retries, requirements met: {requirements_met}")
+            else:
+                main_ids = Class.objects.filter(
+                    academic_year=section[0], semester=section[1], section_id=section[2], dept=section[3]
+                ).values_list('main_id', flat=True)
+                cells = current_grid().cells
+                for main_id in main_ids:
+                    for day, slot in cells:
+                        try:
+                            validate_timetable_constraints(main_id, day, slot, *section)
+                        except ValidationError:
+                            pass
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats.as_dict(), indent=2))
+        else:
+            self.stdout.write(str(stats))
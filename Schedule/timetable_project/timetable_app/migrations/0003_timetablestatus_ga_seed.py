@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_app', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetablestatus',
+            name='ga_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_app', '0003_timetablestatus_ga_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GridDefinition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('days', models.JSONField(default=list)),
+                ('slots', models.JSONField(default=list)),
+                ('breaks', models.JSONField(blank=True, default=list)),
+                ('active', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='timetable',
+            name='day',
+            field=models.IntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='timetable',
+            name='slot',
+            field=models.IntegerField(),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_app', '0004_griddefinition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=10)),
+                ('semester', models.CharField(max_length=10)),
+                ('section', models.CharField(max_length=50)),
+                ('dept', models.CharField(blank=True, default='', max_length=10)),
+                ('number', models.IntegerField()),
+                ('days', models.IntegerField()),
+                ('slots', models.IntegerField()),
+                ('cells', models.JSONField(default=list)),
+                ('reason', models.CharField(blank=True, default='', max_length=100)),
+                ('ga_seed', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('academic_year', 'semester', 'section', 'dept', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable_app', '0005_timetableversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('faculty', models.CharField(blank=True, default='', max_length=20)),
+                ('course', models.CharField(blank=True, default='', max_length=20)),
+                ('course_type', models.CharField(blank=True, default='', max_length=20)),
+                ('day', models.IntegerField(default=0)),
+                ('slot', models.IntegerField(default=0)),
+                ('penalty', models.IntegerField(default=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpreadPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.CharField(blank=True, default='', max_length=20)),
+                ('course_type', models.CharField(blank=True, default='', max_length=20)),
+                ('weight', models.IntegerField(default=5)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db import models
 
 class CustomUser(AbstractUser):
@@ -62,10 +63,73 @@ class Registration(models.Model):
     stud_id = models.ForeignKey(Student, on_delete=models.CASCADE)
     main_id = models.ForeignKey(Class, on_delete=models.CASCADE)
 
+class GridDefinition(models.Model):
+    """The days and slots of the week; the active one replaces the default 6 x 8 grid."""
+    name = models.CharField(max_length=50, unique=True)
+    days = models.JSONField(default=list)  # day names, numbered from 1
+    slots = models.JSONField(default=list)  # slot labels such as "9:00 AM - 9:50 AM", numbered from 1
+    breaks = models.JSONField(default=list, blank=True)  # slots after which a break resets adjacency
+    active = models.BooleanField(default=False)
+
+    def clean(self):
+        for field in ('days', 'slots'):
+            values = getattr(self, field)
+            if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+                raise ValidationError({field: "Give a non-empty list of names."})
+        if len(self.days) > 7:
+            raise ValidationError({'days': "A week has at most 7 days."})
+        from .weekgrid import slot_times  # imports this module
+        for label in self.slots:
+            try:
+                slot_times(label)
+            except ValueError:
+                raise ValidationError({'slots': f"Slot \"{label}\" is not of the form \"9:00 AM - 9:50 AM\"."})
+        if not isinstance(self.breaks, list) or not all(isinstance(b, int) and 1 <= b < len(self.slots) for b in self.breaks):
+            raise ValidationError({'breaks': f"Breaks are slot numbers from 1 to {len(self.slots) - 1}."})
+
+    def save(self, *args, **kwargs):
+        if self.active:
+            GridDefinition.objects.exclude(pk=self.pk).filter(active=True).update(active=False)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({len(self.days)} x {len(self.slots)})"
+
+class SlotPreference(models.Model):
+    """
+    A soft constraint: placing a matching class in a matching cell costs the
+    GA penalty fitness points (a negative penalty rewards it). Blank ids and
+    type match every class; day or slot 0 matches every day or slot. Ids are
+    kept as text so the rows can be bulk uploaded. See softconstraints.py.
+    """
+    faculty = models.CharField(max_length=20, default="", blank=True)  # a Faculty faculty_id
+    course = models.CharField(max_length=20, default="", blank=True)  # a Course course_id
+    course_type = models.CharField(max_length=20, default="", blank=True)  # e.g. 'none' for main courses
+    day = models.IntegerField(default=0)
+    slot = models.IntegerField(default=0)
+    penalty = models.IntegerField(default=10)
+
+    def __str__(self):
+        who = ' '.join(filter(None, [self.faculty, self.course, self.course_type])) or "any class"
+        return f"{who} on day {self.day or 'any'}, slot {self.slot or 'any'}: {self.penalty}"
+
+class SpreadPreference(models.Model):
+    """
+    A soft constraint asking for a course's slots to be spread evenly over the
+    week; weight is charged per unit of unevenness. Blank course and type
+    match every course.
+    """
+    course = models.CharField(max_length=20, default="", blank=True)  # a Course course_id
+    course_type = models.CharField(max_length=20, default="", blank=True)
+    weight = models.IntegerField(default=5)
+
+    def __str__(self):
+        return f"spread {self.course or self.course_type or 'every course'}: {self.weight}"
+
 class Timetable(models.Model):
     main_id = models.ForeignKey(Class, on_delete=models.CASCADE)
-    day = models.IntegerField(choices=[(i, day) for i, day in enumerate(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"], start=1)])
-    slot = models.IntegerField(choices=[(i, slot) for i, slot in enumerate(["9:00 AM - 9:50 AM", "9:50 AM - 10:40 AM", "11:00 AM - 11:50 AM", "11:50 PM - 12:40 PM", "1:30 PM - 2:15 PM", "2:15 PM - 3:00 PM", "3:15 PM - 4:00 PM", "4:00 PM - 4:45 PM"], start=1)])
+    day = models.IntegerField()  # numbered as in the active GridDefinition (weekgrid.current_grid)
+    slot = models.IntegerField()
 
     class Meta:
         unique_together = ('main_id', 'day', 'slot')
@@ -85,6 +149,7 @@ class TimetableStatus(models.Model):
     semester = models.CharField(max_length=10, default='none', choices=[('1', '1'), ('2', '2'),('3', '3'), ('4', '4'),('5', '5'), ('6', '6'),('7', '7'), ('8', '8')])
     section = models.CharField(max_length=2, default='none')
     dept = models.CharField(max_length=10, default="")    
+    ga_seed = models.BigIntegerField(blank=True, null=True)  # Seed of the GA run that produced the timetable
     
     class Meta:
         unique_together = ('academic_year', 'semester', 'section', 'dept')
@@ -92,6 +157,63 @@ class TimetableStatus(models.Model):
     def __str__(self):
         return self.status
 
+class TimetableVersion(models.Model):
+    """
+    An immutable snapshot of a section's timetable: cells holds, for each cell
+    of a days x slots week in day then slot order, the sorted class ids placed
+    there. See versions.py.
+    """
+    academic_year = models.CharField(max_length=10)
+    semester = models.CharField(max_length=10)
+    section = models.CharField(max_length=50)
+    dept = models.CharField(max_length=10, default="", blank=True)
+    number = models.IntegerField()  # counts up from 1 per section
+    days = models.IntegerField()
+    slots = models.IntegerField()
+    cells = models.JSONField(default=list)
+    reason = models.CharField(max_length=100, default="", blank=True)
+    ga_seed = models.BigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('academic_year', 'semester', 'section', 'dept', 'number')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Timetable versions are immutable.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.academic_year} sem {self.semester} {self.dept} {self.section} v{self.number}"
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    model = models.CharField(max_length=20)
+    file = models.FileField(upload_to='imports/')
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    chunks_done = models.IntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    rows_created = models.IntegerField(default=0)
+    rows_skipped = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    rows_per_second = models.FloatField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # first MAX_REPORTED_ERRORS row errors
+    message = models.TextField(default="", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('model', 'content_hash')
+
+    def __str__(self):
+        return f"{self.model} import #{self.pk} ({self.status})"
+
 '''
 python manage.py makemigrations
 python manage.py migrate
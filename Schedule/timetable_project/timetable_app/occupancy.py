@@ -0,0 +1,115 @@
+from .models import Timetable, Class, Faculty
+from .cache import get_or_build, year_scope, OCCUPANCY_SCOPE
+from .validators import PLACEHOLDER_FACULTY, SHARED_VENUES
+from .weekgrid import current_grid
+
+
+def parse_times(values):
+    """Turn 'day:slot' strings such as '3:4' into (day, slot) pairs."""
+    grid = current_grid()
+    times = []
+    for value in values:
+        day, _, slot = value.partition(':')
+        day, slot = int(day), int(slot)
+        if (day, slot) not in grid.bits:
+            raise ValueError(f"No such day/slot: {value}")
+        times.append((day, slot))
+    return times
+
+
+def build_index(academic_year):
+    """
+    One week bitmask per venue and per faculty member for an academic year,
+    laid out by the current grid, with a cell's bit set when the entity is busy.
+    """
+    grid = current_grid()
+    venues = Class.objects.exclude(venue__in=SHARED_VENUES).exclude(venue__isnull=True).values_list('venue', flat=True).distinct()
+    venue_masks = dict.fromkeys(venues, 0)
+    faculty_masks = {}
+    faculty_names = {}
+    for faculty_id, faculty_name in Faculty.objects.exclude(faculty_name__in=PLACEHOLDER_FACULTY).values_list('faculty_id', 'faculty_name'):
+        faculty_masks[faculty_id] = 0
+        faculty_names[faculty_id] = faculty_name
+
+    class_masks = {}
+    rows = Timetable.objects.filter(main_id__academic_year=academic_year).values_list('day', 'slot', 'main_id', 'main_id__venue')
+    for day, slot, main_id, venue in rows:
+        bit = grid.bit(day, slot)
+        class_masks[main_id] = class_masks.get(main_id, 0) | bit
+        if venue in venue_masks:
+            venue_masks[venue] |= bit
+
+    links = Class.faculty.through.objects.filter(**{'class__academic_year': academic_year}).values_list('class_id', 'faculty_id')
+    for main_id, faculty_id in links:
+        if faculty_id in faculty_masks:
+            faculty_masks[faculty_id] |= class_masks.get(main_id, 0)
+
+    return {'venue': venue_masks, 'faculty': faculty_masks, 'faculty_names': faculty_names}
+
+
+def occupancy_index(academic_year):
+    """
+    The cached index of a year. Timetable writes bump the year's scope, so the
+    index is rebuilt rather than patched, which concurrent writers could undo.
+    """
+    return get_or_build('occupancy', (academic_year,), lambda: build_index(academic_year),
+                        (OCCUPANCY_SCOPE, year_scope(academic_year)))
+
+
+def _is_free(mask, wanted, match):
+    """Free at all of the wanted bits, or with match='any' at least one of them."""
+    if match == 'any':
+        return mask & wanted != wanted
+    return not mask & wanted
+
+
+def free_venues(index, times, match='all'):
+    """Venues free at the given (day, slot) pairs."""
+    wanted = current_grid().mask(times)
+    return sorted(venue for venue, mask in index['venue'].items() if _is_free(mask, wanted, match))
+
+
+def free_faculty(index, times, match='all'):
+    """(faculty_id, name) of faculty free at the given (day, slot) pairs."""
+    wanted = current_grid().mask(times)
+    return sorted(
+        ((faculty_id, index['faculty_names'][faculty_id]) for faculty_id, mask in index['faculty'].items()
+         if _is_free(mask, wanted, match)),
+        key=lambda item: item[1]
+    )
+
+
+def free_slots(index, faculty_ids=(), venues=(), match='all'):
+    """
+    (day, slot) pairs in which all the given faculty and venues are free, or
+    with match='any' at least one of them.
+    """
+    grid = current_grid()
+    masks = [index['faculty'].get(faculty_id, 0) for faculty_id in faculty_ids]
+    masks += [index['venue'].get(venue, 0) for venue in venues]
+    if not masks:
+        return grid.cells_of(grid.full)
+    busy = masks[0]
+    for mask in masks[1:]:
+        busy = busy | mask if match == 'all' else busy & mask
+    return grid.cells_of(grid.full & ~busy)
+
+
+def search(academic_year, times=(), faculty_ids=(), venues=(), match='all'):
+    """
+    Answer a finder query in one call: which venues and faculty are free at
+    the given times, and in which slots the given faculty and venues are free.
+    When both are given, the free slots are restricted to the given times.
+    """
+    index = occupancy_index(academic_year)
+    result = {}
+    if times:
+        result['venues'] = free_venues(index, times, match)
+        result['faculty'] = free_faculty(index, times, match)
+    if faculty_ids or venues:
+        slots = free_slots(index, faculty_ids, venues, match)
+        if times:
+            wanted = set(times)
+            slots = [time for time in slots if time in wanted]
+        result['slots'] = slots
+    return result
@@ -0,0 +1,287 @@
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+MAX_FINGERPRINTS = 50  # duplicate fingerprints kept per view
+# The recorder of the async request being served; sync_to_async copies it to
+# the worker thread with the rest of the context
+_current_recorder = ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL with literals and placeholders replaced, so an N+1 loop maps to one string."""
+    return _IN_LISTS.sub("(...)", _LITERALS.sub("?", sql))
+
+
+def query_budget(max_queries, methods=None):
+    """Declare the most queries a view may run per request, or per request of the given methods."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(*args, **kwargs):
+                return await view(*args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        wrapper.query_budget_methods = methods
+        return wrapper
+    return decorator
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, their time and their fingerprints."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+
+def _dispatch(execute, sql, params, many, context):
+    """
+    execute_wrapper left on the async ORM's worker thread connections: the
+    requests it serves interleave, so each query goes to the recorder of the
+    request whose context it runs in.
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+class ProfileStore:
+    """The last `window` requests of every view, kept in process memory."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._duplicates = defaultdict(Counter)
+        self._over_budget = Counter()
+
+    def record(self, view, queries, duplicates, db_seconds, seconds, over_budget=False):
+        with self._lock:
+            self._samples[view].append((queries, sum(duplicates.values()), db_seconds, seconds))
+            counter = self._duplicates[view]
+            counter.update(duplicates)
+            if len(counter) > MAX_FINGERPRINTS * 2:
+                self._duplicates[view] = Counter(dict(counter.most_common(MAX_FINGERPRINTS)))
+            if over_budget:
+                self._over_budget[view] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._duplicates.clear()
+            self._over_budget.clear()
+
+    def stats(self):
+        with self._lock:
+            views = {view: list(samples) for view, samples in self._samples.items()}
+            duplicates = {view: counter.most_common(5) for view, counter in self._duplicates.items()}
+            over_budget = dict(self._over_budget)
+
+        def percentile(values, p):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        report = {}
+        for view, samples in views.items():
+            queries = [s[0] for s in samples]
+            latency = [s[3] * 1000 for s in samples]
+            report[view] = {
+                'requests': len(samples),
+                'queries_mean': sum(queries) / len(queries),
+                'queries_max': max(queries),
+                'duplicate_queries_mean': sum(s[1] for s in samples) / len(samples),
+                'db_ms_mean': sum(s[2] for s in samples) * 1000 / len(samples),
+                'latency_ms_p50': percentile(latency, 0.5),
+                'latency_ms_p95': percentile(latency, 0.95),
+                'latency_ms_max': max(latency),
+                'over_budget': over_budget.get(view, 0),
+                'top_duplicates': [{'sql': sql, 'count': n} for sql, n in duplicates.get(view, [])],
+            }
+        return report
+
+
+store = ProfileStore(getattr(settings, 'PROFILING_WINDOW', 200))
+
+
+def _view_budget(request):
+    match = request.resolver_match
+    if match is None:
+        return None, None
+    name = match.view_name or f"{match.func.__module__}.{match.func.__qualname__}"
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if name in budgets:
+        return name, budgets[name]
+    methods = getattr(match.func, 'query_budget_methods', None)
+    if methods and request.method not in methods:
+        return name, None
+    return name, getattr(match.func, 'query_budget', None)
+
+
+class ProfilingMiddleware:
+    """
+    Record query count, duplicate query fingerprints, DB time and latency of
+    every request in `store`, and enforce the view's query budget. Budgets
+    come from @query_budget or settings.QUERY_BUDGETS (by URL name); going
+    over logs a warning, or raises QueryBudgetExceeded when
+    QUERY_BUDGET_RAISE is set, as in tests. The queries of a streamed body
+    are counted as it is sent and the budget is checked at its end, or when
+    the response closes early; its latency is timed up to the first byte.
+    Runs in the async chain under ASGI, so async views are not pushed onto
+    a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'PROFILING_ENABLED', settings.DEBUG):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with self._recording(recorder):
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', settings.DEBUG):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        # Connections are per thread and the async ORM runs every request's
+        # queries on its one sync worker thread, so a per-request wrapper
+        # there would also count the queries of concurrent requests
+        await sync_to_async(self._dispatching)()
+        token = _current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self._finish(request, response, recorder, time.perf_counter() - started)
+
+    def _recording(self, recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def _dispatching(self):
+        for connection in connections.all():
+            if _dispatch not in connection.execute_wrappers:
+                connection.execute_wrappers.append(_dispatch)
+
+    @contextmanager
+    def _dispatching_to(self, recorder):
+        token = _current_recorder.set(recorder)
+        try:
+            yield
+        finally:
+            _current_recorder.reset(token)
+
+    def _counting(self, response, recorder, done):
+        """
+        The streamed body with the queries producing each chunk counted by
+        recorder, calling done() after the last one. Nothing stays recorded
+        while the server holds a chunk.
+        """
+        recording = self._dispatching_to if self.is_async else self._recording
+        content = response.streaming_content
+        if response.is_async:
+            async def body():
+                chunks = aiter(content)
+                while True:
+                    with recording(recorder):
+                        try:
+                            chunk = await anext(chunks)
+                        except StopAsyncIteration:
+                            break
+                    yield chunk
+                done()
+        else:
+            def body():
+                chunks = iter(content)
+                while True:
+                    with recording(recorder):
+                        try:
+                            chunk = next(chunks)
+                        except StopIteration:
+                            break
+                    yield chunk
+                done()
+        return body()
+
+    def _finish(self, request, response, recorder, seconds):
+        view, budget = _view_budget(request)
+        if view is None:
+            return response
+        if not response.streaming:
+            self._check(view, budget, recorder, seconds)
+            return response
+
+        # Exports and downloads run their heavy queries as the body is sent
+        checked = []
+
+        def done():
+            if not checked:
+                checked.append(True)
+                self._check(view, budget, recorder, seconds)
+        response.streaming_content = self._counting(response, recorder, done)
+        # For a body left unfinished; errors raised by closers are dropped
+        response._resource_closers.append(done)
+        return response
+
+    def _check(self, view, budget, recorder, seconds):
+        over_budget = budget is not None and recorder.count > budget
+        store.record(view, recorder.count, recorder.duplicates, recorder.seconds, seconds, over_budget)
+        if over_budget:
+            message = f"{view} ran {recorder.count} queries, over its budget of {budget}"
+            worst = max(recorder.fingerprints.items(), key=lambda item: item[1])
+            if worst[1] > 1:
+                message += f"; repeated {worst[1]}x: {worst[0][:200]}"
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
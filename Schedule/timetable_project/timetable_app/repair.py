@@ -0,0 +1,170 @@
+import hashlib
+import time
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import F
+
+from .models import Timetable
+from .audit import ROW_FIELDS, audit_rows, year_faculty
+from .coenrolment import coenrolment
+from .weekgrid import current_grid
+from .validators import SHARED_VENUES
+from .signals import batched_invalidation
+
+MAX_CHANGES = 10
+TIME_LIMIT = 10  # seconds
+PLAN_SALT = 'timetable_app.repair'
+
+
+class StalePlan(Exception):
+    pass
+
+
+def _neighbourhood(academic_year, semester, section, dept):
+    """
+    The section's Timetable rows plus every row of the year that can clash
+    with them through a venue, a faculty member or shared students.
+    Returns ({pk: row}, set of the section's pks, faculty_of).
+    """
+    entries = {pk: row for pk, *row in Timetable.objects.filter(
+        main_id__academic_year=academic_year).values_list('pk', *ROW_FIELDS)}
+    own = {pk for pk, row in entries.items() if (row[5], row[6], row[7]) == (semester, section, dept)}
+    faculty_of = year_faculty(academic_year)
+
+    own_classes = {entries[pk][2] for pk in own}
+    venues = {entries[pk][8] for pk in own} - set(SHARED_VENUES) - {None}
+    faculty = {f for main_id in own_classes for f in faculty_of.get(main_id, ())}
+    matrix = coenrolment(academic_year, semester)
+    shared = {other for main_id in own_classes for other in matrix.neighbours(main_id)}
+
+    rows = {
+        pk: row for pk, row in entries.items()
+        if pk in own or row[8] in venues or row[2] in shared or faculty.intersection(faculty_of.get(row[2], ()))
+    }
+    return rows, own, faculty_of
+
+
+def _digest(rows):
+    return hashlib.sha256(repr(sorted(rows.items())).encode()).hexdigest()
+
+
+def _apply(academic_year, semester, section, dept, digest, moves):
+    """
+    Save moves in one transaction if the neighbourhood still hashes to
+    digest, else raise StalePlan.
+    """
+    with transaction.atomic(), batched_invalidation() as touched:
+        moved = Timetable.objects.filter(pk__in=[move['id'] for move in moves])
+        list(moved.select_for_update().values_list('pk'))  # held until the moves are saved
+        if _digest(_neighbourhood(academic_year, semester, section, dept)[0]) != digest:
+            raise StalePlan("The timetable has changed since these moves were proposed.")
+        # Park the moved rows outside the grid first, so that no order of the
+        # moves puts two rows of a class in one cell on the way
+        moved.update(slot=-F('pk'))
+        for move in moves:
+            Timetable.objects.filter(pk=move['id']).update(day=move['to'][0], slot=move['to'][1])
+        touched.update(move['main_id'] for move in moves)  # update() sends no signals
+
+
+def apply_plan(academic_year, semester, section, dept, plan):
+    """
+    Apply exactly the moves a repair_section preview signed into plan, for
+    the same section and only if none of the rows it was computed from have
+    changed since. Returns the moves; raises StalePlan otherwise.
+    """
+    try:
+        plan = signing.loads(plan, salt=PLAN_SALT)
+    except signing.BadSignature:
+        raise StalePlan("These moves are not a valid repair plan.")
+    if plan['section'] != [academic_year, semester, section, dept]:
+        raise StalePlan("These moves were proposed for another section.")
+    moves = [{**move, 'from': tuple(move['from']), 'to': tuple(move['to'])} for move in plan['moves']]
+    _apply(academic_year, semester, section, dept, plan['digest'], moves)
+    return moves
+
+
+def repair_section(academic_year, semester, section, dept, apply=False, max_changes=MAX_CHANGES, time_limit=TIME_LIMIT):
+    """
+    Repair a section's timetable with as few moved cells as possible.
+
+    The current Timetable is the incumbent. Each round tries moving every
+    row of a class involved in a violation to each other cell, or swapping
+    it with a row already there, scores the candidates with the audit rules
+    and keeps the one with fewest violations, then fewest changed cells. It
+    stops when nothing improves, max_changes cells have moved or time_limit
+    seconds have passed. With apply=True the moves are saved in one
+    transaction.
+
+    Returns a dict with the violations before and after, the moves made and,
+    for a preview, the signed plan apply_plan() takes to save those moves.
+    """
+    started = time.perf_counter()
+    rows, own, faculty_of = _neighbourhood(academic_year, semester, section, dept)
+    digest = _digest(rows)
+    own_classes = {str(rows[pk][2]) for pk in own}
+    original = {pk: (rows[pk][0], rows[pk][1]) for pk in own}
+    cells = current_grid().cells
+
+    def violations(placed):
+        trial = [placed[pk] + tuple(row[2:]) if pk in placed else row for pk, row in rows.items()]
+        return [v for v in audit_rows(academic_year, trial, faculty_of)
+                if own_classes.intersection(v['main_ids'].split())]
+
+    def changes(placed):
+        return sum(placed[pk] != original[pk] for pk in own)
+
+    current = dict(original)
+    remaining = violations(current)
+    before = len(remaining)
+    while remaining and time.perf_counter() - started < time_limit:
+        involved = {main_id for v in remaining for main_id in v['main_ids'].split()} & own_classes
+        best = None
+        for pk in own:
+            if str(rows[pk][2]) not in involved:
+                continue
+            for cell in cells:
+                if cell == current[pk]:
+                    continue
+                occupants = [other for other in own if other != pk and current[other] == cell]
+                if any(rows[other][2] == rows[pk][2] for other in occupants):
+                    continue  # a class holds a cell once (Timetable.unique_together)
+                candidates = [{**current, pk: cell}]
+                candidates += [{**current, pk: cell, other: current[pk]} for other in occupants]
+                for placed in candidates:
+                    changed = changes(placed)
+                    if changed > max_changes:
+                        continue
+                    found = violations(placed)
+                    key = (len(found), changed)
+                    if best is None or key < best[0]:
+                        best = (key, placed, found)
+            if time.perf_counter() - started >= time_limit:
+                break
+        if best is None or len(best[2]) >= len(remaining):
+            break
+        _, current, remaining = best
+
+    moves = [
+        {
+            'id': pk,
+            'main_id': rows[pk][2],
+            'course': rows[pk][3],
+            'from': original[pk],
+            'to': current[pk],
+        }
+        for pk in sorted(own) if current[pk] != original[pk]
+    ]
+    if apply and moves:
+        _apply(academic_year, semester, section, dept, digest, moves)
+
+    return {
+        'before': before,
+        'after': len(remaining),
+        'violations': remaining,
+        'moves': moves,
+        'applied': apply and bool(moves),
+        'plan': signing.dumps({'section': [academic_year, semester, section, dept], 'digest': digest, 'moves': moves},
+                              salt=PLAN_SALT) if moves and not apply else None,
+        'seconds': time.perf_counter() - started,
+    }
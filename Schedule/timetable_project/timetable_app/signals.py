@@ -0,0 +1,163 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Timetable, Class, Registration, Student, Faculty, Course, GridDefinition
+from .models import SlotPreference, SpreadPreference
+from .cache import bump_version, bump_semester, GLOBAL_SCOPE, REGISTRATION_SCOPE
+from .cache import CLASSES_SCOPE, ENTITY_SCOPE, OCCUPANCY_SCOPE
+from .lookups import forget_registration_set
+
+# What a write to each model can leave stale besides the semesters of the
+# classes it touches; a model missing here invalidates everything
+MODEL_SCOPES = {
+    Class: (CLASSES_SCOPE, ENTITY_SCOPE, OCCUPANCY_SCOPE, REGISTRATION_SCOPE),
+    Faculty: (ENTITY_SCOPE, OCCUPANCY_SCOPE),
+    Student: (ENTITY_SCOPE,),
+    # A course's type decides which pairs the co-enrolment matrices count
+    Course: (REGISTRATION_SCOPE,),
+    # Only read by the GA
+    SlotPreference: (),
+    SpreadPreference: (),
+}
+
+_batch = threading.local()
+
+
+def bump_on_commit(scopes=(), semesters=()):
+    """
+    Bump each scope and (academic_year, semester) once the current transaction
+    commits, or at once outside one. Bumping earlier would let a concurrent
+    reader cache the old rows under the new version until the next write.
+    """
+    scopes, semesters = tuple(scopes), set(semesters)
+
+    def bump():
+        for scope in scopes:
+            bump_version(scope)
+        for academic_year, semester in semesters:
+            bump_semester(academic_year, semester)
+    transaction.on_commit(bump)
+
+
+def bump_model(model, semesters=()):
+    """Invalidate what a write to model can change, and each (academic_year, semester) given."""
+    bump_on_commit(MODEL_SCOPES.get(model, (GLOBAL_SCOPE,)), semesters)
+
+
+def invalidate_classes(main_ids):
+    """
+    Invalidate the semesters of classes whose Timetable rows changed, once
+    each, after commit. Their years' occupancy indexes follow the year scope.
+    """
+    main_ids = set(main_ids)
+    if not main_ids:
+        return
+    bump_on_commit(semesters=Class.objects.filter(pk__in=main_ids).values_list('academic_year', 'semester'))
+
+
+@contextmanager
+def batched_invalidation():
+    """
+    Collect the classes of the Timetable rows saved or deleted in the block
+    and invalidate them together on leaving it, rather than once per row.
+    Yields the set of collected class ids, for callers that bulk_create or
+    bulk_update rows and so send no signals.
+    """
+    if getattr(_batch, 'main_ids', None) is not None:
+        yield _batch.main_ids  # the outer block invalidates
+        return
+    _batch.main_ids = set()
+    try:
+        yield _batch.main_ids
+    finally:
+        main_ids, _batch.main_ids = _batch.main_ids, None
+        invalidate_classes(main_ids)
+
+
+@receiver([post_save, post_delete], sender=Timetable)
+def invalidate_timetable(sender, instance, **kwargs):
+    batch = getattr(_batch, 'main_ids', None)
+    if batch is not None:
+        batch.add(instance.main_id_id)
+    else:
+        invalidate_classes([instance.main_id_id])
+
+
+@receiver([post_save, post_delete], sender=Registration)
+def invalidate_registration(sender, instance, **kwargs):
+    # Student grids are keyed by registration set, so only the mapping and
+    # the co-enrolment matrices change
+    stud_id = instance.stud_id_id
+    transaction.on_commit(lambda: forget_registration_set(stud_id))
+    bump_on_commit([REGISTRATION_SCOPE])
+
+
+def linked_semesters(instance):
+    """(academic_year, semester) of the classes of a Course or Faculty member."""
+    field = 'course' if isinstance(instance, Course) else 'faculty'
+    return set(Class.objects.filter(**{field: instance}).values_list('academic_year', 'semester'))
+
+
+@receiver(pre_save, sender=Class)
+def remember_class_semester(sender, instance, **kwargs):
+    # A class moved to another semester leaves the old one stale as well
+    instance._saved_semester = (
+        Class.objects.filter(pk=instance.pk).values_list('academic_year', 'semester').first() if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Class)
+def invalidate_class(sender, instance, **kwargs):
+    saved = getattr(instance, '_saved_semester', None)
+    bump_model(Class, [(instance.academic_year, instance.semester)] + ([saved] if saved else []))
+
+
+@receiver(pre_delete, sender=Course)
+@receiver(pre_delete, sender=Faculty)
+def remember_linked_semesters(sender, instance, **kwargs):
+    # The links are gone by post_delete
+    instance._linked_semesters = linked_semesters(instance)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Faculty)
+def invalidate_teaching(sender, instance, created=False, **kwargs):
+    # Course and faculty names appear in the grids of the semesters they teach in
+    if created:
+        semesters = ()
+    elif hasattr(instance, '_linked_semesters'):
+        semesters = instance._linked_semesters
+    else:
+        semesters = linked_semesters(instance)
+    bump_model(sender, semesters)
+
+
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_student(sender, **kwargs):
+    # Student timetables follow their registrations, which signal on their own
+    bump_model(Student)
+
+
+@receiver(m2m_changed, sender=Class.faculty.through)
+def invalidate_class_faculty(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._linked_semesters = linked_semesters(instance)
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        semesters = [(instance.academic_year, instance.semester)]
+    elif action == 'post_clear':
+        semesters = instance._linked_semesters
+    else:
+        semesters = Class.objects.filter(pk__in=pk_set).values_list('academic_year', 'semester')
+    bump_on_commit([OCCUPANCY_SCOPE], semesters)
+
+
+@receiver([post_save, post_delete], sender=GridDefinition)
+def invalidate_all(sender, **kwargs):
+    # The week grid lays out every timetable and occupancy mask
+    bump_on_commit([GLOBAL_SCOPE])
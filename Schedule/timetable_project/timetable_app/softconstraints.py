@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from .models import SlotPreference, SpreadPreference
+
+
+def _matches(preference, course_id, course_type, faculty_ids=None):
+    if preference.course and preference.course != course_id:
+        return False
+    if preference.course_type and preference.course_type != course_type:
+        return False
+    return faculty_ids is None or not preference.faculty or preference.faculty in faculty_ids
+
+
+def min_square_sum(total, days):
+    """The least sum of squared per-day counts for total slots over days, reached by an even spread."""
+    per_day, extra = divmod(total, days)
+    return per_day * per_day * (days - extra) + (per_day + 1) * (per_day + 1) * extra
+
+
+class SoftConstraints:
+    """
+    The compiled soft constraints of a GA run.
+
+    penalty is a dense (class, day, slot) matrix flattened row by row: the
+    cost of class main_id in the cell of grid bit b is
+    penalty[offsets[main_id] + b.bit_length() - 1]. Every SlotPreference
+    row is summed into it up front, so an individual's preference cost is
+    one gather and sum over its genes. spread holds the weight of each
+    course whose slots should be spread evenly over the week.
+    """
+
+    def __init__(self, grid, classes, class_faculty, slot_preferences=(), spread_preferences=()):
+        self.grid = grid
+        size = len(grid.cells)
+        self.offsets = {main_id: row * size for row, main_id in enumerate(classes)}
+        self.penalty = [0] * (len(classes) * size)
+        self.spread = defaultdict(int)
+
+        for preference in slot_preferences:
+            cells = [i for i, (day, slot) in enumerate(grid.cells)
+                     if preference.day in (0, day) and preference.slot in (0, slot)]
+            for main_id, cls in classes.items():
+                if _matches(preference, cls.course_id, cls.course.course_type, class_faculty[main_id]):
+                    offset = self.offsets[main_id]
+                    for i in cells:
+                        self.penalty[offset + i] += preference.penalty
+
+        for preference in spread_preferences:
+            for cls in {cls.course_id: cls for cls in classes.values()}.values():
+                if _matches(preference, cls.course_id, cls.course.course_type):
+                    self.spread[cls.course.name] += preference.weight
+
+        self.active = any(self.penalty) or bool(self.spread)
+
+    def index(self, main_id, bit):
+        """The matrix index of a class in the cell of a grid bit."""
+        return self.offsets[main_id] + bit.bit_length() - 1
+
+    def cost(self, indices, course_per_day):
+        """
+        Penalty of an individual from the matrix indices of its genes and its
+        {day: {course_name: slots}} counts.
+        """
+        penalty = self.penalty
+        total = sum(map(penalty.__getitem__, indices))
+        days = len(self.grid.days)
+        for course_name, weight in self.spread.items():
+            counts = [courses.get(course_name, 0) for courses in course_per_day.values()]
+            total += weight * (sum(n * n for n in counts) - min_square_sum(sum(counts), days))
+        return total
+
+    def evaluate(self, genes):
+        """Penalty of (day, slot, main_id, course_name) genes, for reporting."""
+        course_per_day = defaultdict(lambda: defaultdict(int))
+        indices = []
+        for day, slot, main_id, course_name in genes:
+            indices.append(self.index(main_id, self.grid.bit(day, slot)))
+            course_per_day[day][course_name] += 1
+        return self.cost(indices, course_per_day)
+
+
+def compile_soft_constraints(grid, classes, class_faculty):
+    """SoftConstraints for classes ({main_id: Class with its course}) from every stored preference."""
+    return SoftConstraints(grid, classes, class_faculty, SlotPreference.objects.all(), SpreadPreference.objects.all())
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Libraries only the upload, export and GA paths need; a web worker should
+# not have any of them loaded after it has set up Django and its URLconf
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'timetable_app.ga', 'timetable_app.tuning')
+
+# Run in a fresh interpreter, as a worker starts: set up Django, load the
+# URLconf and resolve a URL, then optionally import more modules
+PROBE = """
+import json, resource, sys, time
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import resolve
+resolve('/')
+report = {'seconds': time.perf_counter() - started, 'rss': rss(),
+          'heavy': [m for m in json.loads(sys.argv[1]) if m in sys.modules]}
+started = time.perf_counter()
+for module in json.loads(sys.argv[2]):
+    __import__(module)
+report['extra_seconds'] = time.perf_counter() - started
+report['extra_rss'] = rss() - report['rss']
+print(json.dumps(report))
+"""
+
+
+def probe(extra=(), heavy=HEAVY_MODULES):
+    """
+    Start one interpreter as a web worker would and return its startup
+    seconds, RSS in bytes and the heavy modules it loaded, plus the time and
+    memory that importing the extra modules afterwards added.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps(list(heavy)), json.dumps(list(extra))],
+        cwd=settings.BASE_DIR, env=os.environ, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
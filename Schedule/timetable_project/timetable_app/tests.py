@@ -1,3 +1,696 @@
-from django.test import TestCase
+import io
+import tempfile
+from collections import defaultdict
+from contextlib import redirect_stdout
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import ga
+from .audit import audit_rows, audit_year
+from .cache import bump_semester
+from .coenrolment import CoEnrolment, coenrolment
+from .importers import ImportDataError, import_classes, import_rows
+from .lookups import get_grid
+from .models import Class, Course, CustomUser, Faculty, Registration, Student, Timetable, TimetableVersion
+from .models import SlotPreference, SpreadPreference
+from .occupancy import occupancy_index, search
+from .profiling import QueryBudgetExceeded
+from .repair import StalePlan, apply_plan, repair_section
+from .softconstraints import SoftConstraints
+from .startup import HEAVY_MODULES, probe
+from .validators import validate_timetable_constraints
+from .versions import diff, rollback, section_rows, snapshot, versions
+from .weekgrid import WeekGrid, current_grid
+
+# Keep test runs out of the project's cache directory
+_cache_dir = tempfile.TemporaryDirectory(prefix='timetable-test-cache-')
+isolated_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': _cache_dir.name,
+}})
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_url_resolution_loads_no_heavy_modules(self):
+        # In a fresh interpreter, since this one may have imported them already
+        self.assertEqual(probe()['heavy'], [], f"Web workers should not import any of {', '.join(HEAVY_MODULES)}")
+
+
+@isolated_cache
+@override_settings(PROFILING_ENABLED=True, QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(TestCase):
+    """Each budgeted view stays within its @query_budget on a cold cache."""
+    TIMETABLE = {'academic_year': '2025_odd', 'semester': '5', 'dept': 'CSE'}
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = [Faculty.objects.create(faculty_id=f'F{i}', faculty_name=f'Faculty {i}', department='CSE') for i in range(3)]
+        students = [Student.objects.create(stud_id=f'S{i}', name=f'Student {i}', department='CSE') for i in range(3)]
+        for i, (name, course_type) in enumerate([('DL', 'none'), ('FS', 'none'), ('OE', 'tt')]):
+            course = Course.objects.create(course_id=f'C{i}', name=name, code=f'X{i}', course_type=course_type, hours_per_week=2)
+            main = Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE', venue=f'R{i}')
+            main.faculty.add(faculty[i])
+            for student in students:
+                Registration.objects.create(stud_id=student, main_id=main)
+            Timetable.objects.create(main_id=main, day=i + 1, slot=1)
+        cls.user = CustomUser.objects.create_user('coordinator', 'c@example.com', 'secret', role='TT_Coordinator')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session.update({'current_year': '2025_odd', 'current_semester': '5', 'section': '1', 'dept': 'CSE'})
+        session.save()
+
+    def test_pages(self):
+        self.assertEqual(self.client.get('/add_timetable/').status_code, 200)
+        self.assertEqual(self.client.post('/view-timetable/', {'user_input': 'admin', 'section': '1', **self.TIMETABLE}).status_code, 200)
+        self.assertEqual(self.client.get('/audit-timetables/', {'academic_year': '2025_odd'}).status_code, 200)
+        self.assertEqual(self.client.get('/free-finder/', {'academic_year': '2025_odd', 'at': '1:1'}).status_code, 200)
+        self.assertEqual(self.client.get('/analytics/', self.TIMETABLE).status_code, 200)
+
+    def streamed(self, path, params=None):
+        """GET a streamed download and read its body, where the export queries run."""
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_downloads(self):
+        self.client.post('/view-timetable/', {'user_input': 'admin', 'section': '1', **self.TIMETABLE})
+        self.assertTrue(self.streamed('/download-timetable/'))
+        for entity in ['student', 'faculty', 'venue']:
+            for export_format in ['zip', 'workbook']:
+                self.assertTrue(self.streamed('/export-timetables/', {'entity': entity, 'format': export_format, **self.TIMETABLE}))
+
+    def test_streamed_body_counts_toward_budget(self):
+        # The export runs no query before its response, and two while the body is read
+        with override_settings(QUERY_BUDGETS={'export_timetables': 1}):
+            response = self.client.get('/export-timetables/', {'entity': 'student', **self.TIMETABLE})
+            with self.assertRaisesMessage(QueryBudgetExceeded, "ran 2 queries, over its budget of 1"):
+                b''.join(response.streaming_content)
+
+    def test_api(self):
+        for entity, ident in [('section', '1'), ('student', 'S0'), ('faculty', 'F0'), ('venue', 'R0')]:
+            self.assertEqual(self.client.get(f'/api/timetables/{entity}/{ident}/', self.TIMETABLE).status_code, 200)
+            self.assertEqual(self.client.get(f'/api/timetables/{entity}/{ident}.ics', self.TIMETABLE).status_code, 200)
+        self.assertEqual(self.client.get('/api/free/', {'academic_year': '2025_odd', 'at': '1:1'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/analytics/', {'academic_year': '2025_odd'}).status_code, 200)
+
+    def test_over_budget_raises(self):
+        with override_settings(QUERY_BUDGETS={'workload_analytics_json': 1}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "over its budget of 1"):
+                self.client.get('/api/analytics/', {'academic_year': '2025_odd'})
+
+
+@isolated_cache
+class CacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(course_id='C0', name='DL', code='X0', course_type='none', hours_per_week=2)
+        cls.main = Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE')
+        cls.main.faculty.add(Faculty.objects.create(faculty_id='F0', faculty_name='Faculty 0', department='CSE'))
+        cls.row = Timetable.objects.create(main_id=cls.main, day=1, slot=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def grid(self):
+        return get_grid('faculty', 'F0', '2025_odd', '5')
+
+    def test_bump_from_another_process_invalidates_grid(self):
+        before = self.grid()
+        Timetable.objects.filter(pk=self.row.pk).update(day=2)  # sends no signal
+        self.assertEqual(self.grid(), before)
+        # A separate cache instance stands in for a worker or management command
+        with mock.patch('timetable_app.cache.cache', caches.create_connection('default')):
+            bump_semester('2025_odd', '5')
+        self.assertNotEqual(self.grid(), before)
+
+    def test_timetable_write_invalidates_after_commit(self):
+        before = self.grid()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.row.day = 2
+            self.row.save()
+            # Still inside the transaction, other readers see the old rows
+            self.assertEqual(self.grid(), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.grid(), before)
+
+
+@isolated_cache
+class VersionTests(TestCase):
+    KEY = ('2025_odd', '5', '1', 'CSE')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.main_ids = []
+        for i, name in enumerate(['<script>DL</script>', 'FS']):
+            course = Course.objects.create(course_id=f'C{i}', name=name, code=f'X{i}', course_type='none', hours_per_week=2)
+            main = Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE')
+            Timetable.objects.create(main_id=main, day=1, slot=i + 1)
+            cls.main_ids.append(main.pk)
+        cls.user = CustomUser.objects.create_user('dept', 'd@example.com', 'secret', role='Department_Coordinator')
+
+    def rows(self):
+        return set(section_rows(*self.KEY).values_list('main_id', 'day', 'slot'))
+
+    def test_unchanged_snapshot_reuses_latest_but_keeps_seed(self):
+        first = snapshot(*self.KEY, reason="before GA run")
+        self.assertEqual(snapshot(*self.KEY, reason="again").pk, first.pk)
+        seeded = snapshot(*self.KEY, reason="GA run", ga_seed=7)
+        self.assertEqual((seeded.number, seeded.reason, seeded.ga_seed), (2, "GA run", 7))
+
+    def test_snapshot_retries_number_taken_concurrently(self):
+        # Another snapshot of the section commits version 1 after this one read
+        # that there were none
+        other = snapshot(*self.KEY, reason="other")
+        seen = [TimetableVersion.objects.none(), versions(*self.KEY)]
+        with mock.patch('timetable_app.versions.versions', side_effect=seen):
+            version = snapshot(*self.KEY, reason="GA run", ga_seed=7)
+        self.assertEqual((other.number, version.number), (1, 2))
+
+    def test_diff_and_rollback(self):
+        a, b = self.main_ids
+        original = self.rows()
+        first = snapshot(*self.KEY)
+        Timetable.objects.filter(main_id=a).update(day=2)
+        second = snapshot(*self.KEY)
+        self.assertEqual(diff(first, second), [
+            {'day': 1, 'slot': 1, 'removed': [a], 'added': []},
+            {'day': 2, 'slot': 1, 'removed': [], 'added': [a]},
+        ])
+        self.assertEqual(diff(second, second), [])
+
+        restored = rollback(first)
+        self.assertEqual(self.rows(), original)
+        self.assertEqual((restored.number, restored.cells), (3, first.cells))
+        self.assertEqual(diff(second, restored), diff(second, first))
+
+    def test_rollback_leaves_out_deleted_classes(self):
+        a, b = self.main_ids
+        first = snapshot(*self.KEY)
+        Class.objects.filter(pk=b).delete()
+        rollback(first)
+        self.assertEqual(self.rows(), {(a, 1, 1)})
+
+    def test_page_escapes_names(self):
+        first = snapshot(*self.KEY, reason="<b>manual</b>")
+        Timetable.objects.filter(main_id=self.main_ids[0]).update(slot=3)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session.update({'current_year': '2025_odd', 'current_semester': '5', 'section': '1', 'dept': 'CSE'})
+        session.save()
+        content = self.client.get('/timetable-versions/', {'old': first.number, 'new': 'current'}).content.decode()
+        self.assertIn('&lt;script&gt;DL&lt;/script&gt;', content)
+        self.assertIn('&lt;b&gt;manual&lt;/b&gt;', content)
+        self.assertNotIn('<script>DL', content)
+        self.assertIn('2 cells differ', content)
+
+
+def class_row(course, section='1', faculty='', main_id=None, venue='R1'):
+    return {'main_id': main_id, 'section_id': section, 'academic_year': '2025_odd', 'semester': '5',
+            'dept': 'CSE', 'venue': venue, 'course': course, 'faculty': faculty}
+
+
+@isolated_cache
+class ClassImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(2):
+            Course.objects.create(course_id=f'C{i}', name=f'Course {i}', code=f'X{i}', course_type='none', hours_per_week=2)
+            Faculty.objects.create(faculty_id=f'F{i}', faculty_name=f'Faculty {i}', department='CSE')
+
+    def links(self):
+        return set(Class.faculty.through.objects.values_list('class__course_id', 'faculty_id'))
+
+    def test_upserts_classes_and_counts_new_links(self):
+        rows = [class_row('C0', faculty='F0, F1'), class_row('C0', faculty='F1'), class_row('C1', faculty='F0')]
+        stats, links = import_classes(rows)
+        self.assertEqual((stats.rows, stats.created, stats.skipped, links), (3, 2, 0, 3))
+        self.assertEqual(self.links(), {('C0', 'F0'), ('C0', 'F1'), ('C1', 'F0')})
+
+        stats, links = import_classes(rows)
+        self.assertEqual((stats.created, stats.updated, stats.skipped, links), (0, 0, 2, 0))
+        self.assertEqual(Class.objects.count(), 2)
+
+        stats, links = import_classes([class_row('C1', faculty='F0, F1', venue='R2')])
+        self.assertEqual((stats.updated, links), (1, 1))
+        self.assertEqual(Class.objects.get(course='C1').venue, 'R2')
+
+    def test_class_spanning_chunks_is_counted_once(self):
+        rows = [class_row('C0', faculty='F0'), class_row('C0', faculty='F1'), class_row('C1')]
+        stats, links = import_classes(rows, chunk_size=1)
+        self.assertEqual((stats.created, stats.skipped, links), (2, 0, 2))
+
+    def test_unknown_course_aborts_whole_import(self):
+        with self.assertRaisesMessage(ImportDataError, "Row 3: Course with ID C9 does not exist."):
+            import_classes([class_row('C0'), class_row('C9')])
+        self.assertFalse(Class.objects.exists())
+
+
+@isolated_cache
+class ImportErrorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(2):
+            Course.objects.create(course_id=f'C{i}', name=f'Course {i}', code=f'X{i}', course_type='none', hours_per_week=2)
+        Faculty.objects.create(faculty_id='F0', faculty_name='Faculty 0', department='CSE')
+
+    def test_rows_skip_duplicates_and_record_errors(self):
+        main = Class.objects.create(course_id='C0', section_id='1', academic_year='2025_odd', semester='5', dept='CSE')
+        for i in range(2):
+            Student.objects.create(stud_id=f'S{i}', name=f'Student {i}', department='CSE')
+        Registration.objects.create(stud_id_id='S1', main_id=main)
+        rows = [{'stud_id': stud_id, 'main_id': main.pk} for stud_id in ['S0', 'S0', 'S9', 'S1', 'x']]
+        errors, progress = [], []
+        stats = import_rows(Registration, rows, ['stud_id', 'main_id'], chunk_size=2, errors=errors,
+                            on_chunk=lambda stats: progress.append(stats.rows))
+        self.assertEqual((stats.created, stats.skipped), (1, 2))
+        self.assertEqual(errors, [
+            {'row': 4, 'error': "Student with ID S9 does not exist."},
+            {'row': 6, 'error': "Student with ID x does not exist."},
+        ])
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(Registration.objects.filter(stud_id='S0').count(), 1)
+
+    def test_class_rows_with_errors_are_skipped(self):
+        errors = []
+        stats, links = import_classes([
+            class_row('C0', faculty='F0'),
+            class_row('C9'),
+            class_row('C1', faculty='F0, F9'),
+            class_row('C1', section='2', faculty='F0'),
+        ], chunk_size=2, errors=errors)
+        self.assertEqual(errors, [
+            {'row': 3, 'error': "Course with ID C9 does not exist."},
+            {'row': 4, 'error': "Faculty with ID F9 does not exist."},
+        ])
+        self.assertEqual((stats.created, links), (2, 2))
+
+    def test_main_id_claimed_twice_in_a_chunk(self):
+        errors = []
+        stats, _ = import_classes([class_row('C0', main_id=50), class_row('C1', main_id=50)], errors=errors)
+        self.assertEqual(errors, [{'row': 3, 'error': "Class with ID 50 already exists for another course or section."}])
+        self.assertEqual(stats.created, 1)
+        self.assertEqual(Class.objects.get(main_id=50).course_id, 'C0')
+
+
+@isolated_cache
+class AuditTests(TestCase):
+    def audit(self, rows, faculty_of=None):
+        """{rule: [(subject, main_ids, day, slot)]} for rows of (main_id, day, slot, course, type, section, venue)."""
+        violations = audit_rows('2025_odd', [
+            (day, slot, main_id, course, course_type, '5', section, 'CSE', venue)
+            for main_id, day, slot, course, course_type, section, venue in rows
+        ], faculty_of or {})
+        found = defaultdict(list)
+        for v in violations:
+            found[v['rule']].append((v['subject'], v['main_ids'], v['day'], v['slot']))
+        return dict(found)
+
+    def test_clean_timetable(self):
+        self.assertEqual(self.audit([
+            (1, 1, 1, 'DL', 'none', '1', 'R1'),
+            (2, 1, 3, 'FS', 'none', '1', 'R1'),
+            (3, 1, 1, 'DL', 'none', '2', 'R2'),
+        ]), {})
+
+    def test_slot_uniqueness_applies_to_main_courses(self):
+        self.assertEqual(self.audit([
+            (1, 1, 1, 'DL', 'none', '1', None),
+            (2, 1, 1, 'OE', 'tt', '1', None),
+            (3, 1, 2, 'OE', 'tt', '1', None),
+            (4, 1, 2, 'PE', 'tt', '1', None),
+        ]), {'slot_uniqueness': [('DL, OE', '1 2', 1, 1)]})
+
+    def test_venue_clash_skips_shared_venues(self):
+        self.assertEqual(self.audit([
+            (1, 1, 1, 'DL', 'none', '1', 'R1'),
+            (2, 1, 1, 'FS', 'none', '2', 'R1'),
+            (3, 2, 1, 'CN', 'none', '1', 'pg'),
+            (4, 2, 1, 'OS', 'none', '2', 'pg'),
+        ]), {'venue_clash': [('R1', '1 2', 1, 1)]})
+
+    def test_faculty_double_booking_skips_exempt_courses(self):
+        faculty = [('F0', 'Faculty 0')]
+        self.assertEqual(self.audit([
+            (1, 1, 1, 'DL', 'none', '1', None),
+            (2, 1, 1, 'FS', 'none', '2', None),
+            (3, 2, 1, 'PET', 'none', '1', None),
+            (4, 2, 1, 'PET', 'none', '2', None),
+        ], {m: faculty for m in range(1, 5)}), {'faculty_double_booking': [('Faculty 0 (F0)', '1 2', 1, 1)]})
+
+    def test_adjacent_and_repeated_main_course(self):
+        self.assertEqual(self.audit([
+            (1, 1, 1, 'DL', 'none', '1', None),
+            (1, 1, 2, 'DL', 'none', '1', None),
+            (1, 1, 5, 'DL', 'none', '1', None),
+            (2, 2, 1, 'OE', 'tt', '1', None),
+            (2, 2, 2, 'OE', 'tt', '1', None),
+        ]), {
+            'main_course_adjacency': [('DL', '1', 1, '1-2')],
+            'main_course_max_per_day': [('DL', '1', 1, '')],
+        })
+
+    def test_faculty_continuous_reports_the_whole_run(self):
+        faculty = [('F0', 'Faculty 0')]
+        rows = [
+            (1, 1, 1, 'DL', 'none', '1', None),
+            (2, 1, 3, 'FS', 'none', '1', None),
+            (3, 1, 2, 'CN', 'none', '2', None),  # the middle slot completes the run
+            (4, 1, 5, 'OS', 'none', '2', None),
+        ]
+        faculty_of = {m: faculty for m in range(1, 5)}
+        self.assertEqual(self.audit(rows[:2] + rows[3:], faculty_of), {})
+        self.assertEqual(self.audit(rows, faculty_of), {'faculty_continuous': [('Faculty 0 (F0)', '1 2 3', 1, '1-3')]})
+
+
+@isolated_cache
+class OccupancyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(faculty_id='F0', faculty_name='Faculty 0', department='CSE')
+        cls.classes = []
+        for i in range(2):
+            course = Course.objects.create(course_id=f'C{i}', name=f'Course {i}', code=f'X{i}', course_type='none', hours_per_week=2)
+            main = Class.objects.create(course=course, section_id=str(i), academic_year='2025_odd', semester='5', dept='CSE', venue=f'R{i}')
+            main.faculty.add(faculty)
+            cls.classes.append(main)
+
+    def setUp(self):
+        cache.clear()
+
+    def busy(self):
+        index = occupancy_index('2025_odd')
+        return current_grid().cells_of(index['faculty']['F0']), current_grid().cells_of(index['venue']['R1'])
+
+    def test_concurrent_timetable_writes_are_both_kept(self):
+        self.assertEqual(self.busy(), ([], []))
+        # Two writers commit one after the other; neither patches the index
+        with self.captureOnCommitCallbacks(execute=True):
+            Timetable.objects.create(main_id=self.classes[0], day=1, slot=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Timetable.objects.create(main_id=self.classes[1], day=2, slot=3)
+        self.assertEqual(self.busy(), ([(1, 1), (2, 3)], [(2, 3)]))
+
+    def test_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Timetable.objects.create(main_id=self.classes[1], day=1, slot=1)
+        self.assertEqual(search('2025_odd', times=[(1, 1)]), {'venues': ['R0'], 'faculty': []})
+        self.assertEqual(search('2025_odd', times=[(1, 1), (1, 2)], match='any'),
+                         {'venues': ['R0', 'R1'], 'faculty': [('F0', 'Faculty 0')]})
+        self.assertEqual(search('2025_odd', times=[(1, 1), (1, 2)], venues=['R1'])['slots'], [(1, 2)])
+
+
+class CoEnrolmentTests(SimpleTestCase):
+    def brute_force(self, matrix, main_ids):
+        main_ids = sorted(set(main_ids))
+        return sorted((a, b, matrix.shared(a, b)) for i, a in enumerate(main_ids) for b in main_ids[i + 1:] if matrix.shared(a, b))
+
+    def test_rows(self):
+        matrix = CoEnrolment([(1, 2, 3), (1, 3, 1), (2, 3, 2), (4, 5, 1)])
+        self.assertEqual(len(matrix), 4)
+        self.assertEqual(matrix.neighbours(1), {2: 3, 3: 1})
+        self.assertEqual(matrix.neighbours(9), {})
+        self.assertEqual((matrix.shared(2, 1), matrix.shared(1, 5), matrix.shared(9, 1)), (3, 0, 0))
+
+    def test_pairs_within_small_and_large_cells(self):
+        # Three classes sharing students, looked up pair by pair
+        matrix = CoEnrolment([(1, 2, 3), (1, 3, 1), (2, 3, 2), (4, 5, 1)])
+        self.assertEqual(sorted(matrix.pairs_within([3, 1, 2, 9, 1])), [(1, 2, 3), (1, 3, 1), (2, 3, 2)])
+        # Many classes with one partner each, found by walking their rows
+        matrix = CoEnrolment([(i, i + 1, i + 1) for i in range(0, 40, 2)])
+        cell = list(range(0, 30)) + [100]
+        self.assertEqual(sorted(matrix.pairs_within(cell)), self.brute_force(matrix, cell))
+        self.assertEqual(len(list(matrix.pairs_within(cell))), 15)
+
+    def test_clashes(self):
+        matrix = CoEnrolment([(1, 2, 3), (1, 3, 1), (2, 3, 2), (4, 5, 1)])
+        self.assertEqual(matrix.clashes([
+            (1, 1, 1), (1, 1, 2),             # 3 students
+            (1, 2, 1), (1, 2, 2), (1, 2, 3),  # 3 + 1 + 2
+            (2, 1, 4), (2, 1, 5), (2, 1, 9),  # 1
+            (2, 2, 9),
+        ]), 10)
+
+
+@isolated_cache
+class StudentClashTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = {}
+        for i, (name, course_type) in enumerate([('DL', 'none'), ('FS', 'none'), ('OE', 'tt'), ('PE', 'tt')]):
+            course = Course.objects.create(course_id=f'C{i}', name=name, code=f'X{i}', course_type=course_type, hours_per_week=2)
+            cls.classes[name] = Class.objects.create(course=course, section_id=str(i), academic_year='2025_odd', semester='5',
+                                                     dept='CSE', venue=f'R{i}')
+        for i, names in enumerate([['DL', 'OE', 'PE'], ['DL', 'FS', 'OE'], ['FS', 'OE']]):
+            student = Student.objects.create(stud_id=f'S{i}', name=f'Student {i}', department='CSE')
+            for name in names:
+                Registration.objects.create(stud_id=student, main_id=cls.classes[name])
+
+    def setUp(self):
+        cache.clear()
+
+    def pairs(self):
+        matrix = coenrolment('2025_odd', '5')
+        ids = {main.pk: name for name, main in self.classes.items()}
+        return {(ids[a], ids[b], students) for a, b, students in matrix.pairs_within(list(ids))}
+
+    def test_matrix_counts_pairs_with_an_elective(self):
+        # DL and FS share student S1, but neither is an elective
+        self.assertEqual(self.pairs(), {('DL', 'OE', 2), ('DL', 'PE', 1), ('FS', 'OE', 2), ('OE', 'PE', 1)})
+
+    def test_course_type_change_rebuilds_matrix(self):
+        self.pairs()
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.get(name='FS')
+            course.course_type = 'dept'
+            course.save()
+        self.assertIn(('DL', 'FS', 1), self.pairs())
+
+    def test_audit_reports_student_clash(self):
+        Timetable.objects.create(main_id=self.classes['DL'], day=1, slot=1)
+        Timetable.objects.create(main_id=self.classes['OE'], day=1, slot=1)
+        Timetable.objects.create(main_id=self.classes['FS'], day=1, slot=2)
+        Timetable.objects.create(main_id=self.classes['PE'], day=1, slot=2)
+        clashes = [(v['main_ids'], v['detail']) for v in audit_year('2025_odd') if v['rule'] == 'student_clash']
+        dl, oe = self.classes['DL'].pk, self.classes['OE'].pk
+        self.assertEqual(clashes, [(f"{dl} {oe}", "2 students are registered for both classes.")])
+
+    def test_validator_rejects_student_clash(self):
+        Timetable.objects.create(main_id=self.classes['OE'], day=1, slot=1)
+        with self.assertRaisesMessage(ValidationError, "2 students registered for this class already have another class"):
+            validate_timetable_constraints(self.classes['FS'].pk, 1, 1, '2025_odd', '5', '1', 'CSE')
+        validate_timetable_constraints(self.classes['FS'].pk, 1, 2, '2025_odd', '5', '1', 'CSE')
+
+
+@isolated_cache
+class RepairTests(TestCase):
+    KEY = ('2025_odd', '5', '1', 'CSE')
+
+    @classmethod
+    def setUpTestData(cls):
+        courses = [Course.objects.create(course_id=f'C{i}', name=name, code=f'X{i}', course_type='none', hours_per_week=2)
+                   for i, name in enumerate(['<i>DL</i>', 'FS'])]
+        cls.dl, cls.fs = [Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE')
+                          for course in courses]
+        # DL runs two slots in a row
+        for slot in (1, 2):
+            Timetable.objects.create(main_id=cls.dl, day=1, slot=slot)
+        Timetable.objects.create(main_id=cls.fs, day=1, slot=3)
+        cls.user = CustomUser.objects.create_user('dept', 'd@example.com', 'secret', role='Department_Coordinator')
+
+    def rows(self):
+        return sorted(section_rows(*self.KEY).values_list('main_id', 'day', 'slot'))
+
+    def test_preview_then_apply(self):
+        original = self.rows()
+        result = repair_section(*self.KEY)
+        self.assertEqual((result['before'], result['after'], len(result['moves'])), (1, 0, 1))
+        self.assertEqual(self.rows(), original)
+
+        moves = apply_plan(*self.KEY, result['plan'])
+        self.assertEqual(moves, result['moves'])
+        self.assertNotEqual(self.rows(), original)
+        self.assertEqual(repair_section(*self.KEY)['before'], 0)
+
+    def test_rejects_bad_plans(self):
+        plan = repair_section(*self.KEY)['plan']
+        original = self.rows()
+        with self.assertRaisesMessage(StalePlan, "not a valid repair plan"):
+            apply_plan(*self.KEY, plan[:-1] + ('A' if plan[-1] != 'A' else 'B'))
+        with self.assertRaisesMessage(StalePlan, "another section"):
+            apply_plan('2025_odd', '5', '2', 'CSE', plan)
+        # A row the plan was computed from changes before it is applied
+        Timetable.objects.filter(main_id=self.fs).update(slot=4)
+        with self.assertRaisesMessage(StalePlan, "has changed"):
+            apply_plan(*self.KEY, plan)
+        self.assertEqual(self.rows(), sorted(original[:2] + [(self.fs.pk, 1, 4)]))
+
+    def test_page_escapes_names(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session.update({'current_year': '2025_odd', 'current_semester': '5', 'section': '1', 'dept': 'CSE'})
+        session.save()
+        content = self.client.get('/repair-timetable/').content.decode()
+        self.assertIn('&lt;i&gt;DL&lt;/i&gt;', content)
+        self.assertNotIn('<i>DL', content)
+        self.assertIn('Apply these moves', content)
+
+
+@isolated_cache
+class SeededRunTests(TestCase):
+    CONFIG = dict(initial_population=10, population=8, min_population=4, generations=5, min_elite=2, max_retries=0)
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, name in enumerate(['DL', 'FS', 'SE']):
+            course = Course.objects.create(course_id=f'C{i}', name=name, code=f'X{i}', course_type='none', hours_per_week=3)
+            main = Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE', venue=f'R{i}')
+            main.faculty.add(Faculty.objects.create(faculty_id=f'F{i}', faculty_name=f'Faculty {i}', department='CSE'))
+
+    def solve(self, seed):
+        with redirect_stdout(io.StringIO()):
+            assignments, _, stats = ga.solve('2025_odd', '5', '1', 'CSE', seed=seed, ga_config=ga.GAConfig(**self.CONFIG))
+        return assignments, stats['fitness']
+
+    def test_seed_reproduces_the_run(self):
+        first = self.solve(1234)
+        self.assertTrue(first[0])
+        self.assertEqual(self.solve(1234), first)
+
+    def test_seed_streams_do_not_overlap(self):
+        draws = lambda *path: [ga.seed_stream(*path).random() for _ in range(3)]
+        self.assertEqual(draws(7, 'retry', 0), draws(7, 'retry', 0))
+        self.assertNotEqual(draws(7, 'retry', 1), draws(8, 'retry', 0))
+        self.assertNotEqual(draws(7, 'retry', 0), draws(7, 'member', 0))
+
+
+@isolated_cache
+class ETagTests(TestCase):
+    TIMETABLE = {'academic_year': '2025_odd', 'semester': '5', 'dept': 'CSE'}
+
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(course_id='C0', name='DL', code='X0', course_type='none', hours_per_week=2)
+        cls.main = Class.objects.create(course=course, section_id='1', academic_year='2025_odd', semester='5', dept='CSE', venue='R0')
+        Timetable.objects.create(main_id=cls.main, day=1, slot=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_timetable_is_not_modified(self):
+        for path in ['/api/timetables/venue/R0/', '/api/timetables/venue/R0.ics']:
+            response = self.client.get(path, self.TIMETABLE)
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(0):
+                response = self.client.get(path, self.TIMETABLE, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_timetable_write_changes_etag(self):
+        etag = self.client.get('/api/timetables/venue/R0/', self.TIMETABLE)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Timetable.objects.create(main_id=self.main, day=2, slot=1)
+        response = self.client.get('/api/timetables/venue/R0/', self.TIMETABLE, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['count']), (200, 2))
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_ics_rejects_bad_weeks(self):
+        self.assertEqual(self.client.get('/api/timetables/venue/R0.ics', {'weeks': '0', **self.TIMETABLE}).status_code, 400)
+
+
+class WeekGridTests(SimpleTestCase):
+    def setUp(self):
+        # Two days of five slots, with a break after slot 2
+        self.grid = WeekGrid(['Mon', 'Tue'], ['1', '2', '3', '4', '5'], breaks=[2])
+
+    def cells(self, mask):
+        return self.grid.cells_of(mask)
+
+    def test_layout(self):
+        self.assertEqual((self.grid.width, len(self.grid.cells)), (5, 10))
+        self.assertEqual(self.grid.bit(2, 1), 1 << 5)
+        self.assertEqual(self.grid.bit(3, 1), 0)
+        self.assertEqual(self.cells(self.grid.mask([(1, 5), (2, 1), (9, 9)])), [(1, 5), (2, 1)])
+
+    def test_pairs_stop_at_breaks_and_days(self):
+        # Slots 2-3 straddle the break and Monday 5 does not run on to Tuesday 1
+        mask = self.grid.mask([(1, 1), (1, 2), (1, 3), (1, 5), (2, 1), (2, 3), (2, 4), (2, 5)])
+        self.assertEqual(self.cells(self.grid.pairs(mask)), [(1, 1), (2, 3), (2, 4)])
+        self.assertEqual(self.cells(self.grid.triples(mask)), [(2, 3)])
+
+    def test_completes_triple_in_any_position(self):
+        busy = self.grid.mask([(2, 3), (2, 5)])
+        self.assertTrue(self.grid.completes_triple(busy, self.grid.bit(2, 4)))  # the middle slot
+        self.assertTrue(self.grid.completes_triple(self.grid.mask([(2, 4), (2, 5)]), self.grid.bit(2, 3)))
+        self.assertFalse(self.grid.completes_triple(self.grid.mask([(1, 1), (1, 3)]), self.grid.bit(1, 2)))
+
+    def test_neighbours(self):
+        self.assertEqual(self.cells(self.grid.neighbours(self.grid.bit(1, 2))), [(1, 1)])
+        self.assertEqual(self.cells(self.grid.neighbours(self.grid.bit(2, 4))), [(2, 3), (2, 5)])
+        self.assertEqual(self.cells(self.grid.neighbours(self.grid.bit(1, 5))), [(1, 4)])
+
+    def test_runs(self):
+        self.assertEqual(self.grid.runs([1, 2, 3, 5]), [[1, 2], [3, 3], [5, 5]])
+
+
+@isolated_cache
+class FacultyContinuousTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(faculty_id='F0', faculty_name='Faculty 0', department='CSE')
+        cls.classes = []
+        for i in range(3):
+            course = Course.objects.create(course_id=f'C{i}', name=f'Course {i}', code=f'X{i}', course_type='none', hours_per_week=2)
+            main = Class.objects.create(course=course, section_id=str(i), academic_year='2025_odd', semester='5', dept='CSE')
+            main.faculty.add(faculty)
+            cls.classes.append(main)
+
+    def test_validator_rejects_the_middle_slot_of_three(self):
+        Timetable.objects.create(main_id=self.classes[0], day=1, slot=1)
+        Timetable.objects.create(main_id=self.classes[1], day=1, slot=3)
+        with self.assertRaisesMessage(ValidationError, "cannot handle more than 2 courses continuously"):
+            validate_timetable_constraints(self.classes[2].pk, 1, 2, '2025_odd', '5', '2', 'CSE')
+        validate_timetable_constraints(self.classes[2].pk, 1, 5, '2025_odd', '5', '2', 'CSE')
+
+
+class SoftConstraintTests(SimpleTestCase):
+    def setUp(self):
+        self.grid = WeekGrid(['Mon', 'Tue'], ['1', '2', '3'])
+        courses = [Course(course_id='C0', name='DL', course_type='none'), Course(course_id='C1', name='OE', course_type='tt')]
+        self.classes = {10: Class(main_id=10, course=courses[0]), 20: Class(main_id=20, course=courses[1])}
+        self.class_faculty = {10: ['F0'], 20: []}
+
+    def compile(self, slot_preferences=(), spread_preferences=()):
+        return SoftConstraints(self.grid, self.classes, self.class_faculty, slot_preferences, spread_preferences)
+
+    def test_no_preferences(self):
+        soft = self.compile()
+        self.assertFalse(soft.active)
+        self.assertEqual(soft.evaluate([(1, 1, 10, 'DL'), (2, 3, 20, 'OE')]), 0)
+
+    def test_slot_preferences_are_summed_per_cell(self):
+        soft = self.compile([
+            SlotPreference(faculty='F0', day=1, slot=0, penalty=5),  # Monday for F0's classes
+            SlotPreference(course_type='tt', day=0, slot=3, penalty=-2),  # last slot for electives
+            SlotPreference(course='C0', day=2, slot=1, penalty=7),
+            SlotPreference(course='C0', day=1, slot=2, penalty=1),
+        ])
+        self.assertTrue(soft.active)
+        bit = self.grid.bit
+        # Rows of six cells, in the order of the classes
+        self.assertEqual((soft.index(10, bit(1, 1)), soft.index(20, bit(2, 3))), (0, 11))
+        self.assertEqual(soft.penalty, [5, 6, 5, 7, 0, 0,
+                                        0, 0, -2, 0, 0, -2])
+        self.assertEqual(soft.evaluate([(1, 2, 10, 'DL'), (2, 3, 20, 'OE')]), 4)
+
+    def test_spread_charges_uneven_days(self):
+        soft = self.compile(spread_preferences=[SpreadPreference(course='C0', weight=4)])
+        self.assertEqual(dict(soft.spread), {'DL': 4})
+        # Three slots in one day against the best 2 + 1: 9 - 5 squared units
+        self.assertEqual(soft.evaluate([(1, 1, 10, 'DL'), (1, 2, 10, 'DL'), (1, 3, 10, 'DL')]), 16)
+        self.assertEqual(soft.evaluate([(1, 1, 10, 'DL'), (1, 3, 10, 'DL'), (2, 2, 10, 'DL')]), 0)
@@ -0,0 +1,142 @@
+import contextlib
+import io
+import logging
+import multiprocessing
+import random
+import time
+from statistics import mean
+
+import django
+from django.db import connections, transaction
+
+from .models import Class, Course, Faculty
+from .ga import GAConfig, solve
+
+logger = logging.getLogger(__name__)
+
+# Values tried for each GAConfig parameter; the rest keep their defaults
+SEARCH_SPACE = {
+    'initial_population': [20, 30, 50, 80],
+    'population': [15, 30, 50],
+    'min_population': [10, 15],
+    'generations': [50, 100, 150],
+    'elite_fraction': [0.05, 0.1, 0.2],
+    'parent_fraction': [0.3, 0.5, 0.7],
+    'stagnation_limit': [10, 20, 30],
+    'mutation_start': [0.3, 0.5, 0.7],
+    'mutation_end': [0.05, 0.1, 0.2],
+}
+INFEASIBLE_PENALTY = 10  # an infeasible run costs this many times its duration
+SYNTHETIC_YEAR = 'synthetic'
+
+
+def sample_configs(count, rng):
+    """The default parameters plus up to count - 1 distinct random draws from SEARCH_SPACE."""
+    configs = [GAConfig()]
+    seen = {tuple(configs[0].as_dict().items())}
+    for _ in range(count * 20):
+        if len(configs) >= count:
+            break
+        params = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        if params['mutation_end'] > params['mutation_start'] or params['min_population'] > params['population']:
+            continue
+        config = GAConfig(**params)
+        key = tuple(config.as_dict().items())
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def delete_synthetic_sections():
+    Class.objects.filter(academic_year=SYNTHETIC_YEAR).delete()
+    Course.objects.filter(course_id__startswith='syn-').delete()
+    Faculty.objects.filter(faculty_id__startswith='syn-f').delete()
+
+
+def make_synthetic_sections(count, seed=0):
+    """
+    Create count sections of 3-5 random main courses under the academic year
+    SYNTHETIC_YEAR and return them as (academic_year, semester, section, dept).
+    """
+    rng = random.Random(seed)
+    delete_synthetic_sections()
+    sections = []
+    with transaction.atomic():
+        faculty = Faculty.objects.bulk_create([
+            Faculty(faculty_id=f'syn-f{i}', faculty_name=f'Synthetic {i}', department='SYN') for i in range(count * 4)
+        ])
+        for n in range(count):
+            section = str(n + 1)
+            for c in range(rng.randint(3, 5)):
+                course = Course.objects.create(
+                    course_id=f'syn-{n}-{c}', name=f'SYN{n}-{c}', code=f'S{c}',
+                    course_type='none', hours_per_week=rng.randint(3, 5)
+                )
+                cls = Class.objects.create(course=course, section_id=section, academic_year=SYNTHETIC_YEAR,
+                                           semester='1', dept='SYN', venue=f'SYN-{n}')
+                cls.faculty.add(*rng.sample(faculty, rng.randint(1, 2)))
+            sections.append((SYNTHETIC_YEAR, '1', section, 'SYN'))
+    return sections
+
+
+def _evaluate(job):
+    index, params, section, seed = job
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, feasible, _ = solve(*section, seed=seed, ga_config=GAConfig(**params))
+    seconds = time.perf_counter() - started
+    return index, seconds if feasible else seconds * INFEASIBLE_PENALTY, feasible
+
+
+def _run_jobs(jobs, workers):
+    if workers <= 1:
+        yield from map(_evaluate, jobs)
+        return
+    # Children open their own database connections, and set Django up
+    # themselves when the platform spawns rather than forks them
+    connections.close_all()
+    with multiprocessing.Pool(processes=workers, initializer=django.setup) as pool:
+        yield from pool.imap_unordered(_evaluate, jobs)
+
+
+def successive_halving(configs, sections, eta=2, seeds_per_round=1, workers=1, seed=0, log=logger.info):
+    """
+    Race configs over (section, seed) instances by successive halving.
+
+    Each round runs every surviving config on the same new batch of
+    instances (every section with seeds_per_round fresh seeds), ranks them by
+    mean cost over all their runs so far and keeps the best 1/eta, until one
+    is left. The cost of a run is its time to a feasible timetable;
+    infeasible runs cost INFEASIBLE_PENALTY times their duration.
+
+    Returns [(config, mean cost, feasible share, runs)], best first.
+    """
+    rng = random.Random(seed)
+    results = {i: [] for i in range(len(configs))}
+    alive = list(range(len(configs)))
+    eliminated = []
+    round_no = 0
+    while True:
+        round_no += 1
+        batch = [(section, rng.randrange(2 ** 32)) for section in sections for _ in range(seeds_per_round)]
+        jobs = [(i, configs[i].as_dict(), section, s) for i in alive for section, s in batch]
+        for index, cost, feasible in _run_jobs(jobs, workers):
+            results[index].append((cost, feasible))
+
+        alive.sort(key=lambda i: mean(cost for cost, _ in results[i]))
+        keep = max(1, len(alive) // eta)
+        log(f"round {round_no}: {len(alive)} configs x {len(batch)} runs, "
+            f"best mean cost {mean(cost for cost, _ in results[alive[0]]):.2f}s, keeping {keep}")
+        if len(alive) == 1:
+            break
+        eliminated = alive[keep:] + eliminated
+        alive = alive[:keep]
+        if len(alive) == 1:
+            break
+
+    return [
+        (configs[i], mean(cost for cost, _ in results[i]),
+         sum(feasible for _, feasible in results[i]) / len(results[i]), len(results[i]))
+        for i in alive + eliminated
+    ]
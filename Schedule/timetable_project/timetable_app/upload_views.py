@@ -0,0 +1,77 @@
+# Bulk upload views; the files are imported in the background by jobs.py.
+from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+
+from .models import ImportJob
+from .forms import (
+    FacultyUploadForm,
+    StudentUploadForm,
+    CourseUploadForm,
+    RegistrationUploadForm,
+    ClassUploadForm,
+    PreferenceUploadForm,
+)
+from .jobs import enqueue_import
+
+def upload_data(request, model_name, form_class):
+    if request.method == 'POST':
+        form = form_class(request.POST, request.FILES)
+        if form.is_valid():
+            job, created = enqueue_import(model_name, request.FILES['file'])
+            status_url = reverse('import_job_status', args=[job.pk])
+            if created:
+                message = f"{model_name} upload queued as import job #{job.pk}."
+            else:
+                message = f"This file was already uploaded as import job #{job.pk} ({job.get_status_display()}). Nothing to do."
+            html_content = f"""
+            <p>{message} <a href='{status_url}'>Check progress</a></p>
+            <a href='javascript:history.back()'>Go back to previous page</a>
+            """
+            return HttpResponse(html_content)
+    else:
+        form = form_class()
+
+    return render(request, f"upload_{model_name.lower()}.html", {'form': form})
+
+# ✅ Updated Registration Upload View
+def upload_registration(request):
+    return upload_data(request, 'Registration', RegistrationUploadForm)
+
+# Individual Upload Views
+def upload_student(request):
+    return upload_data(request, 'Student', StudentUploadForm)
+
+def upload_faculty(request):
+    return upload_data(request, 'Faculty', FacultyUploadForm)
+
+def upload_course(request):
+    return upload_data(request, 'Course', CourseUploadForm)
+
+def upload_class(request):
+    return upload_data(request, 'Class', ClassUploadForm)
+
+# Soft constraints for the GA
+def upload_slot_preference(request):
+    return upload_data(request, 'SlotPreference', PreferenceUploadForm)
+
+def upload_spread_preference(request):
+    return upload_data(request, 'SpreadPreference', PreferenceUploadForm)
+
+def import_job_status(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    return JsonResponse({
+        'id': job.pk,
+        'model': job.model,
+        'status': job.status,
+        'chunks_done': job.chunks_done,
+        'rows_processed': job.rows_processed,
+        'rows_created': job.rows_created,
+        'rows_skipped': job.rows_skipped,
+        'rows_per_second': round(job.rows_per_second, 1),
+        'error_count': job.error_count,
+        'errors': job.errors,
+        'message': job.message,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    })
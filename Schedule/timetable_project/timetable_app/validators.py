@@ -1,8 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
 from django.core.exceptions import ValidationError
+from django.db import connection
 from .models import Timetable, Course, Class,Registration
 from django.db.models import Q
+from .coenrolment import coenrolment
+from .weekgrid import current_grid
 
 #MAIN_COURSES = ['DL', 'FS', 'SE', 'CE', 'ASSO']  # Example main courses
+
+# Placeholder faculty and courses that may overlap freely, and venues any number of classes can share
+PLACEHOLDER_FACULTY = ["Some faculty (-)", "Some faculty"]
+FACULTY_EXEMPT_COURSES = ['PET', 'LIB', 'PROJ WORK']
+SHARED_VENUES = ['pg', '']
+
+RULES = ('setup', 'slot_uniqueness', 'venue', 'faculty_double_booking', 'adjacency',
+         'multi_day', 'faculty_continuous', 'max_per_day', 'student_clash')
+
+
+class ValidatorStats:
+    """Checks, time, queries and rejections of each validator rule over a run."""
+
+    def __init__(self):
+        self.queries = 0  # running count, fed by the execute wrapper
+        self.rules = {name: [0, 0.0, 0, 0] for name in RULES}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def as_dict(self):
+        return {
+            name: {'checks': checks, 'seconds': seconds, 'queries': queries, 'rejections': rejections}
+            for name, (checks, seconds, queries, rejections) in self.rules.items()
+        }
+
+    def __str__(self):
+        lines = [f"{'rule':<24}{'checks':>8}{'seconds':>10}{'queries':>9}{'rejected':>10}"]
+        for name, (checks, seconds, queries, rejections) in self.rules.items():
+            lines.append(f"{name:<24}{checks:>8}{seconds:>10.3f}{queries:>9}{rejections:>10}")
+        return "\n".join(lines)
+
+
+class _RuleTimer:
+    __slots__ = ('stats', 'entry', 'started', 'queries')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.entry = stats.rules[name]
+
+    def __enter__(self):
+        self.queries = self.stats.queries
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.entry[0] += 1
+        self.entry[1] += time.perf_counter() - self.started
+        self.entry[2] += self.stats.queries - self.queries
+        if exc_type is not None and issubclass(exc_type, ValidationError):
+            self.entry[3] += 1
+        return False
+
+
+_collecting = threading.local()
+_NOT_COLLECTING = nullcontext()
+
+
+def _rule(name):
+    # One attribute lookup when stats are off
+    stats = getattr(_collecting, 'stats', None)
+    return _NOT_COLLECTING if stats is None else _RuleTimer(stats, name)
+
+
+def current_validator_stats():
+    return getattr(_collecting, 'stats', None)
+
+
+@contextmanager
+def collect_validator_stats(stats=None):
+    """Count every rule checked by this thread's validator calls inside the block."""
+    stats = stats or ValidatorStats()
+    previous = current_validator_stats()
+    _collecting.stats = stats
+    try:
+        with connection.execute_wrapper(stats):
+            yield stats
+    finally:
+        _collecting.stats = previous
         
 def validate_timetable_constraints(main_id, day, slot, current_year, current_semester, section, dept):
     # Standardize day as a list
@@ -14,104 +100,122 @@ def validate_timetable_constraints(main_id, day, slot, current_year, current_sem
     else:
         days = [day]  # Wrap single day in a list
 
-    classes = Class.objects.filter(academic_year=current_year, semester=current_semester)
-    relevant_courses = set(cls.course for cls in classes)    
-    MAIN_COURSES = [course.name for course in relevant_courses if course.course_type == 'none']
+    with _rule('setup'):
+        grid = current_grid()
+        for d in days:
+            if (d, slot) not in grid.bits:
+                raise ValidationError(f"Day {d}, slot {slot} is not in the week grid.")
+        classes = Class.objects.filter(academic_year=current_year, semester=current_semester)
+        relevant_courses = set(cls.course for cls in classes)    
+        MAIN_COURSES = [course.name for course in relevant_courses if course.course_type == 'none']
      
-    #class_obj = Class.objects.get(main_id=main_id)
-    class_obj = Class.objects.prefetch_related('faculty').get(main_id=main_id)
-    course_name = class_obj.course.name
-    course_type = class_obj.course.course_type
+        #class_obj = Class.objects.get(main_id=main_id)
+        class_obj = Class.objects.prefetch_related('faculty').get(main_id=main_id)
+        course_name = class_obj.course.name
+        course_type = class_obj.course.course_type
     
     # 1. Slot Uniqueness 
-    for d in days:
-        existing_assignments = Timetable.objects.filter(
-            main_id__academic_year=current_year,
-            main_id__semester=current_semester,
-            day=d,
-            slot=slot,
-            main_id__section_id=section,
-            main_id__dept=dept
-        ).exclude(main_id=class_obj)
+    with _rule('slot_uniqueness'):
+        for d in days:
+            existing_assignments = Timetable.objects.filter(
+                main_id__academic_year=current_year,
+                main_id__semester=current_semester,
+                day=d,
+                slot=slot,
+                main_id__section_id=section,
+                main_id__dept=dept
+            ).exclude(main_id=class_obj)
         
-        if existing_assignments.exists():
-            # Rule 1: Block if new course is 'none' and slot is occupied
-            if course_type == 'none':
-                raise ValidationError(f"Slot on {d} is already assigned, and courses with type 'none' cannot share slots.")
-            # Rule 2: Block if slot has a 'none' course and anything else tries to join
-            if any(t.main_id.course.course_type == 'none' for t in existing_assignments):
-                raise ValidationError(f"Slot on {d} contains a course with type 'none', so no additional courses can be assigned.")
+            if existing_assignments.exists():
+                # Rule 1: Block if new course is 'none' and slot is occupied
+                if course_type == 'none':
+                    raise ValidationError(f"Slot on {d} is already assigned, and courses with type 'none' cannot share slots.")
+                # Rule 2: Block if slot has a 'none' course and anything else tries to join
+                if any(t.main_id.course.course_type == 'none' for t in existing_assignments):
+                    raise ValidationError(f"Slot on {d} contains a course with type 'none', so no additional courses can be assigned.")
     
     # 7. Check if the same venue is already booked for this slot
-    for d in days:
-        if Timetable.objects.filter(
-            day=d,
-            slot=slot,
-            main_id__venue=class_obj.venue,
-            main_id__academic_year=current_year
-        ).exclude(main_id=class_obj).exclude(
-            Q(main_id__venue='pg') | Q(main_id__venue='') | Q(main_id__venue__isnull=True)
-        ).exists():
-            raise ValidationError(f"The venue is already booked on {d} during this slot.")
+    with _rule('venue'):
+        for d in days:
+            if Timetable.objects.filter(
+                day=d,
+                slot=slot,
+                main_id__venue=class_obj.venue,
+                main_id__academic_year=current_year
+            ).exclude(main_id=class_obj).exclude(
+                Q(main_id__venue__in=SHARED_VENUES) | Q(main_id__venue__isnull=True)
+            ).exists():
+                raise ValidationError(f"The venue is already booked on {d} during this slot.")
 
     # 2. Faculty Double Booking Check
-    for faculty in class_obj.faculty.all():  # Check all faculty
-        if faculty.faculty_name not in ["Some faculty (-)", "Some faculty"] and course_name not in ['PET','LIB'] and course_name not in ['PROJ WORK']:
-            for d in days:
-                if Timetable.objects.filter(
-                    day=d,
-                    slot=slot,
-                    main_id__faculty=faculty,  # Use __faculty to filter ManyToManyField
-                    main_id__academic_year=current_year
-                ).exists():
-                    raise ValidationError(f"Faculty {faculty.faculty_name} is already assigned another course on {d} during this slot.")
+    with _rule('faculty_double_booking'):
+        for faculty in class_obj.faculty.all():  # Check all faculty
+            if faculty.faculty_name not in PLACEHOLDER_FACULTY and course_name not in FACULTY_EXEMPT_COURSES:
+                for d in days:
+                    if Timetable.objects.filter(
+                        day=d,
+                        slot=slot,
+                        main_id__faculty=faculty,  # Use __faculty to filter ManyToManyField
+                        main_id__academic_year=current_year
+                    ).exists():
+                        raise ValidationError(f"Faculty {faculty.faculty_name} is already assigned another course on {d} during this slot.")
                 
     # 3. Continuous Assignment Prevention (Only for Main Courses)
-    if course_name in MAIN_COURSES:
-        previous_slot = Timetable.objects.filter(day=day, slot=slot - 1,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).first()
-        next_slot = Timetable.objects.filter(day=day, slot=slot + 1,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).first()
-
-        if previous_slot and previous_slot.main_id.course.name == course_name:
-            raise ValidationError("Cannot assign the same main course consecutively.")
-
-        if next_slot and next_slot.main_id.course.name == course_name:
-            raise ValidationError("Cannot assign the same main course consecutively.")
+    with _rule('adjacency'):
+        if course_name in MAIN_COURSES:
+            for d in days:
+                # The section's slots of this course on the day; a break between two slots makes them non-adjacent
+                course_mask = grid.mask((d, s) for s in Timetable.objects.filter(day=d, main_id__course__name=course_name, main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).values_list('slot', flat=True))
+                if grid.neighbours(grid.bit(d, slot)) & course_mask:
+                    raise ValidationError("Cannot assign the same main course consecutively.")
 
     # 4. Assignment Across Multiple Days (If applicable)
-    if len(days) > 1:
-        for d in days:
-            if Timetable.objects.filter(day=d, slot=slot,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).exists():
-                raise ValidationError(f"Slot on {d} is already assigned. Please select another slot.")
-            # Ensure same course is being assigned
-            existing = Timetable.objects.filter(day=d, slot=slot, main_id__course__name=course_name,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept)
-            if existing.exists() is False:
-                raise ValidationError(f"The same course must be assigned to all selected days.")
+    with _rule('multi_day'):
+        if len(days) > 1:
+            for d in days:
+                if Timetable.objects.filter(day=d, slot=slot,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept).exists():
+                    raise ValidationError(f"Slot on {d} is already assigned. Please select another slot.")
+                # Ensure same course is being assigned
+                existing = Timetable.objects.filter(day=d, slot=slot, main_id__course__name=course_name,main_id__academic_year=current_year, main_id__semester=current_semester, main_id__section_id=section, main_id__dept=dept)
+                if existing.exists() is False:
+                    raise ValidationError(f"The same course must be assigned to all selected days.")
 
     # 5. Ensure Faculty Doesn’t Handle More Than 2 Main Courses Continuously
-    if course_name in MAIN_COURSES:
-        for faculty in class_obj.faculty.all():  # Check all faculty
-            if faculty.faculty_name not in ["Some faculty (-)", "Some faculty"] and course_name not in ['PET','LIB'] and course_name not in ['PROJ WORK']:
-                for d in days:
-                    prev1 = Timetable.objects.filter(day=d, slot=slot - 1, main_id__faculty=faculty, main_id__academic_year=current_year).first()
-                    prev2 = Timetable.objects.filter(day=d, slot=slot - 2, main_id__faculty=faculty, main_id__academic_year=current_year).first()
-                    next1 = Timetable.objects.filter(day=d, slot=slot + 1, main_id__faculty=faculty, main_id__academic_year=current_year).first()
-                    next2 = Timetable.objects.filter(day=d, slot=slot + 2, main_id__faculty=faculty, main_id__academic_year=current_year).first()
-
-                    if prev1 and prev2 and prev1.main_id.course.name in MAIN_COURSES and prev2.main_id.course.name in MAIN_COURSES:
-                        raise ValidationError(f"Faculty {faculty.faculty_name} cannot handle more than 2 courses continuously.")
-                    if next1 and next2 and next1.main_id.course.name in MAIN_COURSES and next2.main_id.course.name in MAIN_COURSES:
-                        raise ValidationError(f"Faculty {faculty.faculty_name} cannot handle more than 2 courses continuously.")
+    with _rule('faculty_continuous'):
+        if course_name in MAIN_COURSES:
+            for faculty in class_obj.faculty.all():  # Check all faculty
+                if faculty.faculty_name not in PLACEHOLDER_FACULTY and course_name not in FACULTY_EXEMPT_COURSES:
+                    for d in days:
+                        # The faculty member's main-course slots on the day, as a mask
+                        busy = grid.mask((d, s) for s, name in Timetable.objects.filter(day=d, main_id__faculty=faculty, main_id__academic_year=current_year).values_list('slot', 'main_id__course__name') if name in MAIN_COURSES)
+                        if grid.completes_triple(busy, grid.bit(d, slot)):
+                            raise ValidationError(f"Faculty {faculty.faculty_name} cannot handle more than 2 courses continuously.")
                                   
     # 6. NOT MORE THAN 2 SLOTS FOR A MAIN SUBJECT IN A DAY
-    if course_name in MAIN_COURSES:
-        for d in days:
-            existing_slots = Timetable.objects.filter(
-                day=d,
-                main_id__course__name=course_name,
-                main_id__academic_year=current_year,
-                main_id__semester=current_semester,
-                main_id__section_id=section, 
-                main_id__dept=dept
-            ).exclude(main_id=class_obj).count()
-            if existing_slots >= 2:
-                raise ValidationError(f"Cannot assign more than 2 slots for {course_name} on day {d}.")
\ No newline at end of file
+    with _rule('max_per_day'):
+        if course_name in MAIN_COURSES:
+            for d in days:
+                existing_slots = Timetable.objects.filter(
+                    day=d,
+                    main_id__course__name=course_name,
+                    main_id__academic_year=current_year,
+                    main_id__semester=current_semester,
+                    main_id__section_id=section, 
+                    main_id__dept=dept
+                ).exclude(main_id=class_obj).count()
+                if existing_slots >= 2:
+                    raise ValidationError(f"Cannot assign more than 2 slots for {course_name} on day {d}.")
+
+    # 8. Students registered for this class and for a class already in the slot
+    with _rule('student_clash'):
+        shared = coenrolment(current_year, current_semester).neighbours(main_id)
+        if shared:
+            for d in days:
+                clashing = set(Timetable.objects.filter(
+                    day=d,
+                    slot=slot,
+                    main_id__in=list(shared)
+                ).values_list('main_id', flat=True))
+                students = sum(shared[m] for m in clashing)
+                if students:
+                    raise ValidationError(f"{students} students registered for this class already have another class on {d} during this slot.")
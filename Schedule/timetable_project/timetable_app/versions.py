@@ -0,0 +1,130 @@
+from django.db import IntegrityError, transaction
+
+from .models import Class, Timetable, TimetableVersion
+from .signals import batched_invalidation
+from .weekgrid import current_grid
+
+
+SNAPSHOT_ATTEMPTS = 5
+
+
+def section_rows(academic_year, semester, section, dept):
+    """The Timetable rows a GA run for the section replaces."""
+    return Timetable.objects.filter(main_id__academic_year=academic_year, main_id__semester=semester,
+                                    main_id__section_id=section, main_id__dept=dept)
+
+
+def capture(academic_year, semester, section, dept):
+    """The section's current timetable as an unsaved TimetableVersion, packed from one query."""
+    grid = current_grid()
+    cells = [[] for _ in grid.cells]
+    for main_id, day, slot in section_rows(academic_year, semester, section, dept).values_list('main_id', 'day', 'slot'):
+        if (day, slot) in grid.bits:
+            cells[(day - 1) * grid.width + slot - 1].append(main_id)
+    for ids in cells:
+        ids.sort()
+    return TimetableVersion(academic_year=academic_year, semester=semester, section=section, dept=dept,
+                            days=len(grid.days), slots=grid.width, cells=cells)
+
+
+def versions(academic_year, semester, section, dept):
+    return TimetableVersion.objects.filter(academic_year=academic_year, semester=semester,
+                                           section=section, dept=dept)
+
+
+def snapshot(academic_year, semester, section, dept, reason="", ga_seed=None):
+    """
+    Save the section's current timetable as its next version and return it.
+    When nothing changed since the latest version, that one is returned
+    instead of a copy, unless a GA seed has to be recorded.
+
+    A concurrent snapshot of the same section can take the same number first,
+    including the section's first one when there is no row to lock; the
+    unique constraint then rejects this one and it retries with the next.
+    """
+    version = capture(academic_year, semester, section, dept)
+    version.reason, version.ga_seed = reason, ga_seed
+    for attempt in range(SNAPSHOT_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                latest = versions(academic_year, semester, section, dept).select_for_update().order_by('-number').first()
+                unchanged = latest is not None and (latest.days, latest.slots, latest.cells) == (version.days, version.slots, version.cells)
+                if unchanged and ga_seed is None:
+                    return latest
+                version.number = latest.number + 1 if latest else 1
+                version.save()
+            return version
+        except IntegrityError:
+            if attempt == SNAPSHOT_ATTEMPTS - 1:
+                raise
+
+
+def placements(version):
+    """{(day, slot): [main_id, ...]} of a version's busy cells."""
+    return {
+        (i // version.slots + 1, i % version.slots + 1): ids
+        for i, ids in enumerate(version.cells) if ids
+    }
+
+
+def diff(old, new):
+    """
+    The cells that differ between two versions, as dicts of day, slot and
+    the class ids removed and added there, in day and slot order. One pass
+    over the cells when both have the same shape.
+    """
+    if (old.days, old.slots) == (new.days, new.slots):
+        changed = (
+            ((i // new.slots + 1, i % new.slots + 1), before, after)
+            for i, (before, after) in enumerate(zip(old.cells, new.cells)) if before != after
+        )
+    else:
+        old_cells, new_cells = placements(old), placements(new)
+        changed = (
+            (cell, old_cells.get(cell, []), new_cells.get(cell, []))
+            for cell in sorted(old_cells.keys() | new_cells.keys()) if old_cells.get(cell) != new_cells.get(cell)
+        )
+    return [
+        {'day': day, 'slot': slot,
+         'removed': [m for m in before if m not in after], 'added': [m for m in after if m not in before]}
+        for (day, slot), before, after in changed
+    ]
+
+
+def rollback(version):
+    """
+    Replace the section's timetable with a saved version in one transaction,
+    snapshotting the current one first. Classes deleted since and cells
+    outside the current week grid are left out. Returns the new version
+    recording the result.
+    """
+    key = (version.academic_year, version.semester, version.section, version.dept)
+    grid = current_grid()
+    with transaction.atomic(), batched_invalidation() as touched:
+        snapshot(*key, reason="before rollback")
+        wanted = placements(version)
+        classes = set(Class.objects.filter(pk__in={m for ids in wanted.values() for m in ids}).values_list('pk', flat=True))
+        section_rows(*key).delete()
+        Timetable.objects.bulk_create([
+            Timetable(main_id_id=main_id, day=day, slot=slot)
+            for (day, slot), ids in wanted.items() if (day, slot) in grid.bits
+            for main_id in ids if main_id in classes
+        ])
+        touched.update(classes)  # bulk_create sends no signals
+        return snapshot(*key, reason=f"rollback to v{version.number}")
+
+
+def class_labels(main_ids):
+    """{main_id: "course (code)"} for the classes that still exist."""
+    return {
+        main_id: f"{name} ({code})"
+        for main_id, name, code in Class.objects.filter(pk__in=main_ids).values_list('pk', 'course__name', 'course__code')
+    }
+
+
+def describe(changes):
+    """Each change of diff() with its classes named, for display."""
+    labels = class_labels({m for change in changes for m in change['removed'] + change['added']})
+    name = lambda main_id: labels.get(main_id, f"class {main_id} (deleted)")
+    return [{**change, 'removed': [name(m) for m in change['removed']], 'added': [name(m) for m in change['added']]}
+            for change in changes]
@@ -1,25 +1,30 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 
 from django.db import models
-import pandas as pd
 from django.db.models import Q
 
 from .models import Faculty, Course, Timetable, TimetableStatus, Student, Registration, Class
 from .forms import (
     ClassForm,
     TimetableForm,
-    FacultyUploadForm,
-    StudentUploadForm,
-    CourseUploadForm,
-    RegistrationUploadForm,
     YearSemesterForm
 )
 from .validators import validate_timetable_constraints
-from timetable_app.ga import run_ga_logic
+from .lookups import filter_options, resolve_entity, get_grid, grid_table
+from .cache import make_key, semester_scope
+from .gridstore import save_grid
+from .audit import audit_year, iter_report_csv
+from .occupancy import search
+from .analytics import analytics
+from .weekgrid import current_grid
+from .repair import repair_section, apply_plan, StalePlan
+from .versions import versions, capture, diff, describe, rollback
+from .profiling import query_budget
+from .api import finder_query
 from django.urls import reverse
 # current_year="2025_even"
 # current_semester="4"
@@ -51,77 +56,6 @@ def login_view(request):
 def dashboard(request):
     return render(request, 'dashboard.html')
 
-def upload_data(request, model, form_class, required_columns):
-    if request.method == 'POST':
-        form = form_class(request.POST, request.FILES)
-        if form.is_valid():
-            file = request.FILES['file']
-            df = pd.read_csv(file) if file.name.endswith('.csv') else pd.read_excel(file)
-
-            if not set(required_columns).issubset(df.columns):
-                html_content = f"""
-                <p>Invalid file format! Required columns: {', '.join(required_columns)}.</p>
-                <a href='javascript:history.back()'>Go back to previous page</a>
-                """
-                return HttpResponse(html_content)
-
-            existing_data = set(model.objects.values_list(*required_columns))
-
-            new_records = []
-            for _, row in df.iterrows():
-                if tuple(row[col] for col in required_columns) not in existing_data:
-                    record_data = {col: row[col] for col in required_columns}
-
-                    # ✅ Special handling for Registration model
-                    if model == Registration:
-                        try:
-                            record_data['stud_id'] = Student.objects.get(stud_id=row['stud_id'])
-                        except Student.DoesNotExist:
-                            html_content = f"""
-                            <p>Student with ID {row['stud_id']} does not exist.</p>
-                            <a href='javascript:history.back()'>Go back to previous page</a>
-                            """
-                            return HttpResponse(html_content)
-
-                        try:
-                            record_data['main_id'] = Class.objects.get(main_id=row['main_id'])
-                        except Class.DoesNotExist:
-                            html_content = f"""
-                            <p>Class with ID {row['main_id']} does not exist.</p>
-                            <a href='javascript:history.back()'>Go back to previous page</a>
-                            """
-                            return HttpResponse(html_content)
-                            
-
-                    new_records.append(model(**record_data))
-
-            model.objects.bulk_create(new_records)
-
-            html_content = f"""
-            <p>{model.__name__} uploaded successfully!</p>
-            <a href='javascript:history.back()'>Go back to previous page</a>
-            """
-            return HttpResponse(html_content)
-    else:
-        form = form_class()
-
-    return render(request, f"upload_{model.__name__.lower()}.html", {'form': form})
-
-# ✅ Updated Registration Upload View
-def upload_registration(request):
-    return upload_data(request, Registration, RegistrationUploadForm, ['stud_id', 'main_id'])
-
-# Individual Upload Views
-def upload_student(request):
-    return upload_data(request, Student, StudentUploadForm, ['stud_id', 'name', 'department'])
-
-def upload_faculty(request):
-    return upload_data(request, Faculty, FacultyUploadForm, ['faculty_id', 'faculty_name', 'department'])
-
-def upload_course(request):
-    return upload_data(request, Course, CourseUploadForm, ['course_id', 'name', 'code', 'course_type', 'hours_per_week', 'offered_to'])
-
-
 def add_class(request):
     """Add a new class."""
     if request.method == 'POST':
@@ -154,6 +88,7 @@ def select_year_semester(request):
     return render(request, 'select_year_semester.html', {'form': form})
 
 
+@query_budget(12, methods=('GET',))  # a POST also runs the clash validator
 def add_timetable(request):
     current_year = request.session.get('current_year')
     current_semester = request.session.get('current_semester')
@@ -198,8 +133,6 @@ def add_timetable(request):
             defaults={'status': 'tt_coordinator'}
         )
 
-    print(request.user.role +','+timetable_status.status)
-    
     # tt_courses = {'CLUB': 1, 'OE': 4, 'AE': 4}
     # dept_courses = {'ITT': 3, 'IAS': 2, 'DL LAB': 3, 'FS LAB': 3, 'SE LAB': 2, 'RP': 4, 'SS': 2, 'ASSO':1}
 
@@ -213,7 +146,7 @@ def add_timetable(request):
     ).filter(
         Q(section_id=section) | Q(section_id__isnull=True) | Q(section_id=""),
         Q(dept=dept) | Q(dept__isnull=True) | Q(dept="")
-    )
+    ).select_related('course').prefetch_related('faculty')  # the dropdown shows both
     relevant_courses = set(cls.course for cls in classes)
 
     for course in relevant_courses:
@@ -221,8 +154,7 @@ def add_timetable(request):
             tt_courses[course.name] = course.hours_per_week
         elif course.course_type == 'dept':
             dept_courses[course.name] = course.hours_per_week
-    print(tt_courses)
-    
+
     # Get the list of already assigned courses with counts
     assigned_courses_count = dict(
         Timetable.objects.filter(
@@ -250,8 +182,6 @@ def add_timetable(request):
             current_course = course
             break  # Stop at the first unfulfilled course
 
-    print(f"Current course to be assigned: {current_course}")
-
     if request.user.role == 'TT_Coordinator' and timetable_status.status != 'tt_coordinator':
         dashboard_url = reverse('dashboard')
         html_content = f"""Can't edit now. Please Wait. 
@@ -319,20 +249,11 @@ def add_timetable(request):
     else:
         form = TimetableForm()
 
-    structured_timetable = defaultdict(lambda: defaultdict(list))  # Use a list instead of a single object
-    days = set()
-    slots = set()
-    timetable = Timetable.objects.filter(
-        main_id__academic_year=current_year,
-        main_id__semester=current_semester
-    ).filter(
-        Q(main_id__section_id=section) | Q(main_id__section_id__isnull=True) | Q(main_id__section_id=""),
-        Q(main_id__dept=dept) | Q(main_id__dept__isnull=True) | Q(main_id__dept="")
-    )
-    for entry in timetable:
-        structured_timetable[entry.day][entry.slot].append(entry)  # Append to a list
-        days.add(entry.day)
-        slots.add(entry.slot)
+    # The section's grid from one query, cached like the lookup grids; its
+    # rendered table is cached under the semester's version
+    grid = get_grid('admin', None, current_year, current_semester, section, dept)
+    scope = semester_scope(current_year, current_semester)
+    grid_key = make_key('grid_html', ('admin', current_year, current_semester, section, dept), scope)
 
     return render(request, 'add_timetable.html', {
         'form': form,
@@ -343,76 +264,95 @@ def add_timetable(request):
         'current_semester' : current_semester,
         'section' : section,
         'dept' : dept,
-        "timetable": structured_timetable,
-        'days': sorted(days),   
-        'slots': sorted(slots)
+        'timetable_grid': grid_table(grid, grid_key) if grid['timetable'] else None,
     })
 
 @login_required
-def run_genetic_algorithm(request):
+def repair_timetable(request):
+    """Propose (GET) the fewest cell moves that clear the section's violations, or apply the proposed ones (POST)."""
     current_year = request.session.get('current_year')
     current_semester = request.session.get('current_semester')
     section = request.session.get('section')
     dept = request.session.get('dept')
-    
-    timetable_status = TimetableStatus.objects.filter(academic_year=current_year, semester=current_semester, section=section, dept=dept).first()
 
     if request.user.role != 'Department_Coordinator':
         html_content = f"""
-        <p>You are not authorized to run the Genetic Algorithm.</p>
+        <p>You are not authorized to repair the timetable.</p>
         <a href='javascript:history.back()'>Go back to previous page</a>
         """
         return HttpResponse(html_content)
 
-    if timetable_status.status != 'ga_running':
+    if not current_year or not current_semester:
+        return redirect('select_year_semester')
+
+    grid = current_grid()
+    labelled = lambda moves: [{
+        'course': move['course'],
+        'from': f"{grid.day_names[move['from'][0]]} {grid.slot_labels[move['from'][1]]}",
+        'to': f"{grid.day_names[move['to'][0]]} {grid.slot_labels[move['to'][1]]}",
+    } for move in moves]
+
+    if request.method == 'POST':
+        # Apply the moves the coordinator reviewed, not a fresh search
+        try:
+            moves = apply_plan(current_year, current_semester, section, dept, request.POST.get('plan', ''))
+        except StalePlan as e:
+            return render(request, 'repair_timetable.html', {'error': str(e)})
+        return render(request, 'repair_timetable.html', {'applied': True, 'moves': labelled(moves)})
+
+    result = repair_section(current_year, current_semester, section, dept)
+    return render(request, 'repair_timetable.html', {'result': result, 'moves': labelled(result['moves'])})
+
+
+@login_required
+def timetable_versions(request):
+    """List the section's saved versions, compare two of them (GET) or roll back to one (POST)."""
+    current_year = request.session.get('current_year')
+    current_semester = request.session.get('current_semester')
+    section = request.session.get('section')
+    dept = request.session.get('dept')
+
+    if request.user.role != 'Department_Coordinator':
         html_content = f"""
-        <p>GA can't run yet!</p>
+        <p>You are not authorized to manage timetable versions.</p>
         <a href='javascript:history.back()'>Go back to previous page</a>
         """
         return HttpResponse(html_content)
 
     if not current_year or not current_semester:
-        html_content = f"""
-        <p>Missing year or semester.</p>
-        <a href='javascript:history.back()'>Go back to previous page</a>
-        """
-        return HttpResponse(html_content)
+        return redirect('select_year_semester')
 
-    try:
-        run_ga_logic(current_year, current_semester, section, dept)
-        # timetable_status.status = 'completed'
-        # timetable_status.save()
-        return redirect('view_timetable')
-    except Exception as e:
-        html_content = f"""
-        <p>Error running GA: {e}</p>
-        <a href='javascript:history.back()'>Go back to previous page</a>
-        """
-        return HttpResponse(html_content)
+    saved = versions(current_year, current_semester, section, dept)
+    if request.method == 'POST':
+        version = get_object_or_404(saved, number=request.POST.get('number'))
+        restored = rollback(version)
+        return render(request, 'timetable_versions.html', {'restored': restored, 'version': version})
+
+    grid = current_grid()
+    changes = None
+    old, new = request.GET.get('old'), request.GET.get('new')
+    if old and new:
+        old_version = get_object_or_404(saved, number=old)
+        new_version = capture(current_year, current_semester, section, dept) if new == 'current' else get_object_or_404(saved, number=new)
+        changes = [
+            {**c, 'cell': f"{grid.day_names.get(c['day'], c['day'])} {grid.slot_labels.get(c['slot'], c['slot'])}"}
+            for c in describe(diff(old_version, new_version))
+        ]
+
+    return render(request, 'timetable_versions.html', {
+        'saved': [(v, sum(1 for ids in v.cells if ids)) for v in saved.order_by('-number')],
+        'changes': changes,
+        'old': old,
+        'new': new,
+    })
 
 
 from collections import defaultdict
-def serialize_timetable(queryset):
-    timetable = {}
-    for entry in queryset:
-        day = entry.day
-        slot = entry.slot
-        course_name = entry.main_id.course.name
-        course_code = entry.main_id.course.code
-        venue = entry.main_id.venue
-        
-        if day not in timetable:
-            timetable[day] = {}
-        timetable[day][slot] = timetable[day].get(slot, []) + [{'course_name': course_name, 'course_code': course_code, 'venue': venue}]
-    return timetable
 
+@query_budget(10)
 def view_timetable(request):
-    classes = Class.objects.all()
-    unique_years = classes.values_list('academic_year', flat=True).distinct()
-    unique_semesters = classes.values_list('semester', flat=True).distinct()
-    unique_section = classes.values_list('section_id', flat=True).distinct()
-    unique_dept = classes.values_list('dept', flat=True).distinct()
-    
+    options = filter_options()
+
     if request.method == "POST":
         user_input = request.POST.get("user_input", "").strip()  
         academic_year = request.POST.get('academic_year')
@@ -421,143 +361,86 @@ def view_timetable(request):
         dept = request.POST.get('dept')
 
         if not user_input:
-            return render(request, "view_timetable.html", {"error": "Please enter a valid ID or 'admin'.","years": unique_years,"semesters": unique_semesters,"section" : unique_section,'dept' : unique_dept})
-
-        # If Admin, show entire timetable
-        if user_input.lower() == "admin":
-            timetable = Timetable.objects.filter(
-                main_id__academic_year=academic_year,
-                main_id__semester=semester
-            ).filter(
-                Q(main_id__section_id=section) | Q(main_id__section_id__isnull=True) | Q(main_id__section_id=""),
-                Q(main_id__dept=dept) | Q(main_id__dept__isnull=True) | Q(main_id__dept="")
-            )
-    
-        # If Student, fetch registered courses
-        elif Student.objects.filter(stud_id=user_input).exists():
-            registered_courses = Registration.objects.filter(
-                stud_id=user_input
-            ).values_list('main_id', flat=True)
-
-            timetable = Timetable.objects.filter(
-                main_id__in=registered_courses,
-                main_id__academic_year=academic_year,
-                main_id__semester=semester
-            )
+            return render(request, "view_timetable.html", {"error": "Please enter a valid ID or 'admin'.", **options})
 
-        # If Faculty, fetch courses they handle
-        elif Faculty.objects.filter(faculty_id=user_input).exists():
-            faculty_courses = Class.objects.filter(
-                faculty__faculty_id=user_input  # Use __ to filter ManyToManyField
-            ).values_list('main_id', flat=True)
-            timetable = Timetable.objects.filter(
-                main_id__in=faculty_courses,
-                main_id__academic_year=academic_year,
-                main_id__semester=semester
-            )
-
-        # If Venue, fetch courses scheduled in that venue
-        elif Class.objects.filter(venue=user_input).exists():
-            class_main_ids = Class.objects.filter(
-                venue=user_input
-            ).values_list('main_id', flat=True)
-
-            timetable = Timetable.objects.filter(
-                main_id__in=class_main_ids,
-                main_id__academic_year=academic_year,
-                main_id__semester=semester
-            ).filter(
-                Q(main_id__dept=dept) | Q(main_id__dept__isnull=True) | Q(main_id__dept="")
-            )
+        # Admin sees the whole section; students, faculty and venues see their own classes
+        entity = resolve_entity(user_input)
+        if entity is None:
+            return render(request, "view_timetable.html", {"error": "Invalid ID or venue entered.", **options})
 
-        else:
-            return render(request, "view_timetable.html", {"error": "Invalid ID or venue entered.","years": unique_years,"semesters": unique_semesters,"section" : unique_section,'dept' : unique_dept})
+        grid = get_grid(entity, user_input, academic_year, semester, section, dept)
 
-        structured_timetable = defaultdict(lambda: defaultdict(lambda: None))
-        days = set()
-        slots = set()
-        
-        for entry in timetable:
-            structured_timetable[entry.day][entry.slot] = structured_timetable[entry.day][entry.slot] or []  # Initialize as list if None
-            structured_timetable[entry.day][entry.slot].append(entry)
-            days.add(entry.day)
-            slots.add(entry.slot)
-            
-        request.session['timetable_data'] = {
-            "filtered_timetable": serialize_timetable(timetable),
-            "days": list(days),
-            "slots": list(slots)
-        }
+        # Keep only a token in the session; the grid itself lives in the cache
+        token = save_grid(grid)
+        if request.session.get('timetable_token') != token:
+            request.session['timetable_token'] = token
+            request.session['timetable_lookup'] = [entity, user_input, academic_year, semester, section, dept]
+        request.session.pop('timetable_data', None)
         
         return render(request, "view_timetable.html", {
-            "timetable": structured_timetable,
-            'classes': classes,
-            "days": sorted(days),
-            "slots": sorted(slots),
-            "years": unique_years,
-            "semesters": unique_semesters,
-            "section": unique_section,  # Changed from 'section' to 'unique_section'
-            "dept": unique_dept,       # Changed from 'dept' to 'unique_dept'
+            # The token is a hash of the grid, so it names this version of it
+            "timetable_grid": grid_table(grid, token) if grid['timetable'] else None,
+            **options,
             "selected_section": section,  # Added to pre-select the chosen section
             "selected_dept": dept
         })
 
-    return render(request, "view_timetable.html", {
-        "years": unique_years,
-        "semesters": unique_semesters,
-        "section" : unique_section,
-        'dept' : unique_dept
-    })
-
-import openpyxl
-from openpyxl.styles import Alignment, Font
-from openpyxl.utils import get_column_letter
-from django.http import HttpResponse
-from io import BytesIO
+    return render(request, "view_timetable.html", options)
 
-def download_timetable(request):
-    session_data = request.session.get("timetable_data")
-    if not session_data:
-        # return HttpResponse("No filtered timetable data to export.", status=400)
+@query_budget(5)
+def audit_timetables(request):
+    """Download every rule violation in an academic year's timetables as CSV."""
+    academic_year = request.GET.get('academic_year')
+    if not academic_year:
+        options = filter_options()
+        years = ''.join(f"<option value='{year}'>{year}</option>" for year in options['years'])
         html_content = f"""
-        <p>No filtered timetable data to export.</p>
+        <form method="get"><select name="academic_year">{years}</select> <button type="submit">Download audit report</button></form>
         <a href='javascript:history.back()'>Go back to previous page</a>
         """
         return HttpResponse(html_content)
 
-    timetable = session_data["filtered_timetable"]
-    days = sorted(list(session_data["days"]))   
-    slots = sorted(list(session_data["slots"])) 
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Timetable"
-    
-    ws.cell(row=1, column=1, value="Day / Slot").font = Font(bold=True)
-    
-    for idx, slot in enumerate(slots, start=2):
-        ws.cell(row=1, column=idx, value=slot).font = Font(bold=True)
-
-    for day_idx, day in enumerate(days, start=2):
-        ws.cell(row=day_idx, column=1, value=day).font = Font(bold=True)
-        for slot_idx, slot in enumerate(slots, start=2):
-            entry = timetable.get(str(day), {}).get(str(slot))  #  keys in session are strings
-            if entry:
-                val = "\n".join(f"{e['course_name']} ({e['course_code']}) Venue: {e['venue']} /" for e in entry) if entry else "--"
-            else:
-                val = "--"
-            cell = ws.cell(row=day_idx, column=slot_idx, value=val)
-            cell.alignment = Alignment(wrap_text=True, vertical="center", horizontal="center")
-
-    for col in range(1, len(slots) + 2):
-        ws.column_dimensions[get_column_letter(col)].width = 20
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="timetable.xlsx"'
+    response = StreamingHttpResponse(iter_report_csv(audit_year(academic_year)), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="timetable_audit_{academic_year}.csv"'
     return response
 
+@query_budget(8)
+def free_finder(request):
+    """Find free venues and faculty for given slots, or the free slots of given venues and faculty."""
+    grid = current_grid()
+    context = {
+        **filter_options(),
+        "times": [(f"{day}:{slot}", f"{grid.day_names[day]} {grid.slot_labels[slot]}") for day, slot in grid.cells],
+        "faculty_list": Faculty.objects.order_by('faculty_name').values_list('faculty_id', 'faculty_name'),
+        "venue_list": Class.objects.exclude(venue__isnull=True).exclude(venue='').order_by('venue').values_list('venue', flat=True).distinct(),
+    }
+    try:
+        academic_year, times, faculty_ids, venues, match = finder_query(request)
+    except ValueError as e:
+        return render(request, "free_finder.html", {"error": str(e), **context})
+
+    if academic_year and (times or faculty_ids or venues):
+        result = search(academic_year, times, faculty_ids, venues, match)
+        context.update({
+            "result": result,
+            "free_slots": [(grid.day_names[day], grid.slot_labels[slot]) for day, slot in result.get('slots', ())],
+            "selected_year": academic_year,
+            "selected_times": [f"{day}:{slot}" for day, slot in times],
+            "selected_faculty": faculty_ids,
+            "selected_venues": venues,
+            "match": match,
+        })
+    return render(request, "free_finder.html", context)
+
+@query_budget(10)
+def workload_analytics(request):
+    """Faculty workload and venue utilisation tables of an academic year."""
+    academic_year = request.GET.get('academic_year')
+    semester = request.GET.get('semester') or None
+    dept = request.GET.get('dept') or None
+    context = {**filter_options(), "selected_year": academic_year, "selected_semester": semester, "selected_dept": dept}
+    if academic_year:
+        context["report"] = analytics(academic_year, semester, dept)
+    return render(request, "analytics.html", context)
+
 #python manage.py runserver
\ No newline at end of file
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from .models import GridDefinition
+from .cache import get_or_build, aget_or_build
+
+# The week used until a GridDefinition is activated
+DEFAULT_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DEFAULT_SLOTS = [
+    "9:00 AM - 9:50 AM", "9:50 AM - 10:40 AM", "11:00 AM - 11:50 AM", "11:50 PM - 12:40 PM",
+    "1:30 PM - 2:15 PM", "2:15 PM - 3:00 PM", "3:15 PM - 4:00 PM", "4:00 PM - 4:45 PM",
+]
+
+
+def slot_times(label):
+    """(start, end) times of a slot from its 'H:MM AM - H:MM PM' label; ValueError for any other label."""
+    start, end = (datetime.strptime(part.strip(), '%I:%M %p') for part in label.split('-'))
+    if start >= end:
+        start -= timedelta(hours=12)  # labels such as "11:50 PM - 12:40 PM"
+    return start.time(), end.time()
+
+
+class WeekGrid:
+    """
+    The days and slots of a week, numbered from 1, and the bit layout of a
+    week occupancy mask: cell (day, slot) is bit (day - 1) * width + (slot - 1).
+
+    joined has the bit of every cell whose next cell follows it directly, on
+    the same day and without a break in between, so for a mask m the cells
+    starting two adjacent busy slots are m & (m >> 1) & joined.
+    """
+
+    def __init__(self, day_names, slot_labels, breaks=()):
+        self.days = list(range(1, len(day_names) + 1))
+        self.slots = list(range(1, len(slot_labels) + 1))
+        self.day_names = dict(zip(self.days, day_names))
+        self.slot_labels = dict(zip(self.slots, slot_labels))
+        self.breaks = sorted(set(breaks))  # slots after which adjacency resets
+        self.width = len(self.slots)
+        self.cells = [(day, slot) for day in self.days for slot in self.slots]
+        self.bits = {cell: 1 << i for i, cell in enumerate(self.cells)}
+        self.full = (1 << len(self.cells)) - 1
+
+        day_mask = (1 << self.width) - 1
+        self.day_masks = {day: day_mask << (day - 1) * self.width for day in self.days}
+        row = sum(1 << (slot - 1) for slot in self.slots[:-1] if slot not in self.breaks)
+        self.joined = sum(row << (day - 1) * self.width for day in self.days)
+
+    def bit(self, day, slot):
+        """The cell's bit, 0 for a cell outside the grid."""
+        return self.bits.get((day, slot), 0)
+
+    def mask(self, times):
+        mask = 0
+        for day, slot in times:
+            mask |= self.bits.get((day, slot), 0)
+        return mask
+
+    def cells_of(self, mask):
+        """The (day, slot) pairs set in a mask."""
+        return [cell for cell in self.cells if mask & self.bits[cell]]
+
+    def pairs(self, mask):
+        """Bits starting two directly adjacent busy cells."""
+        return mask & (mask >> 1) & self.joined
+
+    def triples(self, mask):
+        """Bits starting three directly adjacent busy cells."""
+        return self.pairs(mask) & (self.pairs(mask) >> 1)
+
+    def completes_triple(self, mask, bit):
+        """Whether the busy cells of mask plus bit hold three adjacent cells that include bit."""
+        starts = self.triples(mask | bit)
+        return bool((starts | starts << 1 | starts << 2) & bit)
+
+    def neighbours(self, mask):
+        """Cells directly adjacent to a busy cell of mask."""
+        return ((mask & self.joined) << 1) | ((mask >> 1) & self.joined)
+
+    def runs(self, slots):
+        """Maximal runs of adjacent slots in a sorted list of one day's slots, as (first, last) pairs."""
+        runs = []
+        for slot in slots:
+            if runs and slot == runs[-1][1] + 1 and runs[-1][1] not in self.breaks:
+                runs[-1][1] = slot
+            else:
+                runs.append([slot, slot])
+        return runs
+
+
+def _grid(definition):
+    if definition is None:
+        return WeekGrid(DEFAULT_DAYS, DEFAULT_SLOTS)
+    return WeekGrid(definition.days, definition.slots, definition.breaks)
+
+
+def build_grid():
+    return _grid(GridDefinition.objects.filter(active=True).first())
+
+
+async def abuild_grid():
+    return _grid(await GridDefinition.objects.filter(active=True).afirst())
+
+
+def current_grid():
+    """The active grid; a GridDefinition write bumps the global cache version."""
+    return get_or_build('week_grid', (), build_grid)
+
+
+async def acurrent_grid():
+    return await aget_or_build('week_grid', (), abuild_grid)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'timetable_app.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +88,24 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The cache holds the version counters that invalidate cached timetables, so
+# it must be shared by every process that writes them: web workers, the import
+# worker and management commands. The file cache is shared on one host; use
+# Redis or Memcached when the workers run on several.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+TIMETABLE_CACHE_TIMEOUT = 60 * 60  # seconds
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -123,6 +142,37 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded spreadsheets waiting for the import worker
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Process import jobs in a thread of the web process. Set to False when a
+# separate 'manage.py run_import_worker' process handles the queue.
+IMPORT_JOBS_IN_THREAD = True
+
+# Number of GA runs with different seeds started in parallel processes; the
+# first one to meet every requirement is kept.
+GA_PORTFOLIO_SIZE = 1
+
+# Overrides of the GA search parameters (see timetable_app.ga.GAConfig), for
+# example the best set reported by 'manage.py tune_ga'.
+GA_CONFIG = {}
+
+# Request profiling (timetable_app.profiling), on in development only: requests
+# kept per view, extra per-view query budgets by URL name, and whether going
+# over a budget raises (for tests) instead of logging a warning.
+PROFILING_ENABLED = DEBUG
+PROFILING_WINDOW = 200
+QUERY_BUDGETS = {}
+QUERY_BUDGET_RAISE = False
+
+# Collect per-rule timing, query and rejection counters from the validator
+# during GA runs (reported in the GA output and its stats).
+VALIDATOR_STATS = False
+
+# Route the read-only views (view, download, export, JSON API) to their async
+# versions in async_views.py. Set it when serving through asgi.py.
+ASYNC_VIEWS = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -15,26 +15,50 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.urls import path
-from timetable_app import views  
-from timetable_app.ga import run_ga_logic
+# Nothing imported here may load the GA, openpyxl or pandas: every web worker
+# imports the URLconf, and those load on the paths that use them
+from timetable_app import views, api, upload_views, export_views, ga_views
+
+# Async read views for ASGI deployments
+if settings.ASYNC_VIEWS:
+    from timetable_app import async_views
+    read_views = download_views = json_views = async_views
+else:
+    read_views, download_views, json_views = views, export_views, api
 
 urlpatterns = [
     path("", views.login_view, name="login"),
     
     path('dashboard/', views.dashboard, name='dashboard'),
     
-    path('upload-faculty/', views.upload_faculty, name='upload_faculty'),
-    path('upload-course/', views.upload_course, name='upload_course'),
-    path('upload-student/', views.upload_student, name='upload_student'),
-    path('upload-registration/', views.upload_registration, name='upload_registration'),
+    path('upload-faculty/', upload_views.upload_faculty, name='upload_faculty'),
+    path('upload-course/', upload_views.upload_course, name='upload_course'),
+    path('upload-student/', upload_views.upload_student, name='upload_student'),
+    path('upload-registration/', upload_views.upload_registration, name='upload_registration'),
+    path('upload-class/', upload_views.upload_class, name='upload_class'),
+    path('upload-slot-preference/', upload_views.upload_slot_preference, name='upload_slot_preference'),
+    path('upload-spread-preference/', upload_views.upload_spread_preference, name='upload_spread_preference'),
+    path('import-jobs/<int:job_id>/', upload_views.import_job_status, name='import_job_status'),
     
     path('select_year_semester/', views.select_year_semester, name='select_year_semester'),
     path('add_timetable/', views.add_timetable, name='add_timetable'),
-    path('view-timetable/', views.view_timetable, name='view_timetable'),
-    path('download-timetable/', views.download_timetable, name='download_timetable'),
+    path('view-timetable/', read_views.view_timetable, name='view_timetable'),
+    path('download-timetable/', download_views.download_timetable, name='download_timetable'),
+    path('export-timetables/', download_views.export_timetables, name='export_timetables'),
+    path('audit-timetables/', views.audit_timetables, name='audit_timetables'),
+    path('api/timetables/<str:entity>/<str:ident>.ics', api.timetable_ics, name='timetable_ics'),
+    path('free-finder/', views.free_finder, name='free_finder'),
+    path('api/timetables/<str:entity>/<str:ident>/', json_views.timetable_json, name='timetable_json'),
+    path('api/free/', api.free_resources, name='free_resources'),
+    path('analytics/', views.workload_analytics, name='workload_analytics'),
+    path('api/analytics/', api.workload_analytics, name='workload_analytics_json'),
+    path('api/profiling/', api.profiling_stats, name='profiling_stats'),
     
     path('add-class/', views.add_class, name='add_class'),
-    path('run_ga_logic/', run_ga_logic, name='run_ga_logic'),
-    path('run_genetic_algorithm/', views.run_genetic_algorithm, name='run_genetic_algorithm'),
+    path('run_ga_logic/', ga_views.run_genetic_algorithm, name='run_ga_logic'),
+    path('run_genetic_algorithm/', ga_views.run_genetic_algorithm, name='run_genetic_algorithm'),
+    path('repair-timetable/', views.repair_timetable, name='repair_timetable'),
+    path('timetable-versions/', views.timetable_versions, name='timetable_versions'),
 ]